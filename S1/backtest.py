@@ -1,22 +1,41 @@
 """简单回测工具：接收 OHLCV DataFrame 和信号序列，支持按时间范围回放并导出结果与图像。
 
 主要函数：
-- run_backtest(df, signals, out_dir, start=None, end=None, init_cash=10000, fee=0.001)
+- run_backtest(df, signals, out_dir, start=None, end=None, init_cash=10000, fee=0.001, engine="loop", artifacts="full")
 
-输出目录 out_dir 下会产生：
+engine="array" 时先把 open/close/signal 抽成连续的 NumPy 数组，只在信号切换的 bar 上
+执行买卖状态机，净值用分段常量的 cash/position 向量化计算；输出与逐行循环完全一致。
+
+输出目录 out_dir 下会产生（artifacts="full"，默认）：
 - equity.csv (datetime, equity)
 - metrics.json
 - trades.csv
+- roundtrips.csv（buy→sell 配对后的逐笔往返交易，见 S1.roundtrips）
 - equity.png, drawdown.png
+
+artifacts="data" 写出 csv/json 但不画图（之后可用 S1.plotting.render_run_dirs 在进程池中统一出图），
+artifacts="metrics" 只写 metrics.json，artifacts="none" 不写任何文件（out_dir 可为 None），
+适合网格扫描；结果仍通过返回值提供。matplotlib 只在需要画图时才导入。
 """
 from __future__ import annotations
 import os
 import json
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from collections.abc import Mapping
 from typing import Optional, List, Dict
 
+from S1.roundtrips import round_trips
+
+# artifacts 取值：不写文件 / 只写 metrics.json / csv + json（不画图）/ 全部（csv + json + png）
+ARTIFACT_LEVELS = ("none", "metrics", "data", "full")
+
+
+def check_artifacts(artifacts: str) -> str:
+    if artifacts not in ARTIFACT_LEVELS:
+        raise ValueError(f"unknown artifacts: {artifacts!r} (expected one of {ARTIFACT_LEVELS})")
+    return artifacts
+
 
 def _metrics(equity: pd.Series) -> Dict:
     returns = equity.pct_change().dropna()
@@ -38,66 +57,163 @@ def _metrics(equity: pd.Series) -> Dict:
     }
 
 
+def _simulate_arrays(open_: np.ndarray,
+                     close: np.ndarray,
+                     sig: np.ndarray,
+                     init_cash: float,
+                     fee: float):
+    """数组版状态机：返回 (equity, trades)，trades 为 (bar 下标, side, price, qty, cash) 元组列表。
+
+    与 run_backtest 的逐行循环语义一致：bar i 的信号在 bar i+1 open 成交，bar i 的净值
+    按成交后的持仓与 bar i 的 close 计算；最后一根 bar 只计净值不再交易。
+    """
+    n = len(close)
+    prev = np.empty(n, dtype=sig.dtype)
+    if n:
+        prev[0] = 0
+        prev[1:] = sig[:-1]
+    events = ((prev == 0) & (sig == 1)) | ((prev == 1) & (sig == 0))
+    if n:
+        events[-1] = False
+    ev_idx = np.flatnonzero(events)
+
+    cash = init_cash
+    position = 0.0
+    # slot 0 holds the initial state, slot k+1 the state after the k-th event
+    cash_state = np.empty(len(ev_idx) + 1, dtype=float)
+    pos_state = np.empty(len(ev_idx) + 1, dtype=float)
+    cash_state[0] = cash
+    pos_state[0] = position
+    trades = []
+    for k, i in enumerate(ev_idx):
+        price_next_open = open_[i + 1]
+        if sig[i] == 1:
+            qty = cash / price_next_open
+            cost = qty * price_next_open * (1 + fee)
+            position += qty
+            cash -= cost
+            trades.append((i + 1, "buy", float(price_next_open), float(qty), float(cash)))
+        elif position > 0:
+            proceeds = position * price_next_open * (1 - fee)
+            trades.append((i + 1, "sell", float(price_next_open), float(position), float(cash + proceeds)))
+            cash += proceeds
+            position = 0.0
+        cash_state[k + 1] = cash
+        pos_state[k + 1] = position
+
+    # state in force at bar i is the one left by the last event at or before i
+    seg = np.searchsorted(ev_idx, np.arange(n), side="right")
+    cash_bar = cash_state[seg]
+    pos_bar = pos_state[seg]
+    equity = cash_bar + pos_bar * close
+    return equity, trades
+
+
 def run_backtest(df: pd.DataFrame,
                  signals: pd.Series,
-                 out_dir: str,
+                 out_dir: Optional[str],
                  start: Optional[str] = None,
                  end: Optional[str] = None,
                  kline: str = "1d",
                  init_cash: float = 10000.0,
-                 fee: float = 0.001) -> Dict:
+                 fee: float = 0.001,
+                 engine: str = "loop",
+                 artifacts: str = "full") -> Dict:
     """按 signals 回测。signals 应与 df 对齐，取值为 1（持仓）或 0（空仓）。
 
     交易执行在下一日 open (避免 look-ahead)。当 signals.shift(1)==0 and signals==1 => 在 next bar open 买入
     当 signals.shift(1)==1 and signals==0 => 在 next bar open 卖出
+
+    engine: "loop"（逐行 iloc，原实现）或 "array"（数组内核，适合小时/分钟级长序列）。
+
+    df 也可以是 {列名: 数组} 形式的列式数据（例如 S1.data.load_memmap 返回的只读 memmap，
+    datetime 为 int64 纳秒 UTC 且已排序）；engine="array" 时直接在这些数组上计算，不复制价格数据。
+
+    artifacts: "full"（默认，csv/json/png 全部写出）、"data"（csv/json，不画图）、"metrics"（只写 metrics.json）
+    或 "none"（不写文件）；out_dir=None 等同于 "none"。
     """
-    os.makedirs(out_dir, exist_ok=True)
-    data = df.copy()
-    data = data.set_index("datetime")
-    if start:
-        data = data[data.index >= pd.to_datetime(start).tz_localize('UTC')]
-    if end:
-        data = data[data.index <= pd.to_datetime(end).tz_localize('UTC')]
-    signals = signals.reindex(data.index).fillna(0).astype(int)
+    if engine not in ("loop", "array"):
+        raise ValueError(f"unknown engine: {engine!r} (expected 'loop' or 'array')")
+    check_artifacts(artifacts)
+    if out_dir is None:
+        artifacts = "none"
+    if artifacts != "none":
+        os.makedirs(out_dir, exist_ok=True)
+    columnar = isinstance(df, Mapping)
+    if columnar and engine == "loop":
+        from S1.data import frame_from_columns
+        df = frame_from_columns(df)
+        columnar = False
+    if columnar:
+        # slice the (sorted) column arrays by start/end: views, no copy
+        index = pd.DatetimeIndex(np.asarray(df["datetime"]).view("datetime64[ns]"), name="datetime").tz_localize("UTC")
+        lo, hi = 0, len(index)
+        if start:
+            lo = index.searchsorted(pd.to_datetime(start).tz_localize('UTC'), side="left")
+        if end:
+            hi = index.searchsorted(pd.to_datetime(end).tz_localize('UTC'), side="right")
+        index = index[lo:hi]
+        open_ = np.asarray(df["open"], dtype=float)[lo:hi]
+        close_ = np.asarray(df["close"], dtype=float)[lo:hi]
+    else:
+        data = df.copy()
+        data = data.set_index("datetime")
+        if start:
+            data = data[data.index >= pd.to_datetime(start).tz_localize('UTC')]
+        if end:
+            data = data[data.index <= pd.to_datetime(end).tz_localize('UTC')]
+        index = data.index
+        open_ = data["open"].to_numpy(dtype=float)
+        close_ = data["close"].to_numpy(dtype=float)
+    signals = signals.reindex(index).fillna(0).astype(int)
 
-    cash = init_cash
-    position = 0.0  # number of coins held
-    equity_curve = []
-    trades: List[Dict] = []
-
-    prev_sig = 0
-    for i in range(len(data)-1):
-        idx = data.index[i]
-        next_idx = data.index[i+1]
-        price_next_open = data.iloc[i+1]["open"]
-        sig = int(signals.iloc[i])
-        # trade decisions based on current sig, execute next bar open
-        if prev_sig == 0 and sig == 1:
-            # buy full allocation
-            qty = cash / price_next_open
-            cost = qty * price_next_open * (1 + fee)
-            position += qty
-            cash -= cost
-            trades.append({"datetime": next_idx.isoformat(), "side": "buy", "price": float(price_next_open), "qty": float(qty), "cash": float(cash)})
-        elif prev_sig == 1 and sig == 0 and position > 0:
-            # sell all
-            proceeds = position * price_next_open * (1 - fee)
-            trades.append({"datetime": next_idx.isoformat(), "side": "sell", "price": float(price_next_open), "qty": float(position), "cash": float(cash + proceeds)})
-            cash += proceeds
-            position = 0.0
-        # compute equity at close of current day
-        close = data.iloc[i]["close"]
-        equity = cash + position * close
-        equity_curve.append((idx, equity))
-        prev_sig = sig
+    if engine == "array":
+        equity, raw_trades = _simulate_arrays(open_, close_, signals.to_numpy(), init_cash, fee)
+        trades: List[Dict] = [
+            {"datetime": index[i].isoformat(), "side": side, "price": price, "qty": qty, "cash": c}
+            for i, side, price, qty, c in raw_trades
+        ]
+        eq_df = pd.DataFrame({"equity": equity}, index=index)
+        eq_df.index = pd.to_datetime(eq_df.index)
+    else:
+        cash = init_cash
+        position = 0.0  # number of coins held
+        equity_curve = []
+        trades: List[Dict] = []
+
+        prev_sig = 0
+        for i in range(len(data)-1):
+            idx = data.index[i]
+            next_idx = data.index[i+1]
+            price_next_open = data.iloc[i+1]["open"]
+            sig = int(signals.iloc[i])
+            # trade decisions based on current sig, execute next bar open
+            if prev_sig == 0 and sig == 1:
+                # buy full allocation
+                qty = cash / price_next_open
+                cost = qty * price_next_open * (1 + fee)
+                position += qty
+                cash -= cost
+                trades.append({"datetime": next_idx.isoformat(), "side": "buy", "price": float(price_next_open), "qty": float(qty), "cash": float(cash)})
+            elif prev_sig == 1 and sig == 0 and position > 0:
+                # sell all
+                proceeds = position * price_next_open * (1 - fee)
+                trades.append({"datetime": next_idx.isoformat(), "side": "sell", "price": float(price_next_open), "qty": float(position), "cash": float(cash + proceeds)})
+                cash += proceeds
+                position = 0.0
+            # compute equity at close of current day
+            close = data.iloc[i]["close"]
+            equity = cash + position * close
+            equity_curve.append((idx, equity))
+            prev_sig = sig
 
-    # last bar equity
-    last_idx = data.index[-1]
-    last_close = data.iloc[-1]["close"]
-    equity_curve.append((last_idx, cash + position * last_close))
+        # last bar equity
+        last_idx = data.index[-1]
+        last_close = data.iloc[-1]["close"]
+        equity_curve.append((last_idx, cash + position * last_close))
 
-    eq_df = pd.DataFrame(equity_curve, columns=["datetime", "equity"]).set_index("datetime")
-    eq_df.index = pd.to_datetime(eq_df.index)
+        eq_df = pd.DataFrame(equity_curve, columns=["datetime", "equity"]).set_index("datetime")
+        eq_df.index = pd.to_datetime(eq_df.index)
 
     metrics = _metrics(eq_df["equity"])
     # attach metadata: actual backtest window and kline
@@ -111,31 +227,27 @@ def run_backtest(df: pd.DataFrame,
     metrics["end"] = end_used
     metrics["kline"] = kline
 
+    if artifacts == "none":
+        return {"metrics": metrics, "equity": eq_df, "trades": trades}
+
     # save outputs
-    eq_df.to_csv(os.path.join(out_dir, "equity.csv"))
     with open(os.path.join(out_dir, "metrics.json"), "w") as f:
         json.dump(metrics, f, indent=2)
+    if artifacts == "metrics":
+        return {"metrics": metrics, "equity": eq_df, "trades": trades}
+
+    eq_df.to_csv(os.path.join(out_dir, "equity.csv"))
     trades_df = pd.DataFrame(trades)
     if not trades_df.empty:
         trades_df.to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+        round_trips(trades_df, index=eq_df.index, fee=fee).to_csv(os.path.join(out_dir, "roundtrips.csv"),
+                                                                  index=False)
 
-    # plots
-    plt.figure(figsize=(10, 4))
-    plt.plot(eq_df.index, eq_df["equity"], label="Equity")
-    plt.title("Equity Curve")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "equity.png"))
-    plt.close()
-
-    running_max = eq_df["equity"].cummax()
-    drawdown = (eq_df["equity"] - running_max) / running_max
-    plt.figure(figsize=(10, 3))
-    plt.plot(drawdown.index, drawdown.values, color="red")
-    plt.title("Drawdown")
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "drawdown.png"))
-    plt.close()
+    if artifacts == "full":
+        # plots (matplotlib is only imported here, so headless sweeps never load it)
+        from S1.plotting import plot_equity, plot_drawdown
+        plot_equity(eq_df.index, eq_df["equity"], os.path.join(out_dir, "equity.png"))
+        plot_drawdown(eq_df.index, eq_df["equity"], os.path.join(out_dir, "drawdown.png"))
 
     return {"metrics": metrics, "equity": eq_df, "trades": trades}
 
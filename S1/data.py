@@ -3,12 +3,29 @@
 功能：
 - download_and_cache(start=None, end=None, save_path='data/raw/btc_daily.csv', update=True)
 - load_cached(save_path) -> pd.DataFrame
+- load_dataset(save_path) -> pd.DataFrame：优先读取与 CSV 同名、且不旧于 CSV 的二进制缓存
+- convert_cache(src, dst)：在 CSV 与二进制格式之间导入/导出
+- append_cache(df_new, save_path) / compact_cache(save_path)：增量追加与合并
+- load_memmap(save_path) -> dict：把 .cols 缓存的各列以只读 numpy.memmap 暴露（多进程共享页缓存）
+- iter_cache_chunks(save_path, chunksize) -> Iterator[pd.DataFrame]：按块顺序读取缓存（含追加分段），内存只与块大小有关
+
+增量更新是 append-only 的：新数据必须严格晚于缓存末尾；CSV 直接追加行，二进制格式
+写成 `<save_path>.segments/` 下的新分段文件，分段数达到 compact_every 时合并回主文件。
+
+缓存格式由 save_path 的扩展名决定：
+- .csv：文本格式（导入/导出用，解析日期较慢）
+- .parquet / .feather：列式二进制（需要 pyarrow）
+- .cols：目录，每列一个 .npy 文件，datetime 存为 int64 纳秒时间戳（UTC），仅依赖 numpy
 
 要求：返回包含 ['datetime','open','high','low','close','volume'] 的 DataFrame，index 为 datetime（UTC）。
 """
 from __future__ import annotations
 import os
+import json
+import re
+import shutil
 import requests
+import numpy as np
 import pandas as pd
 import logging
 # no local datetime import required
@@ -43,81 +60,437 @@ def _fetch_cc(limit: int = 2000, to_ts: Optional[int] = None) -> pd.DataFrame:
     return df
 
 
-def load_cached(save_path: str = "data/raw/btc_daily.csv") -> pd.DataFrame:
+DEFAULT_CACHE = "data/raw/btc_daily.csv"
+BINARY_SUFFIXES = (".cols", ".parquet", ".feather")
+_COLUMNS_FILE = "columns.json"
+
+
+def _cache_format(path: str) -> str:
+    ext = os.path.splitext(path.rstrip("/"))[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext == ".feather":
+        return "feather"
+    if ext == ".cols":
+        return "cols"
+    raise ValueError(f"unsupported cache format for {path!r}: use .csv, .parquet, .feather or .cols")
+
+
+def _write_cols(df: pd.DataFrame, path: str) -> None:
+    """Write one .npy per column into directory `path`.
+
+    The columns go to `<path>.tmp` first; the old directory is renamed to `<path>.old` and only
+    deleted once the new one is in place, so at every point of a crash a complete cache is left at
+    `path` or, between the two renames, at `<path>.old`.
+    """
+    path = path.rstrip("/")
+    tmp, old = path + ".tmp", path + ".old"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columns = list(df.columns)
+    for c in columns:
+        if c == "datetime":
+            ts = pd.to_datetime(df[c], utc=True)
+            arr = ts.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            arr = pd.to_numeric(df[c]).to_numpy(dtype=float)
+        np.save(os.path.join(tmp, f"{c}.npy"), arr)
+    with open(os.path.join(tmp, _COLUMNS_FILE), "w") as f:
+        json.dump(columns, f)
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _read_cols(path: str) -> pd.DataFrame:
+    with open(os.path.join(path, _COLUMNS_FILE)) as f:
+        columns = json.load(f)
+    data = {}
+    for c in columns:
+        arr = np.load(os.path.join(path, f"{c}.npy"))
+        if c == "datetime":
+            data[c] = pd.to_datetime(arr, unit="ns", utc=True)
+        else:
+            data[c] = arr
+    return pd.DataFrame(data, columns=columns)
+
+
+def write_cache(df: pd.DataFrame, save_path: str) -> None:
+    """按 save_path 扩展名写缓存（.csv / .parquet / .feather / .cols）。"""
+    fmt = _cache_format(save_path)
+    parent = os.path.dirname(save_path.rstrip("/"))
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    if fmt == "csv":
+        df.to_csv(save_path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(save_path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(save_path)
+    else:
+        _write_cols(df, save_path)
+
+
+def _read_one(path: str, fmt: str) -> pd.DataFrame:
+    if fmt == "csv":
+        return pd.read_csv(path, parse_dates=["datetime"]) 
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    if fmt == "feather":
+        return pd.read_feather(path)
+    return _read_cols(path)
+
+
+def _segments_dir(save_path: str) -> str:
+    return save_path.rstrip("/") + ".segments"
+
+
+def _segment_paths(save_path: str) -> list:
+    """Appended segment files of a binary cache, in write order.
+
+    Only complete `seg_NNNNNN<ext>` entries count; `.tmp`/`.old` leftovers of a crashed write are ignored.
+    """
+    seg_dir = _segments_dir(save_path)
+    if not os.path.isdir(seg_dir):
+        return []
+    ext = os.path.splitext(save_path.rstrip("/"))[1]
+    pattern = re.compile(r"seg_\d{6}" + re.escape(ext))
+    return [os.path.join(seg_dir, name) for name in sorted(os.listdir(seg_dir)) if pattern.fullmatch(name)]
+
+
+def _cache_mtime(save_path: str) -> float:
+    mtime = os.path.getmtime(save_path)
+    seg_dir = _segments_dir(save_path)
+    if os.path.isdir(seg_dir):
+        mtime = max(mtime, os.path.getmtime(seg_dir))
+    return mtime
+
+
+def load_cached(save_path: str = DEFAULT_CACHE) -> pd.DataFrame:
     if not os.path.exists(save_path):
         return pd.DataFrame()
-    df = pd.read_csv(save_path, parse_dates=["datetime"]) 
+    fmt = _cache_format(save_path)
+    df = _read_one(save_path, fmt)
+    segments = _segment_paths(save_path)
+    if segments:
+        parts = [df]
+        tail = df["datetime"].max() if len(df) else None
+        for p in segments:
+            seg = _read_one(p, fmt)
+            # rows already merged into the main file by a compaction that crashed before removing them
+            if tail is not None:
+                seg = seg[seg["datetime"] > tail]
+            if len(seg):
+                tail = seg["datetime"].iloc[-1]
+                parts.append(seg)
+        df = pd.concat(parts, ignore_index=True)
     # ensure tz-aware UTC
     if df["datetime"].dt.tz is None:
         df["datetime"] = df["datetime"].dt.tz_localize("UTC")
     return df
 
 
+def load_dataset(save_path: str = DEFAULT_CACHE) -> pd.DataFrame:
+    """读取缓存；若存在同名二进制缓存（btc_daily.cols/.parquet/.feather）且不旧于 save_path，则优先读取它。
+
+    这样只需 convert_cache 一次，各脚本即可跳过 CSV 的日期解析。数据缺失时抛出 FileNotFoundError。
+    """
+    base = os.path.splitext(save_path.rstrip("/"))[0]
+    src_mtime = _cache_mtime(save_path) if os.path.exists(save_path) else None
+    for suffix in BINARY_SUFFIXES:
+        cand = base + suffix
+        if cand == save_path or not os.path.exists(cand):
+            continue
+        if src_mtime is not None and _cache_mtime(cand) < src_mtime:
+            continue
+        try:
+            return load_cached(cand)
+        except ImportError:
+            # e.g. parquet sibling but pyarrow not installed: fall through to the next candidate
+            continue
+    if src_mtime is None:
+        raise FileNotFoundError(f"Data file not found: {save_path}. Please run S1 data downloader first.")
+    return load_cached(save_path)
+
+
+def convert_cache(src: str, dst: str) -> pd.DataFrame:
+    """在缓存格式之间转换，例如 CSV -> .cols（导入）或 .parquet -> CSV（导出）。"""
+    df = load_cached(src)
+    if df.empty:
+        raise FileNotFoundError(f"no cached data at {src}")
+    write_cache(df, dst)
+    return df
+
+
+def _cache_tail(save_path: str) -> Optional[pd.Timestamp]:
+    """Last cached datetime (UTC) without loading the whole cache; None if there is no cache."""
+    if not os.path.exists(save_path):
+        return None
+    fmt = _cache_format(save_path)
+    segments = _segment_paths(save_path)
+    path = segments[-1] if segments else save_path
+    if fmt == "csv":
+        # read backwards from the end of the file until we have the last full line
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = min(size, 4096)
+            while True:
+                f.seek(size - block)
+                lines = f.read(block).splitlines()
+                if len(lines) > 1 or block == size:
+                    break
+                block = min(size, block * 2)
+        last = lines[-1].decode() if lines else ""
+        if not last or last.startswith("datetime"):
+            return None
+        ts = pd.Timestamp(last.split(",", 1)[0])
+    elif fmt == "cols":
+        arr = np.load(os.path.join(path, "datetime.npy"), mmap_mode="r")
+        if len(arr) == 0:
+            return None
+        ts = pd.Timestamp(int(arr[-1]), unit="ns")
+    else:
+        col = (pd.read_parquet(path, columns=["datetime"]) if fmt == "parquet"
+               else pd.read_feather(path, columns=["datetime"]))["datetime"]
+        if col.empty:
+            return None
+        ts = pd.Timestamp(col.max())
+    return ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+
+
+def load_memmap(save_path: str = "data/raw/btc_daily.cols") -> dict:
+    """以只读 numpy.memmap 打开 .cols 缓存，返回 {列名: 数组}，datetime 为 int64 纳秒时间戳（UTC）。
+
+    多个进程打开同一份缓存时共享操作系统页缓存，而不是各自持有一份 pandas 副本。
+    S1/S2/S3 的回测函数可以直接接收这个 dict（见 frame_from_columns）。
+    只支持 .cols 格式，且不能有未合并的追加分段（先调用 compact_cache）。
+    """
+    if _cache_format(save_path) != "cols":
+        raise ValueError(f"load_memmap needs a .cols cache, got {save_path!r}; "
+                         f"convert it first: python S1/data.py --convert <src> <name>.cols")
+    if not os.path.isdir(save_path):
+        raise FileNotFoundError(f"Data file not found: {save_path}. Please run S1 data downloader first.")
+    if _segment_paths(save_path):
+        raise ValueError(f"{save_path} has appended segments; run compact_cache({save_path!r}) before memory-mapping it")
+    return _open_cols(save_path)
+
+
+def _open_cols(path: str) -> dict:
+    with open(os.path.join(path, _COLUMNS_FILE)) as f:
+        columns = json.load(f)
+    return {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in columns}
+
+
+def frame_from_columns(cols) -> pd.DataFrame:
+    """把 {列名: 数组}（例如 load_memmap 的结果）包装成 DataFrame，数值列不复制（copy=False）。
+
+    datetime 列转为 tz-aware UTC，以便与 load_cached 返回的 DataFrame 互换使用。
+    """
+    data = {}
+    for c, arr in cols.items():
+        if c == "datetime":
+            data[c] = pd.DatetimeIndex(np.asarray(arr).view("datetime64[ns]")).tz_localize("UTC")
+        else:
+            data[c] = arr
+    return pd.DataFrame(data, copy=False)
+
+
+def _iter_one(path: str, fmt: str, chunksize: int, after_ns=None):
+    if fmt == "csv":
+        yield from pd.read_csv(path, parse_dates=["datetime"], chunksize=chunksize)
+    elif fmt == "cols":
+        cols = _open_cols(path)
+        n = len(cols["datetime"])
+        # sorted int64 ns column: skip already-seen bars without reading them
+        start = 0 if after_ns is None else int(np.searchsorted(cols["datetime"], after_ns, side="right"))
+        for lo in range(start, n, chunksize):
+            # copy just this slice out of the memmap so the chunk owns its memory
+            yield frame_from_columns({c: np.array(a[lo:lo + chunksize]) for c, a in cols.items()})
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        import pyarrow.feather as feather
+        for batch in feather.read_table(path, memory_map=True).to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas()
+
+
+def iter_cache_chunks(save_path: str = DEFAULT_CACHE, chunksize: int = 100_000, after=None):
+    """按时间顺序分块读取缓存（主文件之后是追加分段），每块是与 load_cached 相同列的 DataFrame。
+
+    用于流式回测：峰值内存由 chunksize 决定，而不是历史长度。缓存不存在时抛出 FileNotFoundError。
+    after：只返回时间严格晚于它的 K 线（无时区按 UTC），用于增量续跑；.cols 缓存直接按二分定位，
+    不读取更早的数据。
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be >= 1, got {chunksize}")
+    if not os.path.exists(save_path):
+        raise FileNotFoundError(f"Data file not found: {save_path}. Please run S1 data downloader first.")
+    fmt = _cache_format(save_path)
+    if after is not None:
+        after = pd.Timestamp(after)
+        after = after.tz_localize("UTC") if after.tz is None else after.tz_convert("UTC")
+    for path in [save_path] + _segment_paths(save_path):
+        # `after` advances with every chunk, so segment rows a crashed compaction left behind are skipped
+        after_ns = None if after is None else after.as_unit("ns").value
+        for chunk in _iter_one(path, fmt, chunksize, after_ns):
+            if chunk.empty:
+                continue
+            if chunk["datetime"].dt.tz is None:
+                chunk["datetime"] = chunk["datetime"].dt.tz_localize("UTC")
+            if after is not None:
+                chunk = chunk[chunk["datetime"] > after]
+                if chunk.empty:
+                    continue
+            after = chunk["datetime"].iloc[-1]
+            yield chunk.reset_index(drop=True)
+
+
+def compact_cache(save_path: str) -> pd.DataFrame:
+    """把 `<save_path>.segments/` 下的追加分段合并回主缓存文件，返回合并后的完整数据。
+
+    主文件先整体替换（写临时文件后 rename），再删除分段目录。若在两步之间崩溃，残留分段中
+    不晚于主文件末尾的行会被 load_cached / iter_cache_chunks 丢弃，不会重复。
+    """
+    df = load_cached(save_path)
+    if _segment_paths(save_path):
+        if _cache_format(save_path) == "cols":
+            write_cache(df, save_path)
+        else:
+            base, ext = os.path.splitext(save_path)
+            tmp = base + ".compact" + ext
+            write_cache(df, tmp)
+            os.replace(tmp, save_path)
+        shutil.rmtree(_segments_dir(save_path), ignore_errors=True)
+    return df
+
+
+def append_cache(df_new: pd.DataFrame, save_path: str, compact_every: int = 32) -> int:
+    """Append-only 写入：df_new 必须按时间严格递增且严格晚于缓存末尾，否则抛出 ValueError。
+
+    CSV 直接追加行；二进制格式写一个新的分段文件，分段数达到 compact_every 时自动合并。
+    缓存不存在时等同于 write_cache。返回写入的行数。
+    """
+    if df_new.empty:
+        return 0
+    fmt = _cache_format(save_path)
+    times = pd.to_datetime(df_new["datetime"], utc=True)
+    if not times.is_monotonic_increasing or times.duplicated().any():
+        raise ValueError("append_cache: new rows must be sorted by datetime without duplicates")
+    tail = _cache_tail(save_path)
+    if tail is None:
+        write_cache(df_new, save_path)
+        return len(df_new)
+    if times.iloc[0] <= tail:
+        raise ValueError(f"append_cache: new rows start at {times.iloc[0]} which is not after cached tail {tail}")
+
+    if fmt == "csv":
+        df_new.to_csv(save_path, mode="a", header=False, index=False)
+        return len(df_new)
+    seg_dir = _segments_dir(save_path)
+    os.makedirs(seg_dir, exist_ok=True)
+    segments = _segment_paths(save_path)
+    ext = os.path.splitext(save_path.rstrip("/"))[1]
+    write_cache(df_new, os.path.join(seg_dir, f"seg_{len(segments) + 1:06d}{ext}"))
+    if len(segments) + 1 >= compact_every:
+        compact_cache(save_path)
+    return len(df_new)
+
+
+def _fetch_missing(last_date: pd.Timestamp, today: pd.Timestamp) -> pd.DataFrame:
+    """分批（每批至多 2000 天）拉取 last_date 之后直到 today 的日线；没有缺失时返回空表。"""
+    missing_days = (today.normalize() - last_date.normalize()).days
+    if missing_days <= 0:
+        logging.info("Cache is up-to-date; no fetch needed")
+        return pd.DataFrame()
+    logging.info(f"Need to fetch {missing_days} missing days since {last_date.date()}")
+    parts = []
+    # iterate in batches up to 2000 days per request
+    while missing_days > 0:
+        to_fetch = min(missing_days, 2000)
+        # set to_ts to last_date + to_fetch days (inclusive)
+        to_ts = int((last_date + pd.Timedelta(days=to_fetch)).timestamp())
+        logging.info(f"Fetching batch: last_date={last_date.date()} to to_ts={pd.to_datetime(to_ts, unit='s').date()} (limit={to_fetch})")
+        df_batch = _fetch_cc(limit=to_fetch, to_ts=to_ts)
+        logging.info(f"Batch returned {len(df_batch)} rows")
+        if df_batch.empty:
+            break
+        parts.append(df_batch)
+        # advance last_date to max datetime in df_batch
+        last_date = pd.to_datetime(df_batch["datetime"].max())
+        if last_date.tz is None:
+            last_date = last_date.tz_localize("UTC")
+        missing_days = (today.normalize() - last_date.normalize()).days
+        # safety: avoid infinite loop
+        if len(parts) > 50:
+            logging.warning("Too many batches, stopping to avoid infinite loop")
+            break
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
 def download_and_cache(start: Optional[str] = None,
                        end: Optional[str] = None,
-                       save_path: str = "data/raw/btc_daily.csv",
-                       update: bool = True) -> pd.DataFrame:
+                       save_path: str = DEFAULT_CACHE,
+                       update: bool = True,
+                       append: bool = True,
+                       return_data: bool = True) -> Optional[pd.DataFrame]:
     """下载数据并缓存。
 
     start/end 可以是 ISO 日期字符串（例如 '2020-01-01'）。
     如果 update=True 且已有缓存，则只追加缺失的最新数据。
-    返回完整 DataFrame（按 datetime 升序）。
+    append=True（默认）时只读取缓存末尾的时间戳（_cache_tail），增量数据通过 append_cache 追加写入，
+    已有缓存既不整体读取也不整体重写，刷新耗时只与新数据量相关；append=False 保持旧行为（合并、去重、
+    排序后整体重写）。
+    返回完整 DataFrame（按 datetime 升序）；return_data=False 时只刷新缓存、返回 None，
+    追加模式下全程不加载历史数据。
     """
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    cached = load_cached(save_path)
+    _cache_format(save_path)
+    os.makedirs(os.path.dirname(save_path.rstrip("/")), exist_ok=True)
+    today = pd.Timestamp.now("UTC")
+    tail = _cache_tail(save_path) if update and append else None
 
-    if cached.empty:
-        # fetch full range (limit covers ~2000 days)
-        logging.info("No cache found, fetching full range (limit=2000)")
-        df = _fetch_cc(limit=2000)
+    if tail is not None:
+        # keep only rows strictly after the cached tail and append them to the cache
+        df_new = _fetch_missing(tail, today)
+        if not df_new.empty:
+            df_new = df_new[df_new["datetime"] > tail]
+            df_new = df_new.drop_duplicates(subset=["datetime"]).sort_values("datetime")
+            if not df_new.empty:
+                append_cache(df_new, save_path)
+        if not return_data:
+            return None
+        df = load_cached(save_path)
     else:
-        if not update:
+        cached = load_cached(save_path)
+        if cached.empty:
+            # fetch full range (limit covers ~2000 days)
+            logging.info("No cache found, fetching full range (limit=2000)")
+            df = _fetch_cc(limit=2000)
+        elif not update:
             df = cached.copy()
         else:
             # incremental update: fetch missing days after the last cached date in batches
             last_date = pd.to_datetime(cached["datetime"].max())
             if last_date.tz is None:
                 last_date = last_date.tz_localize("UTC")
-            today = pd.Timestamp.utcnow()
-            if today.tz is None:
-                today = today.tz_localize("UTC")
-            missing_days = (today.normalize() - last_date.normalize()).days
-            if missing_days <= 0:
-                logging.info("Cache is up-to-date; no fetch needed")
-                df = cached.copy()
-            else:
-                logging.info(f"Need to fetch {missing_days} missing days since {last_date.date()}")
-                parts = []
-                fetched_total = 0
-                # iterate in batches up to 2000 days per request
-                while missing_days > 0:
-                    to_fetch = min(missing_days, 2000)
-                    # set to_ts to last_date + to_fetch days (inclusive)
-                    to_ts_date = (last_date + pd.Timedelta(days=to_fetch))
-                    to_ts = int(to_ts_date.tz_convert("UTC").timestamp()) if to_ts_date.tz is not None else int(to_ts_date.tz_localize("UTC").timestamp())
-                    logging.info(f"Fetching batch: last_date={last_date.date()} to to_ts={pd.to_datetime(to_ts, unit='s').date()} (limit={to_fetch})")
-                    df_batch = _fetch_cc(limit=to_fetch, to_ts=to_ts)
-                    logging.info(f"Batch returned {len(df_batch)} rows")
-                    if df_batch.empty:
-                        break
-                    parts.append(df_batch)
-                    fetched_total += len(df_batch)
-                    # advance last_date to max datetime in df_batch
-                    last_date = pd.to_datetime(df_batch["datetime"].max())
-                    if last_date.tz is None:
-                        last_date = last_date.tz_localize("UTC")
-                    missing_days = (today.normalize() - last_date.normalize()).days
-                    # safety: avoid infinite loop
-                    if len(parts) > 50:
-                        logging.warning("Too many batches, stopping to avoid infinite loop")
-                        break
-                if parts:
-                    df_new = pd.concat(parts, ignore_index=True)
-                else:
-                    df_new = pd.DataFrame()
-                # combine and dedupe (keep earliest occurrences)
-                df = pd.concat([cached, df_new], ignore_index=True) if not df_new.empty else cached.copy()
-                df = df.drop_duplicates(subset=["datetime"]).sort_values("datetime").reset_index(drop=True)
+            df_new = _fetch_missing(last_date, today)
+            # combine and dedupe (keep earliest occurrences)
+            df = pd.concat([cached, df_new], ignore_index=True) if not df_new.empty else cached.copy()
+            df = df.drop_duplicates(subset=["datetime"]).sort_values("datetime").reset_index(drop=True)
+        # write cache (full range); in append mode an existing cache is only ever appended to
+        if cached.empty or not append:
+            try:
+                write_cache(df, save_path)
+            except Exception:
+                pass
+        if not return_data:
+            return None
 
     # filter by start/end
     if start:
@@ -126,24 +499,30 @@ def download_and_cache(start: Optional[str] = None,
     if end:
         end_ts = pd.to_datetime(end).tz_localize("UTC") if pd.to_datetime(end).tz is None else pd.to_datetime(end)
         df = df[df["datetime"] <= end_ts]
-
-    # write cache (full range)
-    try:
-        df.to_csv(save_path, index=False)
-    except Exception:
-        pass
     return df
 
 
 if __name__ == "__main__":
     # quick CLI: python S1/data.py --start 2020-01-01 --end 2023-01-01
+    # convert only: python S1/data.py --convert data/raw/btc_daily.csv data/raw/btc_daily.cols
     import argparse
 
     p = argparse.ArgumentParser()
     p.add_argument("--start", default=None)
     p.add_argument("--end", default=None)
-    p.add_argument("--save", default="data/raw/btc_daily.csv")
+    p.add_argument("--save", default=DEFAULT_CACHE, help="cache path; extension selects the format (.csv/.parquet/.feather/.cols)")
     p.add_argument("--no-update", action="store_true")
+    p.add_argument("--convert", nargs=2, metavar=("SRC", "DST"), help="convert an existing cache between formats and exit")
+    p.add_argument("--compact", action="store_true", help="merge appended segments of --save into the main file and exit")
+    p.add_argument("--rewrite", action="store_true", help="rewrite the whole cache on update instead of appending")
     args = p.parse_args()
-    df = download_and_cache(start=args.start, end=args.end, save_path=args.save, update=not args.no_update)
+    if args.compact:
+        df = compact_cache(args.save)
+        print(f"Compacted {args.save}: {len(df)} rows")
+        raise SystemExit(0)
+    if args.convert:
+        df = convert_cache(*args.convert)
+        print(f"Converted {len(df)} rows: {args.convert[0]} -> {args.convert[1]}")
+        raise SystemExit(0)
+    df = download_and_cache(start=args.start, end=args.end, save_path=args.save, update=not args.no_update, append=not args.rewrite)
     print(f"Downloaded {len(df)} rows, saved to {args.save}")
@@ -0,0 +1,276 @@
+"""本地 SQLite 实验库（S1，网格脚本共用）
+
+每次扫描（sweep）记一行 sweeps（脚本名、git tag、日期、配置），每个格点记一行 runs（策略、参数、
+指标、输出目录）。一次扫描的所有格点在同一个事务里批量写入；策略、指标、参数和扫描编号上都有索引，
+跨会话比较不再需要遍历结果目录：
+
+    store = ExperimentStore("results/experiments.sqlite")
+    sweep_id = store.record_sweep("s2_grid_search", rows, param_keys=("sl_pct", "tp_pct"), tag="69e2699")
+    store.best_per_strategy("sharpe", last_sweeps=50)    # 最近 50 次扫描中每个策略 sharpe 最高的格点
+
+命令行：
+
+    python -m S1.experiments sweeps
+    python -m S1.experiments best --metric sharpe --last 50
+    python -m S1.experiments runs --sweep 12
+    python -m S1.experiments pareto --sweep 12 --max annualized_return sharpe --min volatility
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from S1.pareto import pareto_front
+
+DEFAULT_DB = os.path.join("results", "experiments.sqlite")
+METRIC_COLUMNS = ("total_return", "annualized_return", "max_drawdown", "volatility", "sharpe")
+# metrics where smaller is better; max_drawdown is negative, so larger (closer to 0) is better
+LOWER_IS_BETTER = ("volatility",)
+# row fields stored in their own columns (or on the sweep); everything else goes to runs.extra
+_RUN_FIELDS = ("strategy", "notes", "out_dir", "tag", "date") + METRIC_COLUMNS
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY,
+    script TEXT NOT NULL,
+    tag TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL,
+    created TEXT NOT NULL,
+    config TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    sweep_id INTEGER NOT NULL REFERENCES sweeps(id) ON DELETE CASCADE,
+    strategy TEXT NOT NULL,
+    params TEXT NOT NULL,
+    total_return REAL,
+    annualized_return REAL,
+    max_drawdown REAL,
+    volatility REAL,
+    sharpe REAL,
+    notes TEXT NOT NULL DEFAULT '',
+    out_dir TEXT NOT NULL DEFAULT '',
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS sweeps_script_idx ON sweeps(script, id);
+CREATE INDEX IF NOT EXISTS sweeps_tag_idx ON sweeps(tag);
+CREATE INDEX IF NOT EXISTS sweeps_date_idx ON sweeps(date);
+CREATE INDEX IF NOT EXISTS runs_sweep_idx ON runs(sweep_id, strategy);
+CREATE INDEX IF NOT EXISTS runs_strategy_sharpe_idx ON runs(strategy, sharpe);
+CREATE INDEX IF NOT EXISTS runs_strategy_return_idx ON runs(strategy, annualized_return);
+CREATE INDEX IF NOT EXISTS runs_params_idx ON runs(strategy, params);
+"""
+
+
+def _number(value) -> Optional[float]:
+    """指标转成 float；None、空串、NaN 与无法解析的值存为 NULL。"""
+    if value is None or value == "":
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+
+def _plain(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _dumps(obj: Dict) -> str:
+    """规范 JSON（键排序、无空格）：同一组参数总是得到同一个字符串，可以直接比较和建索引。"""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _check_metric(metric: str) -> str:
+    # metric names are interpolated into SQL, so only the known columns are accepted
+    if metric not in METRIC_COLUMNS:
+        raise ValueError(f"metric must be one of {METRIC_COLUMNS}, got {metric!r}")
+    return metric
+
+
+class ExperimentStore:
+    """SQLite 实验库。可用作上下文管理器；多个进程可以同时写（WAL 模式，写锁等待 timeout 秒）。"""
+
+    def __init__(self, path: str = DEFAULT_DB, timeout: float = 30.0):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _insert_sweep(self, script: str, tag: str = "", date: Optional[str] = None,
+                      config: Optional[Dict] = None) -> int:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cur = self._conn.execute(
+            "INSERT INTO sweeps (script, tag, date, created, config) VALUES (?, ?, ?, ?, ?)",
+            (script, tag or "", date or now.date().isoformat(), now.isoformat(timespec="seconds"),
+             _dumps(config or {})))
+        return cur.lastrowid
+
+    def _insert_runs(self, sweep_id: int, rows: Iterable[Dict], param_keys: Sequence[str] = (),
+                     strategy: Optional[str] = None) -> int:
+        records = []
+        for row in rows:
+            params = {k: _plain(row.get(k)) for k in param_keys}
+            extra = {k: _plain(v) for k, v in row.items() if k not in _RUN_FIELDS and k not in params}
+            records.append((sweep_id, row.get("strategy", strategy) or "", _dumps(params),
+                            *(_number(row.get(m)) for m in METRIC_COLUMNS),
+                            row.get("notes") or "", str(row.get("out_dir") or ""), _dumps(extra)))
+        self._conn.executemany(
+            "INSERT INTO runs (sweep_id, strategy, params, total_return, annualized_return, max_drawdown, "
+            "volatility, sharpe, notes, out_dir, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+        return len(records)
+
+    def start_sweep(self, script: str, tag: str = "", date: Optional[str] = None,
+                    config: Optional[Dict] = None) -> int:
+        """新建一次扫描，返回 sweep_id（格点之后用 add_runs 追加）。"""
+        with self._conn:
+            return self._insert_sweep(script, tag, date, config)
+
+    def add_runs(self, sweep_id: int, rows: Iterable[Dict], param_keys: Sequence[str] = (),
+                 strategy: Optional[str] = None) -> int:
+        """在一个事务里批量写入格点，返回写入行数。
+
+        每个 row 是脚本的结果字典：strategy（缺省用参数 strategy）、METRIC_COLUMNS 中的指标、notes、out_dir
+        各占一列；param_keys 指定的字段组成 params（规范 JSON）；其余字段（trades、final_equity……）存入 extra。
+        """
+        with self._conn:
+            return self._insert_runs(sweep_id, rows, param_keys, strategy)
+
+    def record_sweep(self, script: str, rows: Iterable[Dict], param_keys: Sequence[str] = (),
+                     tag: str = "", date: Optional[str] = None, config: Optional[Dict] = None,
+                     strategy: Optional[str] = None) -> int:
+        """扫描与全部格点在同一个事务中写入（中途出错则整体回滚），返回 sweep_id。"""
+        with self._conn:
+            sweep_id = self._insert_sweep(script, tag, date, config)
+            self._insert_runs(sweep_id, rows, param_keys, strategy)
+        return sweep_id
+
+    def _query(self, sql: str, args=()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self._conn, params=list(args))
+
+    def sweeps(self, script: Optional[str] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """扫描列表（新的在前），附带格点数。"""
+        where = "WHERE s.script = ?" if script else ""
+        args = [script] if script else []
+        sql = (f"SELECT s.id, s.script, s.tag, s.date, s.created, COUNT(r.id) AS runs FROM sweeps s "
+               f"LEFT JOIN runs r ON r.sweep_id = s.id {where} GROUP BY s.id ORDER BY s.id DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return self._query(sql, args)
+
+    def runs(self, sweep_id: Optional[int] = None, strategy: Optional[str] = None) -> pd.DataFrame:
+        """格点明细，附带所属扫描的 script/tag/date。"""
+        clauses, args = [], []
+        if sweep_id is not None:
+            clauses.append("r.sweep_id = ?")
+            args.append(int(sweep_id))
+        if strategy is not None:
+            clauses.append("r.strategy = ?")
+            args.append(strategy)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT r.*, s.script, s.tag, s.date FROM runs r JOIN sweeps s ON s.id = r.sweep_id {where} "
+            f"ORDER BY r.sweep_id, r.id", args)
+
+    def best_per_strategy(self, metric: str = "sharpe", last_sweeps: Optional[int] = 50,
+                          script: Optional[str] = None) -> pd.DataFrame:
+        """最近 last_sweeps 次扫描（None 为全部，可按 script 过滤）中，每个策略 metric 最优的格点。
+
+        一条查询完成：窗口函数按策略分区排序取第一名；指标为 NULL 的格点（失败的运行）不参与。
+        volatility 越小越好，其余指标越大越好。
+        """
+        metric = _check_metric(metric)
+        order = "ASC" if metric in LOWER_IS_BETTER else "DESC"
+        args = []
+        recent = "SELECT id FROM sweeps"
+        if script:
+            recent += " WHERE script = ?"
+            args.append(script)
+        recent += " ORDER BY id DESC"
+        if last_sweeps is not None:
+            recent += " LIMIT ?"
+            args.append(int(last_sweeps))
+        sql = f"""
+            WITH recent AS ({recent}),
+            ranked AS (
+                SELECT r.*, ROW_NUMBER() OVER (PARTITION BY r.strategy ORDER BY r.{metric} {order}, r.id) AS rank
+                FROM runs r
+                WHERE r.sweep_id IN (SELECT id FROM recent) AND r.{metric} IS NOT NULL
+            )
+            SELECT ranked.*, s.script, s.tag, s.date FROM ranked JOIN sweeps s ON s.id = ranked.sweep_id
+            WHERE rank = 1 ORDER BY ranked.{metric} {order}
+        """
+        return self._query(sql, args).drop(columns="rank")
+
+    def delete_sweeps(self, sweep_ids: Iterable[int]) -> int:
+        """删除扫描及其格点，返回删除的扫描数。"""
+        ids = [(int(i),) for i in sweep_ids]
+        with self._conn:
+            cur = self._conn.executemany("DELETE FROM sweeps WHERE id = ?", ids)
+        return cur.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m S1.experiments", description="实验库查询")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite 文件")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sw = sub.add_parser("sweeps", help="列出扫描")
+    sw.add_argument("--script")
+    sw.add_argument("--limit", type=int, default=20)
+    best = sub.add_parser("best", help="每个策略的最优格点")
+    best.add_argument("--metric", choices=METRIC_COLUMNS, default="sharpe")
+    best.add_argument("--last", type=int, default=50, help="只看最近 N 次扫描（0 为全部）")
+    best.add_argument("--script")
+    runs = sub.add_parser("runs", help="格点明细")
+    runs.add_argument("--sweep", type=int)
+    runs.add_argument("--strategy")
+    front = sub.add_parser("pareto", help="格点的 Pareto 前沿（默认 annualized_return 与 max_drawdown 越大越好）")
+    front.add_argument("--sweep", type=int)
+    front.add_argument("--strategy")
+    front.add_argument("--max", nargs="*", choices=METRIC_COLUMNS, default=None, help="越大越好的指标")
+    front.add_argument("--min", nargs="*", choices=METRIC_COLUMNS, default=[], help="越小越好的指标")
+    args = parser.parse_args(argv)
+
+    with ExperimentStore(args.db) as store:
+        if args.cmd == "sweeps":
+            table = store.sweeps(args.script, args.limit)
+        elif args.cmd == "best":
+            table = store.best_per_strategy(args.metric, args.last or None, args.script)
+        elif args.cmd == "runs":
+            table = store.runs(args.sweep, args.strategy)
+        else:
+            if args.max is None and not args.min:
+                args.max = ["annualized_return", "max_drawdown"]
+            objectives = {**{m: "max" for m in args.max or []}, **{m: "min" for m in args.min}}
+            table = pareto_front(store.runs(args.sweep, args.strategy), objectives)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(table.to_string(index=False) if len(table) else "(empty)")
+
+
+if __name__ == "__main__":
+    main()
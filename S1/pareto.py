@@ -0,0 +1,130 @@
+"""Pareto 前沿（skyline）计算（S1，网格脚本与实验库共用）
+
+支配关系：q 在所有目标上都不差于 p、且至少一个目标严格更好时 q 支配 p；完全相同的点互不支配，都留在前沿上。
+
+- 两个目标：按第一个目标降序排序后扫描第二个目标的前缀最大值，O(n log n)。
+- k 个目标：sort-filter-skyline 形式的分块 block-nested-loop。先按目标之和（再按各目标字典序）降序排序，
+  支配者必然排在被支配者之前，因此每块候选点只需与已确定的前沿及块内点比较（NumPy 广播），
+  复杂度约 O(n log n + n·|前沿|·k)。
+
+    mask = pareto_mask(values, maximize=[True, True, False])       # (n, k) 数组
+    front = pareto_front(table, {"annualized_return": "max", "max_drawdown": "max", "volatility": "min"})
+    rank = pareto_rank(values, maximize=[True, True, False])       # 0 = 前沿，1 = 去掉前沿后的前沿……
+
+含 NaN 的行不在前沿上，也不参与支配其他行。
+"""
+from typing import Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# candidates compared against the current front per block in the k-objective method
+BLOCK_SIZE = 256
+
+
+def _oriented(values, maximize) -> np.ndarray:
+    """(n, k) float array with every objective turned into "larger is better"."""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    if values.ndim != 2:
+        raise ValueError(f"values must be 1-D or 2-D, got shape {values.shape}")
+    sign = np.where(np.broadcast_to(np.asarray(maximize, dtype=bool), (values.shape[1],)), 1.0, -1.0)
+    return values * sign
+
+
+def _front_2d(v: np.ndarray) -> np.ndarray:
+    # sort by x descending, then y descending; a point survives iff its y beats every y with a larger x
+    # and is the largest y among the points sharing its x
+    order = np.lexsort((-v[:, 1], -v[:, 0]))
+    x, y = v[order, 0], v[order, 1]
+    starts = np.flatnonzero(np.concatenate([[True], x[1:] != x[:-1]]))
+    group_max = np.maximum.reduceat(y, starts)
+    best_before = np.concatenate([[-np.inf], np.maximum.accumulate(group_max)[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(x))))
+    keep = ((y > best_before[group]) | (group == 0)) & (y == group_max[group])
+    mask = np.zeros(len(v), dtype=bool)
+    mask[order[keep]] = True
+    return mask
+
+
+def _dominated_by(candidates: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """dominated[i]: some row of `others` dominates candidates[i]."""
+    if len(others) == 0:
+        return np.zeros(len(candidates), dtype=bool)
+    ge = (others[None, :, :] >= candidates[:, None, :]).all(axis=2)
+    gt = (others[None, :, :] > candidates[:, None, :]).any(axis=2)
+    return (ge & gt).any(axis=1)
+
+
+def _front_bnl(v: np.ndarray, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    # float addition is monotone, so a dominator's sum is >= the dominated point's; ties in the sum are
+    # broken lexicographically, where a dominator is strictly larger
+    keys = [-v[:, j] for j in range(v.shape[1] - 1, -1, -1)] + [-v.sum(axis=1)]
+    order = np.lexsort(keys)
+    front = np.empty((0, v.shape[1]))
+    kept = []
+    for start in range(0, len(order), block_size):
+        idx = order[start:start + block_size]
+        block = v[idx]
+        alive = ~_dominated_by(block, front)
+        idx, block = idx[alive], block[alive]
+        alive = ~_dominated_by(block, block)
+        kept.append(idx[alive])
+        front = np.vstack([front, block[alive]])
+    mask = np.zeros(len(v), dtype=bool)
+    if kept:
+        mask[np.concatenate(kept)] = True
+    return mask
+
+
+def pareto_mask(values, maximize: Union[bool, Sequence[bool]] = True) -> np.ndarray:
+    """values 为 (n, k) 目标矩阵（或一维的单目标），返回 n 个布尔值：True 表示该行不被任何行支配。
+
+    maximize：每个目标是否越大越好（单个布尔值作用于全部目标）。
+    """
+    v = _oriented(values, maximize)
+    mask = np.zeros(len(v), dtype=bool)
+    valid = ~np.isnan(v).any(axis=1)
+    if not valid.any():
+        return mask
+    vv = v[valid]
+    if vv.shape[1] == 1:
+        sub = vv[:, 0] == vv[:, 0].max()
+    elif vv.shape[1] == 2:
+        sub = _front_2d(vv)
+    else:
+        sub = _front_bnl(vv)
+    mask[np.flatnonzero(valid)[sub]] = True
+    return mask
+
+
+def pareto_rank(values, maximize: Union[bool, Sequence[bool]] = True) -> np.ndarray:
+    """非支配排序的层号：0 为 Pareto 前沿，去掉它后的前沿为 1，依此类推；含 NaN 的行为 NaN。"""
+    v = _oriented(values, maximize)
+    rank = np.full(len(v), np.nan)
+    remaining = np.flatnonzero(~np.isnan(v).any(axis=1))
+    level = 0
+    while len(remaining):
+        on_front = pareto_mask(v[remaining])
+        rank[remaining[on_front]] = level
+        remaining = remaining[~on_front]
+        level += 1
+    return rank
+
+
+def pareto_front(table: pd.DataFrame, objectives: Union[Mapping[str, str], Sequence[str]]) -> pd.DataFrame:
+    """任意实验表（网格 CSV、ExperimentStore.runs() 等）上的 Pareto 前沿行，保持原有顺序。
+
+    objectives：{列名: "max" | "min"}，或列名序列（全部越大越好）。非数值按 NaN 处理。
+    """
+    if not isinstance(objectives, Mapping):
+        objectives = {col: "max" for col in objectives}
+    for col, sense in objectives.items():
+        if sense not in ("max", "min"):
+            raise ValueError(f"objective {col!r} must be 'max' or 'min', got {sense!r}")
+    if not objectives:
+        raise ValueError("at least one objective is required")
+    values = np.column_stack([pd.to_numeric(table[col], errors="coerce").to_numpy(dtype=float)
+                              for col in objectives])
+    return table[pareto_mask(values, [s == "max" for s in objectives.values()])]
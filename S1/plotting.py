@@ -0,0 +1,154 @@
+"""净值/回撤图的渲染工具（S1，S2/S3 与网格脚本共用）
+
+- lttb_indices / downsample：Largest-Triangle-Three-Buckets 降采样，长序列只保留 max_points 个点，
+  仍保留峰谷形状（图宽约 1000 像素，几千个点已足够）。
+- plot_equity / plot_drawdown：用面向对象的 Figure + Agg 画布出图，不经过 pyplot 的全局状态，
+  可以在多进程中并发渲染；matplotlib 只在真正画图时导入。
+- render_run_dir / render_run_dirs：把“回测”和“画图”拆成两个阶段——网格先以 artifacts="data"
+  跑完所有格点（只写 equity.csv 等），再从保存的 equity.csv 在进程池中渲染 png，完成一个输出一个。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 2000
+
+
+def lttb_indices(x, y, max_points: int) -> np.ndarray:
+    """LTTB 降采样：返回保留点的下标（升序，含首尾两点）。
+
+    中间的点均分为 max_points-2 个桶，每个桶保留与“上一个保留点”和“下一个桶的均值点”
+    构成三角形面积最大的点。点数不超过 max_points（或 max_points < 3）时返回全部下标。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    n_buckets = max_points - 2
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+    lo, hi = edges[:-1], edges[1:]
+    # mean point of every bucket via prefix sums; the last bucket looks ahead to the final point
+    cx = np.concatenate([[0.0], np.cumsum(x)])
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    width = hi - lo
+    next_x = np.append(((cx[hi] - cx[lo]) / width)[1:], x[-1])
+    next_y = np.append(((cy[hi] - cy[lo]) / width)[1:], y[-1])
+
+    out = np.empty(max_points, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for j in range(n_buckets):
+        s, e = lo[j], hi[j]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[j]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[j] - ay))
+        a = s + int(np.argmax(area))
+        out[j + 1] = a
+    return out
+
+
+def downsample(times: pd.DatetimeIndex, values, max_points: Optional[int] = DEFAULT_MAX_POINTS
+               ) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """按时间轴做 LTTB 降采样；max_points=None 时原样返回。NaN 点先被丢弃。"""
+    times = pd.DatetimeIndex(times)
+    values = np.asarray(values, dtype=float)
+    keep = ~np.isnan(values)
+    if not keep.all():
+        times, values = times[keep], values[keep]
+    if max_points is None or len(values) <= max_points:
+        return times, values
+    x = (times.asi8 - times.asi8[0]).astype(float) if len(times) else np.empty(0)
+    idx = lttb_indices(x, values, max_points)
+    return times[idx], values[idx]
+
+
+def _new_figure(figsize):
+    # object-oriented API on an Agg canvas: no pyplot global state, safe in worker processes
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _save_line(times, values, path: str, title: str, figsize, label: Optional[str] = None,
+               color: Optional[str] = None, max_points: Optional[int] = DEFAULT_MAX_POINTS) -> str:
+    times, values = downsample(times, values, max_points)
+    fig = _new_figure(figsize)
+    ax = fig.add_subplot()
+    ax.plot(times, values, label=label, color=color)
+    ax.set_title(title)
+    if label is not None:
+        ax.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def plot_equity(times, equity, path: str, title: str = "Equity Curve", label: Optional[str] = "Equity",
+                max_points: Optional[int] = DEFAULT_MAX_POINTS) -> str:
+    """净值曲线 png。"""
+    return _save_line(times, equity, path, title, (10, 4), label=label, max_points=max_points)
+
+
+def plot_drawdown(times, equity, path: str, title: str = "Drawdown",
+                  max_points: Optional[int] = DEFAULT_MAX_POINTS) -> str:
+    """回撤曲线 png：在完整序列上算回撤，再降采样。"""
+    equity = np.asarray(equity, dtype=float)
+    running_max = np.fmax.accumulate(equity)
+    drawdown = (equity - running_max) / running_max
+    return _save_line(times, drawdown, path, title, (10, 3), color="red", max_points=max_points)
+
+
+def load_equity_csv(path: str) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """读取回测写出的 equity.csv（datetime, equity 两列）。"""
+    df = pd.read_csv(path)
+    return pd.DatetimeIndex(pd.to_datetime(df["datetime"])), df["equity"].to_numpy(dtype=float)
+
+
+def render_run_dir(run_dir: str, drawdown: bool = False, title: str = "Equity",
+                   max_points: Optional[int] = DEFAULT_MAX_POINTS) -> List[str]:
+    """从 run_dir/equity.csv 渲染 equity.png（drawdown=True 时再加 drawdown.png），返回写出的路径。"""
+    times, equity = load_equity_csv(os.path.join(run_dir, "equity.csv"))
+    paths = [plot_equity(times, equity, os.path.join(run_dir, "equity.png"), title=title, label=None,
+                         max_points=max_points)]
+    if drawdown:
+        paths.append(plot_drawdown(times, equity, os.path.join(run_dir, "drawdown.png"), max_points=max_points))
+    return paths
+
+
+def render_run_dirs(run_dirs: Iterable[str], jobs: Optional[int] = None, drawdown: bool = False,
+                    title: str = "Equity", max_points: Optional[int] = DEFAULT_MAX_POINTS,
+                    return_exceptions: bool = False) -> Iterator[Tuple[str, Union[List[str], Exception]]]:
+    """在进程池中渲染多个运行目录的图，按完成顺序产出 (run_dir, 写出的 png 路径)。
+
+    jobs=None 时使用全部 CPU；jobs <= 1 时在当前进程中依次渲染。某个目录渲染失败时异常在迭代到它时抛出；
+    return_exceptions=True 时改为产出 (run_dir, 异常) 并继续渲染其余目录。
+    """
+    run_dirs = list(run_dirs)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(run_dirs) <= 1:
+        for run_dir in run_dirs:
+            try:
+                paths = render_run_dir(run_dir, drawdown, title, max_points)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                paths = e
+            yield run_dir, paths
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(run_dirs))) as pool:
+        futures = {pool.submit(render_run_dir, run_dir, drawdown, title, max_points): run_dir
+                   for run_dir in run_dirs}
+        for fut in as_completed(futures):
+            error = fut.exception()
+            if error is not None and not return_exceptions:
+                raise error
+            yield futures[fut], fut.result() if error is None else error
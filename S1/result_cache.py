@@ -0,0 +1,363 @@
+"""回测结果的内容寻址缓存（S1，S2/S3 与网格脚本共用）
+
+键 = 对 (数据集指纹, 回测函数, 全部参数, 代码指纹) 做哈希：数据、策略/引擎参数（sl_pct、tp_pct、fee、
+Kelly 设置……）与 S1/S2/S3 源码都不变时，直接返回上次的 metrics/equity/trades，并把当时写出的
+文件（metrics.json、equity.csv……）恢复到 out_dir。参数里的 kelly_dir 按其中 CSV 文件的内容计入键，
+重新生成 Kelly 估计后旧结果自动失效。
+
+    cache = ResultCache("results/cache", max_bytes=1 << 30)
+    out = cached_backtest(cache, backtest, df, out_dir="results/s2/ma", sl_pct=0.05, tp_pct=0.2)
+
+每个条目是 root/<键前两位>/<键>/ 目录（result.pkl、meta.json、files/），meta.json 记录条目大小。
+进程内维护缓存总大小的累计值，超过 max_bytes 时才扫描全部条目，按最近使用时间淘汰到
+EVICT_TO * max_bytes 以下。命令行：
+
+    python -m S1.result_cache stats
+    python -m S1.result_cache invalidate --match backtest=S2.strategies.rsi.backtest params.sl_pct=0.05
+    python -m S1.result_cache invalidate --all
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from S1.backtest import ARTIFACT_LEVELS, check_artifacts
+from S1.strategies.common import dataset_fingerprint
+
+DEFAULT_CACHE_DIR = os.path.join("results", "cache")
+DEFAULT_MAX_BYTES = 1 << 30
+# eviction frees down to this fraction of max_bytes, so a full cache is not rescanned on every put
+EVICT_TO = 0.8
+# price columns the backtesters read (signals depend on a subset of them)
+BACKTEST_COLUMNS = ("datetime", "open", "high", "low", "close")
+_CODE_PACKAGES = ("S1", "S2", "S3")
+
+
+def _jsonable(obj):
+    """把参数转换成可稳定序列化的形式；数组/Series 等大对象用内容哈希代替。"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (pd.Series, pd.DataFrame, pd.Index)):
+        h = hashlib.blake2b(pd.util.hash_pandas_object(obj).to_numpy().tobytes(), digest_size=16)
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+        elif isinstance(obj, pd.Series):
+            h.update(repr([obj.name]).encode())
+        return f"{type(obj).__name__}:{h.hexdigest()}"
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        h = hashlib.blake2b(arr.tobytes(), digest_size=16)
+        h.update(f"{arr.dtype}{arr.shape}".encode())
+        return f"ndarray:{h.hexdigest()}"
+    if callable(obj):
+        return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}"
+    return repr(obj)
+
+
+def make_key(parts: Dict) -> str:
+    """参数字典的规范 JSON（键排序）的哈希。"""
+    blob = json.dumps(parts, sort_keys=True, default=_jsonable, separators=(",", ":"))
+    return hashlib.blake2b(blob.encode(), digest_size=20).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint(packages=_CODE_PACKAGES) -> str:
+    """S1/S2/S3 全部 .py 源码的哈希（每个进程只算一次）：任何代码改动都会使旧结果失效。"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    h = hashlib.blake2b(digest_size=16)
+    for pkg in packages:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, pkg)):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for name in sorted(filenames):
+                if name.endswith(".py"):
+                    path = os.path.join(dirpath, name)
+                    h.update(os.path.relpath(path, root).encode())
+                    with open(path, "rb") as f:
+                        h.update(f.read())
+    return h.hexdigest()
+
+
+def files_fingerprint(path: str, suffix: str = ".csv") -> str:
+    """目录 path 下所有以 suffix 结尾的文件（文件名 + 内容）的哈希；目录不存在时为空串。"""
+    if not os.path.isdir(path):
+        return ""
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if name.endswith(suffix) and os.path.isfile(full):
+            h.update(name.encode())
+            with open(full, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()
+
+
+def _file_stats(path: Optional[str]) -> Dict[str, tuple]:
+    """{文件名: (mtime_ns, size)}，用来找出一次回测新写或改写的文件。"""
+    if path is None or not os.path.isdir(path):
+        return {}
+    stats = {}
+    for name in os.listdir(path):
+        try:
+            st = os.stat(os.path.join(path, name))
+        except OSError:
+            continue
+        if not os.path.isdir(os.path.join(path, name)):
+            stats[name] = (st.st_mtime_ns, st.st_size)
+    return stats
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _lookup(parts: Dict, dotted: str):
+    value = parts
+    for k in dotted.split("."):
+        if not isinstance(value, dict) or k not in value:
+            return None
+        value = value[k]
+    return value
+
+
+class ResultCache:
+    """磁盘上的回测结果缓存，带命中/未命中计数与按大小的 LRU 淘汰（max_bytes <= 0 表示不限）。
+
+    条目写入临时目录后整体 rename，多个进程可以共用同一个 root。
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # running total of the cache size: None until the first scan, then grown by every put
+        self._bytes = None
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _entries(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for shard in sorted(os.listdir(self.root)):
+            shard_dir = os.path.join(self.root, shard)
+            if len(shard) == 2 and os.path.isdir(shard_dir):
+                out.extend(os.path.join(shard_dir, k) for k in sorted(os.listdir(shard_dir)))
+        return out
+
+    def get(self, key: str, out_dir: Optional[str] = None, artifacts: str = "none") -> Optional[dict]:
+        """命中时返回缓存的结果，并把条目中保存的文件复制到 out_dir。
+
+        条目保存时的 artifacts 级别低于本次要求（例如缓存里没有 equity.csv）时视为未命中。
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, "meta.json")) as f:
+                meta = json.load(f)
+            if ARTIFACT_LEVELS.index(meta["artifacts"]) < ARTIFACT_LEVELS.index(artifacts):
+                raise LookupError(key)
+            with open(os.path.join(entry, "result.pkl"), "rb") as f:
+                result = pickle.load(f)
+            if out_dir is not None and artifacts != "none":
+                files = os.path.join(entry, "files")
+                os.makedirs(out_dir, exist_ok=True)
+                for name in meta["files"]:
+                    shutil.copy2(os.path.join(files, name), os.path.join(out_dir, name))
+            os.utime(os.path.join(entry, "meta.json"))
+        except (OSError, LookupError, KeyError, ValueError, EOFError, pickle.UnpicklingError):
+            # missing, partially evicted or insufficient entry
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict, parts: Optional[Dict] = None, out_dir: Optional[str] = None,
+            artifacts: str = "none", before: Optional[Dict[str, tuple]] = None) -> None:
+        """保存结果；artifacts 不为 "none" 时同时保存 out_dir 中回测写出的文件。
+
+        before 为回测前 out_dir 的 _file_stats：给出时只保存本次新写或改写的文件，
+        之前运行残留的文件（旧图片等）不进入条目。
+        """
+        tmp = os.path.join(self.root, f"tmp-{uuid.uuid4().hex}")
+        os.makedirs(os.path.join(tmp, "files"))
+        try:
+            names = []
+            if out_dir is not None and artifacts != "none" and os.path.isdir(out_dir):
+                for name, stat in sorted(_file_stats(out_dir).items()):
+                    src = os.path.join(out_dir, name)
+                    if before is None or before.get(name) != stat:
+                        shutil.copy2(src, os.path.join(tmp, "files", name))
+                        names.append(name)
+            with open(os.path.join(tmp, "result.pkl"), "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = _dir_size(tmp)
+            meta = {"key": key, "parts": json.loads(json.dumps(parts or {}, default=_jsonable)),
+                    "artifacts": artifacts, "files": names, "created": time.time(), "bytes": size}
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=2, sort_keys=True)
+            entry = self._entry(key)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.replace(tmp, entry)
+        except OSError:
+            # another process stored the same key concurrently; keep theirs
+            return
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        if self.max_bytes <= 0:
+            return
+        if self._bytes is None:
+            self._bytes = sum(s for _, s, _ in self._sized())
+        else:
+            self._bytes += size
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def run(self, parts: Dict, compute: Callable[[], dict], out_dir: Optional[str] = None,
+            artifacts: str = "none") -> dict:
+        """get-or-compute：命中直接返回，否则调用 compute() 并保存结果。"""
+        check_artifacts(artifacts)
+        key = make_key(parts)
+        result = self.get(key, out_dir, artifacts)
+        if result is None:
+            before = _file_stats(out_dir)
+            result = compute()
+            self.put(key, result, parts, out_dir, artifacts, before)
+        return result
+
+    def _sized(self) -> List[tuple]:
+        """(meta.json 修改时间, 条目大小, 条目目录)；大小取 meta.json 中记录的 result.pkl 与 files/ 字节数，
+        没有记录的旧条目才遍历目录。"""
+        sized = []
+        for entry in self._entries():
+            meta_path = os.path.join(entry, "meta.json")
+            try:
+                mtime = os.path.getmtime(meta_path)
+                with open(meta_path) as f:
+                    size = json.load(f).get("bytes")
+            except (OSError, ValueError):
+                continue
+            sized.append((mtime, _dir_size(entry) if size is None else size, entry))
+        return sized
+
+    def evict(self) -> int:
+        """总大小超过 max_bytes 时按 meta.json 的修改时间（最近一次保存/命中）从旧到新删除条目，
+        直到不超过 EVICT_TO * max_bytes。"""
+        if self.max_bytes <= 0:
+            return 0
+        sized = self._sized()
+        total = sum(s for _, s, _ in sized)
+        removed = 0
+        if total > self.max_bytes:
+            for _, size, entry in sorted(sized):
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed += 1
+        self._bytes = total
+        return removed
+
+    def invalidate(self, keys: Iterable[str] = (), match: Optional[Dict[str, str]] = None) -> int:
+        """删除指定键的条目，以及 meta 中参数匹配 match 的条目（键可用点号访问嵌套参数，
+        例如 {"params.sl_pct": "0.05"}，按字符串比较）。返回删除的条目数。"""
+        keys = set(keys)
+        removed = 0
+        for entry in self._entries():
+            key = os.path.basename(entry)
+            hit = key in keys
+            if not hit and match:
+                try:
+                    with open(os.path.join(entry, "meta.json")) as f:
+                        parts = json.load(f)["parts"]
+                except (OSError, ValueError, KeyError):
+                    continue
+                hit = all(str(_lookup(parts, k)) == v for k, v in match.items())
+            if hit:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def clear(self) -> int:
+        entries = self._entries()
+        for entry in entries:
+            shutil.rmtree(entry, ignore_errors=True)
+        self.hits = 0
+        self.misses = 0
+        return len(entries)
+
+    def info(self) -> dict:
+        sized = self._sized()
+        return {"entries": len(sized), "bytes": sum(s for _, s, _ in sized),
+                "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses, "root": self.root}
+
+
+def cached_backtest(cache: Optional[ResultCache], backtest: Callable, df: pd.DataFrame,
+                    out_dir: Optional[str] = None, **kwargs) -> dict:
+    """backtest(df, out_dir=out_dir, **kwargs)，经由 cache（为 None 时直接调用）。
+
+    键包含数据集指纹、回测函数全名、除 artifacts 以外的全部关键字参数与代码指纹；
+    给出 kelly_dir 时还包含其中 Kelly CSV 的内容指纹。
+    """
+    if cache is None:
+        return backtest(df, out_dir=out_dir, **kwargs)
+    artifacts = "none" if out_dir is None else kwargs.get("artifacts", "full")
+    parts = {
+        "backtest": f"{backtest.__module__}.{backtest.__qualname__}",
+        "data": dataset_fingerprint(df, BACKTEST_COLUMNS),
+        "params": {k: v for k, v in kwargs.items() if k != "artifacts"},
+        "code": code_fingerprint(),
+    }
+    if kwargs.get("kelly_dir"):
+        parts["kelly_files"] = files_fingerprint(kwargs["kelly_dir"])
+    return cache.run(parts, lambda: backtest(df, out_dir=out_dir, **kwargs), out_dir, artifacts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m S1.result_cache", description="回测结果缓存管理")
+    parser.add_argument("--root", default=DEFAULT_CACHE_DIR, help="缓存目录")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="条目数与占用空间")
+    inv = sub.add_parser("invalidate", help="删除条目")
+    inv.add_argument("keys", nargs="*", help="要删除的键")
+    inv.add_argument("--match", nargs="*", default=[], metavar="FIELD=VALUE",
+                     help="按参数匹配删除，例如 backtest=S2.strategies.rsi.backtest params.sl_pct=0.05")
+    inv.add_argument("--all", action="store_true", help="清空缓存")
+    evict = sub.add_parser("evict", help="按大小淘汰到 --max-bytes 以内")
+    evict.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.root, max_bytes=getattr(args, "max_bytes", DEFAULT_MAX_BYTES))
+    if args.cmd == "stats":
+        print(json.dumps(cache.info(), indent=2))
+    elif args.cmd == "evict":
+        print(f"evicted {cache.evict()} entries")
+    elif args.all:
+        print(f"removed {cache.clear()} entries")
+    else:
+        if not args.keys and not args.match:
+            parser.error("invalidate needs keys, --match or --all")
+        match = dict(m.split("=", 1) for m in args.match)
+        print(f"removed {cache.invalidate(args.keys, match or None)} entries")
+
+
+if __name__ == "__main__":
+    main()
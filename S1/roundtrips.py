@@ -0,0 +1,99 @@
+"""买卖配对：从回测成交记录生成逐笔往返交易表（S1，S2/S3 与 scripts 共用）
+
+各回测引擎的 trades（trades.csv）是交替出现的 buy/sell 行（datetime, side, price, qty, cash[, reason]）。
+round_trips 把每个 buy 与紧随其后的 sell 向量化地配对，得到每笔往返交易：
+
+    entry_time / exit_time、entry_price / exit_price、qty、
+    return（扣除双边手续费：exit*(1-fee) / (entry*(1+fee)) - 1）、pnl（卖出所得 - 买入成本）、
+    holding_bars（给出 K 线索引时为持有的 bar 数）、exit_reason（S2/S3 的 signal_exit/sl/tp/liquidate_end，
+    S1 的卖出均为 signal_exit）
+
+回测以 artifacts="data"/"full" 运行时写出 roundtrips.csv；scripts/kelly_estimate.py 据此做离散 Kelly 估计。
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+ROUNDTRIP_COLUMNS = ("entry_time", "exit_time", "entry_price", "exit_price", "qty", "return", "pnl",
+                     "holding_bars", "exit_reason")
+# column names of the engines' trade logs
+TRADE_COLUMNS = ("datetime", "side", "price", "qty", "cash")
+
+
+def _trade_frame(trades) -> pd.DataFrame:
+    if isinstance(trades, pd.DataFrame):
+        return trades
+    if hasattr(trades, "to_frame"):
+        # S2/S3 TradeLog
+        return trades.to_frame(reason_column=True)
+    return pd.DataFrame(list(trades))
+
+
+def _naive_utc(times) -> pd.DatetimeIndex:
+    times = pd.DatetimeIndex(pd.to_datetime(times, format="ISO8601"))
+    if times.tz is not None:
+        times = times.tz_convert("UTC").tz_localize(None)
+    return times
+
+
+def is_trade_log(columns) -> bool:
+    """columns 是否为引擎输出的 buy/sell 成交表（而不是已有逐笔收益的表）。"""
+    return set(TRADE_COLUMNS[1:]).issubset(columns)
+
+
+def round_trips(trades, index=None, fee: Optional[float] = None) -> pd.DataFrame:
+    """把 buy→sell 成交配对成往返交易表（列见 ROUNDTRIP_COLUMNS），按时间顺序。
+
+    trades：TradeLog、成交 dict 列表或 trades.csv 读出的 DataFrame，须按时间排序且 buy/sell 交替；
+    末尾未平仓的 buy 不计入（开头没有对应 buy 的 sell 同样忽略）。
+    index：回测的 K 线时间索引，给出时计算 holding_bars（否则为缺失值）；tz-aware 与 naive UTC 均可。
+    fee：单边手续费率；为 None 时由卖出腿的 cash 变化反推（各引擎两边费率相同）。
+    """
+    frame = _trade_frame(trades)
+    if frame.empty:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in ROUNDTRIP_COLUMNS})
+    is_buy = frame["side"].to_numpy(dtype=object) == "buy"
+    if (is_buy[1:] == is_buy[:-1]).any():
+        raise ValueError("trades must alternate buy/sell")
+    entry = np.flatnonzero(is_buy[:-1])
+    exit_ = entry + 1
+
+    price = frame["price"].to_numpy(dtype=float)
+    qty = frame["qty"].to_numpy(dtype=float)
+    entry_price, exit_price, entry_qty = price[entry], price[exit_], qty[entry]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if fee is None:
+            cash = frame["cash"].to_numpy(dtype=float)
+            # cash is unchanged while the position is held, so the sell leg's cash delta is the proceeds
+            proceeds = cash[exit_] - cash[entry]
+            fee = 1 - proceeds / (qty[exit_] * exit_price)
+        else:
+            proceeds = qty[exit_] * exit_price * (1 - fee)
+        cost = entry_qty * entry_price * (1 + fee)
+        ret = proceeds / cost - 1
+
+    times = frame["datetime"]
+    if index is not None and len(entry):
+        bars = _naive_utc(index)
+        pos = bars.searchsorted(_naive_utc(times.to_numpy()))
+        holding = pd.array(pos[exit_] - pos[entry], dtype="Int64")
+    else:
+        holding = pd.array([pd.NA] * len(entry), dtype="Int64")
+    if "reason" in frame.columns:
+        reason = frame["reason"].to_numpy(dtype=object)[exit_]
+        reason = np.where(pd.isna(reason), "signal_exit", reason)
+    else:
+        reason = np.full(len(entry), "signal_exit", dtype=object)
+
+    return pd.DataFrame({
+        "entry_time": times.to_numpy()[entry],
+        "exit_time": times.to_numpy()[exit_],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "qty": entry_qty,
+        "return": ret,
+        "pnl": proceeds - cost,
+        "holding_bars": holding,
+        "exit_reason": reason,
+    })
@@ -21,11 +21,12 @@ STRATEGIES = [
 ]
 
 
-def run(start: str = None, end: str = None, update: bool = True, out_root: str = "results/s1"):
+def run(start: str = None, end: str = None, update: bool = True, out_root: str = "results/s1",
+        save_path: str = "data/raw/btc_daily.csv"):
     # ensure data available
     os.makedirs(out_root, exist_ok=True)
     print("Downloading/updating data...")
-    df = download_and_cache(start=None, end=None, save_path="data/raw/btc_daily.csv", update=update)
+    df = download_and_cache(start=None, end=None, save_path=save_path, update=update)
     if df.empty:
         raise RuntimeError("no data downloaded")
 
@@ -50,9 +51,10 @@ def cli():
     p.add_argument("--start", default=None)
     p.add_argument("--end", default=None)
     p.add_argument("--no-update", action="store_true")
+    p.add_argument("--save", default="data/raw/btc_daily.csv", help="数据缓存路径，扩展名决定格式（.csv/.parquet/.feather/.cols）")
     p.add_argument("--only", nargs="*", help="限定要跑的策略名称，例如 ma_crossover rsi")
     args = p.parse_args()
-    run(start=args.start, end=args.end, update=not args.no_update)
+    run(start=args.start, end=args.end, update=not args.no_update, save_path=args.save)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""策略公用工具（S1）
+
+latch_positions：把买入/卖出事件转换为 0/1 持仓序列的向量化状态机，供各策略的 generate_signals 共用。
+IndicatorCache / INDICATOR_CACHE：按 (数据集指纹, 指标, 参数) 的 LRU 缓存，网格扫描中重复调用
+generate_signals(df) 时直接复用已算好的指标与信号；hits/misses 计数可用于确认复用。
+缓存同时按条目数与字节数（Series/数组的 nbytes 之和）限制大小，分钟线上的长序列不会无限占用内存。
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# columns the S1 generators read; other columns do not affect cached indicators/signals
+FINGERPRINT_COLUMNS = ("datetime", "close")
+# default byte budget of INDICATOR_CACHE (a million-bar float Series with its index is ~16 MB)
+INDICATOR_CACHE_BYTES = 256 << 20
+
+
+def latch_positions(cond_buy, cond_sell) -> np.ndarray:
+    """向量化的持仓锁存：空仓遇买入事件置 1，持仓遇卖出事件置 0，其余时间保持上一状态（初始为 0）。
+
+    与逐 bar 循环 `if buy and pos == 0: pos = 1 elif sell and pos == 1: pos = 0` 完全等价：
+    只有买入（或只有卖出）的 bar 把状态设为 1（或 0）；买卖同时成立的 bar 会翻转当前状态。
+    因此状态 = 最近一次单边事件的取值，再按其后“同时成立”的次数奇偶翻转。
+
+    cond_buy / cond_sell 为布尔数组（或 Series），形状 (T,) 或 (N, T)，沿最后一维计算。
+    返回同形状的 int64 数组。
+    """
+    buy = np.asarray(cond_buy, dtype=bool)
+    sell = np.asarray(cond_sell, dtype=bool)
+    if buy.shape != sell.shape:
+        raise ValueError(f"cond_buy shape {buy.shape} != cond_sell shape {sell.shape}")
+    n = buy.shape[-1]
+    itype = np.int32 if 2 * n + 2 < 2 ** 31 else np.int64
+
+    # code = 2*t + value at set/reset bars, -1 elsewhere; its running max is the latest
+    # one-sided event (position in the high bits, resulting state in the low bit)
+    code = np.where(buy ^ sell, np.arange(n, dtype=itype) * 2 + buy.astype(itype), -1).astype(itype, copy=False)
+    np.maximum.accumulate(code, axis=-1, out=code)
+    seen = code >= 0
+    base = seen & (code & 1).astype(bool)
+
+    # toggles (buy and sell on the same bar) since that event flip the state
+    toggle = buy & sell
+    if not toggle.any():
+        return base.astype(np.int64)
+    n_toggle = np.cumsum(toggle, axis=-1, dtype=itype)
+    n_before = np.where(seen, np.take_along_axis(n_toggle, np.maximum(code >> 1, 0), axis=-1), 0)
+    return (base.astype(np.int64) ^ ((n_toggle - n_before) & 1)).astype(np.int64)
+
+
+def dataset_fingerprint(df: pd.DataFrame, columns=FINGERPRINT_COLUMNS) -> str:
+    """数据集指纹：对行索引与 columns 中各列的原始字节做哈希，内容不变则指纹不变。
+
+    默认只哈希策略实际用到的 datetime/close；缓存依赖其他列的指标时需传入相应 columns。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    idx = df.index
+    if isinstance(idx, pd.RangeIndex):
+        h.update(repr((idx.start, idx.stop, idx.step)).encode())
+    else:
+        h.update(pd.util.hash_pandas_object(idx, index=False).to_numpy().tobytes())
+    for col in columns:
+        if col not in df.columns:
+            continue
+        s = df[col]
+        if col == "datetime":
+            dt = pd.DatetimeIndex(s)
+            arr = dt.asi8
+            h.update(str(dt.dtype).encode())
+        else:
+            arr = s.to_numpy(dtype=float)
+        h.update(col.encode())
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def _nbytes(value) -> int:
+    """Series/DataFrame（含索引）或 numpy 数组占用的字节数；其他对象按 0 计。"""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=True)))
+    return int(getattr(value, "nbytes", 0))
+
+
+class IndicatorCache:
+    """按 (数据集指纹, 指标名, 参数) 缓存指标/信号结果的 LRU 缓存，带命中/未命中计数。
+
+    条目数超过 maxsize 或总字节数超过 max_bytes 时淘汰最久未用的条目；单个结果大于 max_bytes 时不缓存。
+    maxsize <= 0 时不缓存（每次都重新计算并计为 miss）。缓存的对象被多次调用共享，调用方不应原地修改。
+    """
+
+    def __init__(self, maxsize: int = 64, max_bytes: int = INDICATOR_CACHE_BYTES):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._data = OrderedDict()
+
+    def get(self, key, compute):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+        self.misses += 1
+        value = compute()
+        size = _nbytes(value)
+        if self.maxsize > 0 and size <= self.max_bytes:
+            self._data[key] = (value, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or self.bytes > self.max_bytes:
+                self.bytes -= self._data.popitem(last=False)[1][1]
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize,
+                "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# process-wide cache shared by all S1 strategies (and the S2/S3 wrappers that call them)
+INDICATOR_CACHE = IndicatorCache()
@@ -2,31 +2,101 @@
 
 规则：短期 MA=5 上穿长期 MA=20 买入；下穿卖出。
 generate_signals(df) 返回对齐 df 的 1/0 序列，禁止 look-ahead（使用 shift 比较）。
+参数扫描用 generate_signals_matrix(df, pairs)：一次算出所有窗口的 MA 矩阵，并为每个 (short, long) 组合给出信号行。
 """
+import numpy as np
 import pandas as pd
 
+from S1.strategies.common import INDICATOR_CACHE, dataset_fingerprint, latch_positions
 
 SHORT = 5
 LONG = 20
 
 
+def _sma(df: pd.DataFrame, fp: str, window: int) -> pd.Series:
+    return INDICATOR_CACHE.get((fp, "sma", ("close", window)), lambda: df["close"].rolling(window).mean())
+
+
 def generate_signals(df: pd.DataFrame) -> pd.Series:
-    df2 = df.copy()
-    df2["ma_short"] = df2["close"].rolling(SHORT).mean()
-    df2["ma_long"] = df2["close"].rolling(LONG).mean()
-    # signal when short crosses above long, using previous bar to avoid look-ahead
-    cond_buy = (df2["ma_short"].shift(1) <= df2["ma_long"].shift(1)) & (df2["ma_short"] > df2["ma_long"])
-    cond_sell = (df2["ma_short"].shift(1) >= df2["ma_long"].shift(1)) & (df2["ma_short"] < df2["ma_long"])
-    sig = pd.Series(0, index=df2.index)
-    position = 0
-    for i in range(len(df2)):
-        if cond_buy.iloc[i] and position == 0:
-            position = 1
-        elif cond_sell.iloc[i] and position == 1:
-            position = 0
-        sig.iloc[i] = position
-    # return series aligned with datetime column
-    return pd.Series(sig.values, index=df2["datetime"]) 
+    fp = dataset_fingerprint(df)
+
+    def compute():
+        ma_short = _sma(df, fp, SHORT)
+        ma_long = _sma(df, fp, LONG)
+        # signal when short crosses above long, using previous bar to avoid look-ahead
+        cond_buy = (ma_short.shift(1) <= ma_long.shift(1)) & (ma_short > ma_long)
+        cond_sell = (ma_short.shift(1) >= ma_long.shift(1)) & (ma_short < ma_long)
+        # return series aligned with datetime column
+        return pd.Series(latch_positions(cond_buy, cond_sell), index=df["datetime"])
+
+    # copy so callers can modify the result without corrupting the cache
+    return INDICATOR_CACHE.get((fp, "ma_crossover", (SHORT, LONG)), compute).copy()
+
+
+def sma_matrix(close, windows) -> np.ndarray:
+    """所有窗口的简单移动平均，形状 (T, W)；只做一次累加和，每个窗口只是两列相减。
+
+    与 close.rolling(w).mean() 一致（前 w-1 个值及窗口内含 NaN 时为 NaN），数值差异在浮点舍入量级。
+    """
+    x = np.asarray(close, dtype=float)
+    w = np.asarray(windows, dtype=np.int64)
+    if w.ndim != 1 or (w < 1).any():
+        raise ValueError(f"windows must be positive integers, got {windows!r}")
+    nan = np.isnan(x)
+    # centre the series so the running sum stays small and subtraction loses little precision
+    shift = float(np.mean(x[~nan])) if (~nan).any() else 0.0
+    csum = np.concatenate([[0.0], np.cumsum(np.where(nan, 0.0, x - shift))])
+    cnan = np.concatenate([[0], np.cumsum(nan)]) if nan.any() else None
+    # one row per window (contiguous slices of the same cumsum); returned transposed as (T, W)
+    out = np.full((len(w), len(x)), np.nan)
+    for k, win in enumerate(w):
+        if win > len(x):
+            continue
+        row = out[k, win - 1:]
+        np.subtract(csum[win:], csum[:-win], out=row)
+        row /= win
+        row += shift
+        if cnan is not None:
+            row[cnan[win:] - cnan[:-win] > 0] = np.nan
+    return out.T
+
+
+def ema_matrix(close, spans) -> np.ndarray:
+    """所有 span 的 EMA（adjust=False，与 MACD 策略相同），形状 (T, W)。EMA 是递推，每个 span 一次 C 级 ewm。"""
+    s = pd.Series(np.asarray(close, dtype=float))
+    return np.column_stack([s.ewm(span=int(span), adjust=False).mean().to_numpy() for span in spans])
+
+
+def crossover_matrix(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """(T, P) 的快线/慢线矩阵 -> (P, T) 的 1/0 持仓矩阵，规则与 generate_signals 相同。"""
+    f, s = np.asarray(fast, dtype=float).T, np.asarray(slow, dtype=float).T
+    # the first bar has no previous value (shift(1) -> NaN), so it never triggers
+    cond_buy = np.zeros(f.shape, dtype=bool)
+    cond_sell = np.zeros(f.shape, dtype=bool)
+    cond_buy[:, 1:] = (f[:, :-1] <= s[:, :-1]) & (f[:, 1:] > s[:, 1:])
+    cond_sell[:, 1:] = (f[:, :-1] >= s[:, :-1]) & (f[:, 1:] < s[:, 1:])
+    return latch_positions(cond_buy, cond_sell)
+
+
+def generate_signals_matrix(df: pd.DataFrame, pairs, kind: str = "sma") -> np.ndarray:
+    """对每个 (short, long) 组合生成信号，返回 (P, T) 数组，行按 pairs 顺序、列与 df 行位置对齐。
+
+    kind="sma" 用 sma_matrix（与 generate_signals 相同的 rolling mean），kind="ema" 用 ema_matrix。
+    结果可直接作为 signals_matrix 传给 S2/S3 的 run_backtest_batch（df 需已按时间排序）。
+    """
+    pairs = [(int(a), int(b)) for a, b in pairs]
+    windows = sorted({w for pair in pairs for w in pair})
+    if kind == "sma":
+        ma = sma_matrix(df["close"], windows)
+    elif kind == "ema":
+        ma = ema_matrix(df["close"], windows)
+    else:
+        raise ValueError(f"unknown kind {kind!r}; expected 'sma' or 'ema'")
+    col = {w: i for i, w in enumerate(windows)}
+    # gather whole rows of the (W, T) layout, then hand crossover_matrix its (T, P) views
+    fast = ma.T[[col[a] for a, _ in pairs]].T
+    slow = ma.T[[col[b] for _, b in pairs]].T
+    return crossover_matrix(fast, slow)
 
 
 def backtest(df, signals, out_dir, **kwargs):
@@ -4,28 +4,28 @@
 """
 import pandas as pd
 
+from S1.strategies.common import INDICATOR_CACHE, dataset_fingerprint, latch_positions
+
 
 def _ema(series: pd.Series, span: int) -> pd.Series:
     return series.ewm(span=span, adjust=False).mean()
 
 
 def generate_signals(df: pd.DataFrame) -> pd.Series:
-    s = df["close"]
-    ema12 = _ema(s, 12)
-    ema26 = _ema(s, 26)
-    macd = ema12 - ema26
-    signal = _ema(macd, 9)
-    cond_buy = (macd.shift(1) <= signal.shift(1)) & (macd > signal)
-    cond_sell = (macd.shift(1) >= signal.shift(1)) & (macd < signal)
-    sig = pd.Series(0, index=df.index)
-    position = 0
-    for i in range(len(df)):
-        if cond_buy.iloc[i] and position == 0:
-            position = 1
-        elif cond_sell.iloc[i] and position == 1:
-            position = 0
-        sig.iloc[i] = position
-    return pd.Series(sig.values, index=df["datetime"]) 
+    fp = dataset_fingerprint(df)
+
+    def compute():
+        s = df["close"]
+        ema12 = INDICATOR_CACHE.get((fp, "ema", ("close", 12)), lambda: _ema(s, 12))
+        ema26 = INDICATOR_CACHE.get((fp, "ema", ("close", 26)), lambda: _ema(s, 26))
+        macd = ema12 - ema26
+        signal = INDICATOR_CACHE.get((fp, "macd_signal", (12, 26, 9)), lambda: _ema(macd, 9))
+        cond_buy = (macd.shift(1) <= signal.shift(1)) & (macd > signal)
+        cond_sell = (macd.shift(1) >= signal.shift(1)) & (macd < signal)
+        return pd.Series(latch_positions(cond_buy, cond_sell), index=df["datetime"])
+
+    # copy so callers can modify the result without corrupting the cache
+    return INDICATOR_CACHE.get((fp, "macd", (12, 26, 9)), compute).copy()
 
 
 def backtest(df, signals, out_dir, **kwargs):
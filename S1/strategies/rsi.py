@@ -4,6 +4,8 @@
 """
 import pandas as pd
 
+from S1.strategies.common import INDICATOR_CACHE, dataset_fingerprint, latch_positions
+
 PERIOD = 14
 RSI_LOW = 30
 RSI_HIGH = 70
@@ -21,21 +23,15 @@ def _rsi(series: pd.Series, period: int = PERIOD) -> pd.Series:
 
 
 def generate_signals(df: pd.DataFrame) -> pd.Series:
-    df2 = df.copy()
-    df2["rsi"] = _rsi(df2["close"], PERIOD)
-    sig = pd.Series(0, index=df2.index)
-    position = 0
-    for i in range(len(df2)):
-        r = df2["rsi"].iloc[i]
-        if pd.isna(r):
-            sig.iloc[i] = position
-            continue
-        if r < RSI_LOW and position == 0:
-            position = 1
-        elif r > RSI_HIGH and position == 1:
-            position = 0
-        sig.iloc[i] = position
-    return pd.Series(sig.values, index=df2["datetime"]) 
+    fp = dataset_fingerprint(df)
+
+    def compute():
+        rsi = INDICATOR_CACHE.get((fp, "rsi_value", ("close", PERIOD)), lambda: _rsi(df["close"], PERIOD))
+        # NaN RSI compares False on both sides, so warm-up bars keep the previous position
+        return pd.Series(latch_positions(rsi < RSI_LOW, rsi > RSI_HIGH), index=df["datetime"])
+
+    # copy so callers can modify the result without corrupting the cache
+    return INDICATOR_CACHE.get((fp, "rsi", (PERIOD, RSI_LOW, RSI_HIGH)), compute).copy()
 
 
 def backtest(df, signals, out_dir, **kwargs):
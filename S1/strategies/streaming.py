@@ -0,0 +1,229 @@
+"""流式（逐 bar）指标与策略（S1）
+
+实盘进程每来一根新 K 线只需 O(1) 更新，而不必对整段历史重新计算 rolling/ewm。
+指标的更新规则与 pandas 一致（rolling mean 的 Kahan 补偿累加、ewm(adjust=False) 的权重递推），
+因此逐 bar 输出与 generate_signals 的批量结果相同：
+
+    strat = MACrossoverStream()
+    for close in closes:
+        position = strat.update(close)   # 1=持仓，0=空仓，与 generate_signals 同一 bar 的值一致
+"""
+import math
+
+from S1.strategies import ma_crossover, rsi
+
+_NAN = float("nan")
+
+
+class StreamingSMA:
+    """简单移动平均，等价于 Series.rolling(window).mean()：环形缓冲 + 补偿求和。"""
+
+    __slots__ = ("window", "_buf", "_pos", "_count", "_nobs", "_sum", "_comp_add", "_comp_remove",
+                 "_neg", "_same", "_prev", "value")
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError(f"window must be >= 1, got {window}")
+        self.window = window
+        self._buf = [_NAN] * window
+        self._pos = 0
+        self._count = 0
+        self._nobs = 0
+        self._sum = 0.0
+        # separate Kahan compensation terms for additions and removals, as pandas keeps them
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._neg = 0
+        self._same = 0
+        self._prev = _NAN
+        self.value = _NAN
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if self._count >= self.window:
+            old = self._buf[self._pos]
+            if old == old:
+                self._nobs -= 1
+                y = -old - self._comp_remove
+                t = self._sum + y
+                self._comp_remove = t - self._sum - y
+                self._sum = t
+                if math.copysign(1.0, old) < 0:
+                    self._neg -= 1
+        else:
+            self._count += 1
+        self._buf[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+        if x == x:
+            self._nobs += 1
+            y = x - self._comp_add
+            t = self._sum + y
+            self._comp_add = t - self._sum - y
+            self._sum = t
+            if math.copysign(1.0, x) < 0:
+                self._neg += 1
+            self._same = self._same + 1 if x == self._prev else 1
+            self._prev = x
+
+        if self._nobs >= self.window:
+            result = self._sum / self._nobs
+            if self._same >= self._nobs:
+                result = self._prev
+            elif self._neg == 0 and result < 0:
+                result = 0.0
+            elif self._neg == self._nobs and result > 0:
+                result = 0.0
+        else:
+            result = _NAN
+        self.value = result
+        return result
+
+
+class StreamingEMA:
+    """指数移动平均，等价于 Series.ewm(span=span, adjust=False).mean()（缺失值不重置权重）。"""
+
+    __slots__ = ("span", "_alpha", "_old_factor", "_old_wt", "value")
+
+    def __init__(self, span: int):
+        com = (span - 1) / 2.0
+        self.span = span
+        self._alpha = 1.0 / (1.0 + com)
+        self._old_factor = 1.0 - self._alpha
+        self._old_wt = 1.0
+        self.value = _NAN
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        w = self.value
+        if w == w:
+            self._old_wt *= self._old_factor
+            if x == x:
+                if w != x:
+                    w = (self._old_wt * w + self._alpha * x) / (self._old_wt + self._alpha)
+                self._old_wt = 1.0
+        elif x == x:
+            w = x
+        self.value = w
+        return w
+
+
+class StreamingMACD:
+    """MACD 线（EMA_fast - EMA_slow）与信号线（MACD 的 EMA），与 S1 MACD 策略相同。"""
+
+    __slots__ = ("_fast", "_slow", "_signal", "line", "signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = StreamingEMA(fast)
+        self._slow = StreamingEMA(slow)
+        self._signal = StreamingEMA(signal)
+        self.line = _NAN
+        self.signal = _NAN
+
+    def update(self, x: float):
+        self.line = self._fast.update(x) - self._slow.update(x)
+        self.signal = self._signal.update(self.line)
+        return self.line, self.signal
+
+
+class StreamingRSI:
+    """RSI，等价于 S1.strategies.rsi._rsi：涨跌幅各自做 period 期简单移动平均。"""
+
+    __slots__ = ("_prev", "_up", "_down", "value")
+
+    def __init__(self, period: int = rsi.PERIOD):
+        self._prev = _NAN
+        self._up = StreamingSMA(period)
+        self._down = StreamingSMA(period)
+        self.value = _NAN
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        delta = x - self._prev
+        self._prev = x
+        # same values as diff().clip(lower=0) / -1 * diff().clip(upper=0), including signed zeros
+        up = max(delta, 0.0) if delta == delta else _NAN
+        down = -1 * min(delta, 0.0) if delta == delta else _NAN
+        ma_up = self._up.update(up)
+        ma_down = self._down.update(down)
+        if ma_down == 0.0:
+            # float division by zero as numpy does it: x/0 -> +-inf, 0/0 -> NaN
+            rs = _NAN if (ma_up == 0.0 or ma_up != ma_up) else math.copysign(math.inf, ma_up) * math.copysign(1.0, ma_down)
+        else:
+            rs = ma_up / ma_down
+        self.value = 100 - 100 / (1 + rs) if rs == rs else _NAN
+        return self.value
+
+
+class _LatchStream:
+    """逐 bar 的持仓锁存，规则与 latch_positions 相同。"""
+
+    __slots__ = ("position",)
+
+    def __init__(self):
+        self.position = 0
+
+    def _latch(self, buy: bool, sell: bool) -> int:
+        if buy and self.position == 0:
+            self.position = 1
+        elif sell and self.position == 1:
+            self.position = 0
+        return self.position
+
+
+class MACrossoverStream(_LatchStream):
+    """流式版 ma_crossover.generate_signals。"""
+
+    __slots__ = ("_short", "_long", "_prev_short", "_prev_long")
+
+    def __init__(self, short: int = ma_crossover.SHORT, long: int = ma_crossover.LONG):
+        super().__init__()
+        self._short = StreamingSMA(short)
+        self._long = StreamingSMA(long)
+        self._prev_short = _NAN
+        self._prev_long = _NAN
+
+    def update(self, close: float) -> int:
+        s, l = self._short.update(close), self._long.update(close)
+        buy = self._prev_short <= self._prev_long and s > l
+        sell = self._prev_short >= self._prev_long and s < l
+        self._prev_short, self._prev_long = s, l
+        return self._latch(buy, sell)
+
+
+class MACDStream(_LatchStream):
+    """流式版 macd.generate_signals。"""
+
+    __slots__ = ("_macd", "_prev_line", "_prev_signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__()
+        self._macd = StreamingMACD(fast, slow, signal)
+        self._prev_line = _NAN
+        self._prev_signal = _NAN
+
+    def update(self, close: float) -> int:
+        line, signal = self._macd.update(close)
+        buy = self._prev_line <= self._prev_signal and line > signal
+        sell = self._prev_line >= self._prev_signal and line < signal
+        self._prev_line, self._prev_signal = line, signal
+        return self._latch(buy, sell)
+
+
+class RSIStream(_LatchStream):
+    """流式版 rsi.generate_signals。"""
+
+    __slots__ = ("_rsi", "low", "high")
+
+    def __init__(self, period: int = rsi.PERIOD, low: float = rsi.RSI_LOW, high: float = rsi.RSI_HIGH):
+        super().__init__()
+        self._rsi = StreamingRSI(period)
+        self.low = low
+        self.high = high
+
+    def update(self, close: float) -> int:
+        r = self._rsi.update(close)
+        return self._latch(r < self.low, r > self.high)
+
+
+# strategy module name -> streaming class, mirroring S1/S2/S3 strategy names
+STREAMS = {"ma_crossover": MACrossoverStream, "macd": MACDStream, "rsi": RSIStream}
@@ -1,10 +1,16 @@
 import os
+import copy
 import json
+import pickle
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from collections.abc import Mapping, Sequence
 from typing import Optional
 
+from S1.backtest import check_artifacts
+from S1.plotting import plot_equity
+from S1.roundtrips import round_trips
+
 
 def _calc_metrics(equity_series: pd.Series) -> dict:
     equity = equity_series.dropna()
@@ -29,9 +35,290 @@ def _calc_metrics(equity_series: pd.Series) -> dict:
     }
 
 
+# trade log codes: side and exit reason are stored as int8
+BUY, SELL = 0, 1
+NO_REASON, SIGNAL_EXIT, STOP_LOSS, TAKE_PROFIT, LIQUIDATE_END = 0, 1, 2, 3, 4
+_SIDE_NAMES = np.array(["buy", "sell"], dtype=object)
+_REASON_NAMES = np.array([None, "signal_exit", "sl", "tp", "liquidate_end"], dtype=object)
+_REASON_CODES = {name: code for code, name in enumerate(_REASON_NAMES) if name is not None}
+
+
+class TradeLog(Sequence):
+    """Trades recorded into preallocated typed arrays (int64 timestamps in `unit`, the bar index's
+    resolution; float64 price/qty/cash; int8 side/reason codes); strings are only produced on
+    access/export.
+
+    Behaves like the list of dicts the backtesters used to return: len(), indexing, iteration
+    and == against a list yield {"datetime", "side", "price", "qty", "cash"[, "reason"]} dicts.
+    """
+
+    __slots__ = ("_time", "_side", "_price", "_qty", "_cash", "_reason", "_n", "unit")
+
+    def __init__(self, capacity: int = 16, unit: str = "ns"):
+        capacity = max(int(capacity), 1)
+        self.unit = unit
+        self._time = np.empty(capacity, dtype=np.int64)
+        self._side = np.empty(capacity, dtype=np.int8)
+        self._price = np.empty(capacity, dtype=np.float64)
+        self._qty = np.empty(capacity, dtype=np.float64)
+        self._cash = np.empty(capacity, dtype=np.float64)
+        self._reason = np.empty(capacity, dtype=np.int8)
+        self._n = 0
+
+    def append(self, time: int, side: int, price: float, qty: float, cash: float, reason: int = NO_REASON) -> None:
+        if self._n == len(self._time):
+            for name in ("_time", "_side", "_price", "_qty", "_cash", "_reason"):
+                old = getattr(self, name)
+                new = np.empty(2 * len(old), dtype=old.dtype)
+                new[:self._n] = old
+                setattr(self, name, new)
+        i = self._n
+        self._time[i] = time
+        self._side[i] = side
+        self._price[i] = price
+        self._qty[i] = qty
+        self._cash[i] = cash
+        self._reason[i] = reason
+        self._n = i + 1
+
+    @property
+    def time(self) -> np.ndarray:
+        return self._time[:self._n]
+
+    @property
+    def side(self) -> np.ndarray:
+        return self._side[:self._n]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self._price[:self._n]
+
+    @property
+    def qty(self) -> np.ndarray:
+        return self._qty[:self._n]
+
+    @property
+    def cash(self) -> np.ndarray:
+        return self._cash[:self._n]
+
+    @property
+    def reason(self) -> np.ndarray:
+        return self._reason[:self._n]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("trade index out of range")
+        t = {"datetime": pd.Timestamp(int(self._time[i]), unit=self.unit).isoformat(),
+             "side": _SIDE_NAMES[self._side[i]],
+             "price": float(self._price[i]),
+             "qty": float(self._qty[i]),
+             "cash": float(self._cash[i])}
+        if self._reason[i] != NO_REASON:
+            t["reason"] = _REASON_NAMES[self._reason[i]]
+        return t
+
+    def __eq__(self, other):
+        if isinstance(other, TradeLog):
+            if self.unit != other.unit:
+                return list(self) == list(other)
+            return all(np.array_equal(a, b) for a, b in zip(
+                (self.time, self.side, self.price, self.qty, self.cash, self.reason),
+                (other.time, other.side, other.price, other.qty, other.cash, other.reason)))
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TradeLog({len(self)} trades)"
+
+    def isoformat_times(self) -> np.ndarray:
+        """Trade times as Timestamp.isoformat() strings, vectorized for whole-second times."""
+        t = self.time.view(f"datetime64[{self.unit}]")
+        if (t == t.astype("datetime64[s]")).all():
+            return np.datetime_as_string(t, unit="s").astype(object)
+        return np.array([pd.Timestamp(int(v), unit=self.unit).isoformat() for v in self.time], dtype=object)
+
+    def to_frame(self, reason_column: Optional[bool] = None) -> pd.DataFrame:
+        """Export as the trades.csv table; the reason column is included when any trade has one
+        (like a DataFrame built from the dicts) unless reason_column forces it on/off."""
+        frame = pd.DataFrame({
+            "datetime": self.isoformat_times(),
+            "side": _SIDE_NAMES[self.side],
+            "price": self.price,
+            "qty": self.qty,
+            "cash": self.cash,
+        })
+        if reason_column is None:
+            reason_column = bool((self.reason != NO_REASON).any())
+        if reason_column:
+            frame["reason"] = np.where(self.reason != NO_REASON, _REASON_NAMES[self.reason], np.nan)
+        return frame
+
+
+def _prepare_bars(df):
+    """Return (DatetimeIndex, {"open","high","low","close": float arrays}) sorted by datetime.
+
+    `df` is an OHLCV DataFrame or a mapping of column arrays such as the read-only memmaps from
+    `S1.data.load_memmap` (datetime as int64 ns UTC, already sorted); the latter is used as-is
+    without copying the price data.
+    """
+    if isinstance(df, Mapping):
+        index = pd.DatetimeIndex(np.asarray(df["datetime"]).view("datetime64[ns]"))
+        bars = {c: np.asarray(df[c], dtype=float) for c in ("open", "high", "low", "close")}
+        return index, bars
+    df = df.sort_values("datetime").reset_index(drop=True)
+    index = pd.DatetimeIndex(pd.to_datetime(df["datetime"]).values)
+    bars = {c: df[c].to_numpy(dtype=float) for c in ("open", "high", "low", "close")}
+    return index, bars
+
+
+def _schedule_transitions(sig: np.ndarray):
+    """Return (scheduled_entry, scheduled_exit) bool arrays for "signal -> next-day open" execution.
+
+    Works on the last axis, so a (N, T) signal matrix yields (N, T) schedules.
+    """
+    scheduled_entry = np.zeros(sig.shape, dtype=bool)
+    scheduled_exit = np.zeros(sig.shape, dtype=bool)
+    if sig.shape[-1] > 2:
+        prev = sig[..., :-2]
+        cur = sig[..., 1:-1]
+        scheduled_entry[..., 2:] = (prev == 0) & (cur == 1)
+        scheduled_exit[..., 2:] = (prev == 1) & (cur == 0)
+    return scheduled_entry, scheduled_exit
+
+
+def _sl_tp_chunk(times: np.ndarray,
+                 open_: np.ndarray,
+                 high: np.ndarray,
+                 low: np.ndarray,
+                 close: np.ndarray,
+                 scheduled_entry: np.ndarray,
+                 scheduled_exit: np.ndarray,
+                 fee: float,
+                 sl_pct: float,
+                 tp_pct: float,
+                 cash: float,
+                 qty: float = 0.0,
+                 entry_price: Optional[float] = None):
+    """Holding-period engine over one run of bars, starting from (cash, qty, entry_price).
+
+    entry_price is None when flat; otherwise the carried position is resolved first (its
+    holding segment starts at bar 0). No end-of-data liquidation happens here.
+    Returns (equity array, TradeLog, (cash, qty, entry_price)); trade times come from the
+    datetime64 array `times` and keep its unit.
+    """
+    n = len(close)
+    unit = np.datetime_data(times.dtype)[0]
+    times = times.view(np.int64)
+    entry_idx = np.flatnonzero(scheduled_entry)
+    exit_idx = np.flatnonzero(scheduled_exit)
+
+    trades = TradeLog(unit=unit)
+    # end-of-bar state changes, in chronological order (a later record on the same bar wins)
+    chg_bar = [-1]
+    chg_cash = [cash]
+    chg_qty = [qty]
+
+    k = 0
+    while True:
+        if entry_price is None:
+            if k >= len(entry_idx):
+                break
+            e = int(entry_idx[k])
+            entry_price = open_[e]
+            qty = cash / (entry_price * (1 + fee)) if entry_price > 0 else 0.0
+            buy_cost = qty * entry_price * (1 + fee)
+            cash = cash - buy_cost
+            if cash < 0 and cash > -1e-8:
+                cash = 0.0
+            trades.append(times[e], BUY, entry_price, qty, cash)
+            assert cash >= -1e-8, f"cash went negative after buy at bar {e}: cash={cash}, buy_cost={buy_cost}"
+            chg_bar.append(e)
+            chg_cash.append(cash)
+            chg_qty.append(qty)
+            m = np.searchsorted(exit_idx, e, side="right")
+        else:
+            # position carried in from the previous chunk: an exit scheduled on bar 0 applies
+            e = 0
+            m = 0
+
+        x = int(exit_idx[m]) if m < len(exit_idx) else n
+        sl_price = entry_price * (1 - sl_pct)
+        tp_price = entry_price * (1 + tp_pct)
+        hit = (low[e:x] <= sl_price) | (high[e:x] >= tp_price)
+        off = int(hit.argmax()) if len(hit) else 0
+        if len(hit) and hit[off]:
+            h = e + off
+            if low[h] <= sl_price:
+                exit_price, reason = sl_price, STOP_LOSS
+            else:
+                exit_price, reason = tp_price, TAKE_PROFIT
+            exit_bar = h
+        elif x < n:
+            exit_price, reason = open_[x], SIGNAL_EXIT
+            exit_bar = x
+        else:
+            break
+
+        proceeds = qty * exit_price * (1 - fee)
+        cash = cash + proceeds
+        trades.append(times[exit_bar], SELL, exit_price, qty, cash, reason)
+        qty = 0.0
+        entry_price = None
+        assert cash >= -1e-8, f"cash went negative after exit at bar {exit_bar}: cash={cash}, proceeds={proceeds}"
+        chg_bar.append(exit_bar)
+        chg_cash.append(cash)
+        chg_qty.append(qty)
+        k = int(np.searchsorted(entry_idx, exit_bar, side="right"))
+
+    seg = np.searchsorted(np.asarray(chg_bar), np.arange(n), side="right") - 1
+    equity = np.asarray(chg_cash)[seg] + np.asarray(chg_qty)[seg] * close
+    return equity, trades, (cash, qty, entry_price)
+
+
+def _simulate_sl_tp_vectorized(times: np.ndarray,
+                               open_: np.ndarray,
+                               high: np.ndarray,
+                               low: np.ndarray,
+                               close: np.ndarray,
+                               scheduled_entry: np.ndarray,
+                               scheduled_exit: np.ndarray,
+                               init_cash: float,
+                               fee: float,
+                               sl_pct: float,
+                               tp_pct: float):
+    """Holding-period engine: same semantics as the bar loop, but only iterates over trades.
+
+    For every entry the holding segment runs up to (not including) the next scheduled exit;
+    the first SL/TP hit inside it is found with a vectorized high/low comparison.
+    Returns (equity array, TradeLog).
+    """
+    equity, trades, (cash, qty, entry_price) = _sl_tp_chunk(times, open_, high, low, close,
+                                                            scheduled_entry, scheduled_exit,
+                                                            fee, sl_pct, tp_pct, init_cash)
+    # final liquidation
+    if entry_price is not None and qty > 0:
+        last_close = close[-1]
+        proceeds = qty * last_close * (1 - fee)
+        cash = cash + proceeds
+        trades.append(times.view(np.int64)[-1], SELL, last_close, qty, cash, LIQUIDATE_END)
+        equity[-1] = float(cash)
+        assert cash >= -1e-8, f"cash negative after final liquidation: cash={cash}, proceeds={proceeds}"
+    return equity, trades
+
+
 def run_backtest_sl_tp(df: pd.DataFrame,
                        signals: pd.Series,
-                       out_dir: str,
+                       out_dir: Optional[str],
                        init_cash: float = 10000.0,
                        fee: float = 0.001,
                        sl_pct: float = 0.05,
@@ -39,7 +326,9 @@ def run_backtest_sl_tp(df: pd.DataFrame,
                        skip_reindex: bool = False,
                        start: Optional[str] = None,
                        end: Optional[str] = None,
-                       kline: str = "1d") -> dict:
+                       kline: str = "1d",
+                       engine: str = "loop",
+                       artifacts: str = "full") -> dict:
     """A simple daily backtester that supports stop-loss and take-profit.
 
     Assumptions / simplifications:
@@ -49,150 +338,132 @@ def run_backtest_sl_tp(df: pd.DataFrame,
     - If both SL and TP are hit on the same day we conservatively assume SL was hit first.
     - Exit on signal 1->0 happens at next-day open.
     - When position remains at the end of data, we liquidate at the last close.
+
+    engine: "loop" walks every bar; "vectorized" segments the series into holding periods
+    and finds the first SL/TP hit per trade with array comparisons (same results, much faster
+    on intraday data).
+
+    df may also be a mapping of column arrays (e.g. `S1.data.load_memmap`), used without copying.
+
+    artifacts: "full" writes equity.csv, trades.csv, roundtrips.csv (S1.roundtrips), metrics.json and
+    equity.png; "data" the same without the plot (render later with `S1.plotting.render_run_dirs`);
+    "metrics" only metrics.json;
+    "none" writes nothing; out_dir=None is the same as "none". matplotlib is imported only for plots.
     """
-    os.makedirs(out_dir, exist_ok=True)
+    if engine not in ("loop", "vectorized"):
+        raise ValueError(f"unknown engine: {engine!r} (expected 'loop' or 'vectorized')")
+    check_artifacts(artifacts)
+    if out_dir is None:
+        artifacts = "none"
+    if artifacts != "none":
+        os.makedirs(out_dir, exist_ok=True)
 
-    # Re-implement a straightforward, robust simulation similar to the debug runner
-    df = df.copy()
-    df = df.sort_values("datetime").reset_index(drop=True)
-    df["datetime"] = pd.to_datetime(df["datetime"]) 
-    df.set_index(pd.DatetimeIndex(df["datetime"].values), inplace=True)
+    # sorted bar times plus plain float arrays for the simulation
+    index, bars = _prepare_bars(df)
+    open_, high, low, close = bars["open"], bars["high"], bars["low"], bars["close"]
+    times = index.asi8
 
     # align signals explicitly to the dataframe datetimes unless caller already aligned
     if skip_reindex:
         # assume signals is positional-aligned with df (same length)
         sig = pd.Series(signals).fillna(0).astype(int)
-        if len(sig) != len(df):
+        if len(sig) != len(index):
             # fall back to reindexing if lengths mismatch
-            sig = signals.reindex(pd.DatetimeIndex(df["datetime"].values)).fillna(0).astype(int)
+            sig = signals.reindex(index).fillna(0).astype(int)
     else:
-        sig = signals.reindex(pd.DatetimeIndex(df["datetime"].values)).fillna(0).astype(int)
+        sig = signals.reindex(index).fillna(0).astype(int)
 
-    cash = init_cash
-    qty = 0.0
-    equity_records = []
-    trades = []
+    # Precompute scheduled entries/exits to enforce "signal -> next-day open" semantics
+    scheduled_entry, scheduled_exit = _schedule_transitions(sig.to_numpy())
 
-    in_position = False
-    entry_price = None
+    if engine == "vectorized":
+        equity, trades = _simulate_sl_tp_vectorized(index.values, open_, high, low, close,
+                                                    scheduled_entry, scheduled_exit,
+                                                    init_cash, fee, sl_pct, tp_pct)
+    else:
+        cash = init_cash
+        qty = 0.0
+        equity = np.empty(len(index))
+        trades = TradeLog(unit=index.unit)
 
-    # Precompute scheduled entries/exits to enforce "signal -> next-day open" semantics
-    scheduled_entry = [False] * len(sig)
-    scheduled_exit = [False] * len(sig)
-    for j in range(1, len(sig)):
-        prev = sig.iloc[j - 1]
-        cur = sig.iloc[j]
-        if prev == 0 and cur == 1:
-            if j + 1 < len(sig):
-                scheduled_entry[j + 1] = True
-        if prev == 1 and cur == 0:
-            if j + 1 < len(sig):
-                scheduled_exit[j + 1] = True
-
-    for i, idx in enumerate(df.index):
-        price_open = df.at[idx, "open"]
-        price_high = df.at[idx, "high"]
-        price_low = df.at[idx, "low"]
-        price_close = df.at[idx, "close"]
-
-        # First, handle scheduled exit at today's open (signal 1->0 from previous day)
-        if scheduled_exit[i] and in_position:
-            exit_price = price_open
-            # add proceeds to cash rather than overwriting (protect against qty==0)
-            proceeds = qty * exit_price * (1 - fee)
-            cash = cash + proceeds
-            trades.append({
-                "datetime": idx.isoformat(),
-                "side": "sell",
-                "price": float(exit_price),
-                "qty": float(qty),
-                "cash": float(cash),
-                "reason": "signal_exit",
-            })
-            qty = 0.0
-            in_position = False
-            # sanity check
-            assert cash >= -1e-8, f"cash went negative after scheduled_exit at {idx}: cash={cash}"
-
-        # Then, handle scheduled entry at today's open (signal 0->1 from previous day)
-        if scheduled_entry[i] and (not in_position):
-            entry_price = price_open
-            # legacy: invest all cash, but include buy-side fee in cost
-            # compute qty that accounts for buy-side fee so buy_cost <= available cash
-            qty = cash / (entry_price * (1 + fee)) if entry_price > 0 else 0.0
-            buy_cost = qty * entry_price * (1 + fee)
-            cash = cash - buy_cost
-            # avoid tiny negative due to float rounding
-            if cash < 0 and cash > -1e-8:
-                cash = 0.0
-            in_position = True
-            trades.append({
-                "datetime": idx.isoformat(),
-                "side": "buy",
-                "price": float(entry_price),
-                "qty": float(qty),
-                "cash": float(cash),
-            })
-            # sanity check
-            assert cash >= -1e-8, f"cash went negative after buy at {idx}: cash={cash}, buy_cost={buy_cost}"
-
-        # If in position, check SL/TP intraday (using today's high/low)
-        if in_position:
-            sl_price = entry_price * (1 - sl_pct)
-            tp_price = entry_price * (1 + tp_pct)
-            hit_sl = price_low <= sl_price
-            hit_tp = price_high >= tp_price
-
-            if hit_sl and hit_tp:
-                exit_price = sl_price
-                reason = "sl"
-            elif hit_sl:
-                exit_price = sl_price
-                reason = "sl"
-            elif hit_tp:
-                exit_price = tp_price
-                reason = "tp"
-            else:
-                exit_price = None
+        in_position = False
+        entry_price = None
+
+        for i in range(len(index)):
+            price_open = open_[i]
+            price_high = high[i]
+            price_low = low[i]
+            price_close = close[i]
 
-            if exit_price is not None:
+            # First, handle scheduled exit at today's open (signal 1->0 from previous day)
+            if scheduled_exit[i] and in_position:
+                exit_price = price_open
+                # add proceeds to cash rather than overwriting (protect against qty==0)
                 proceeds = qty * exit_price * (1 - fee)
                 cash = cash + proceeds
-                trades.append({
-                    "datetime": idx.isoformat(),
-                    "side": "sell",
-                    "price": float(exit_price),
-                    "qty": float(qty),
-                    "cash": float(cash),
-                    "reason": reason,
-                })
+                trades.append(times[i], SELL, exit_price, qty, cash, SIGNAL_EXIT)
                 qty = 0.0
                 in_position = False
                 # sanity check
-                assert cash >= -1e-8, f"cash went negative after exit at {idx}: cash={cash}, proceeds={proceeds}"
+                assert cash >= -1e-8, f"cash went negative after scheduled_exit at {index[i]}: cash={cash}"
 
-        equity = cash + (qty * price_close)
-        equity_records.append({"datetime": idx, "equity": float(equity)})
+            # Then, handle scheduled entry at today's open (signal 0->1 from previous day)
+            if scheduled_entry[i] and (not in_position):
+                entry_price = price_open
+                # legacy: invest all cash, but include buy-side fee in cost
+                # compute qty that accounts for buy-side fee so buy_cost <= available cash
+                qty = cash / (entry_price * (1 + fee)) if entry_price > 0 else 0.0
+                buy_cost = qty * entry_price * (1 + fee)
+                cash = cash - buy_cost
+                # avoid tiny negative due to float rounding
+                if cash < 0 and cash > -1e-8:
+                    cash = 0.0
+                in_position = True
+                trades.append(times[i], BUY, entry_price, qty, cash)
+                # sanity check
+                assert cash >= -1e-8, f"cash went negative after buy at {index[i]}: cash={cash}, buy_cost={buy_cost}"
 
-    # final liquidation
-    if in_position and qty > 0:
-        last_idx = df.index[-1]
-        last_close = df.at[last_idx, "close"]
-        proceeds = qty * last_close * (1 - fee)
-        cash = cash + proceeds
-        trades.append({
-            "datetime": last_idx.isoformat(),
-            "side": "sell",
-            "price": float(last_close),
-            "qty": float(qty),
-            "cash": float(cash),
-            "reason": "liquidate_end",
-        })
-        qty = 0.0
-        equity_records[-1]["equity"] = float(cash)
-        assert cash >= -1e-8, f"cash negative after final liquidation: cash={cash}, proceeds={proceeds}"
+            # If in position, check SL/TP intraday (using today's high/low)
+            if in_position:
+                sl_price = entry_price * (1 - sl_pct)
+                tp_price = entry_price * (1 + tp_pct)
+                hit_sl = price_low <= sl_price
+                hit_tp = price_high >= tp_price
+
+                if hit_sl and hit_tp:
+                    exit_price = sl_price
+                    reason = STOP_LOSS
+                elif hit_sl:
+                    exit_price = sl_price
+                    reason = STOP_LOSS
+                elif hit_tp:
+                    exit_price = tp_price
+                    reason = TAKE_PROFIT
+                else:
+                    exit_price = None
+
+                if exit_price is not None:
+                    proceeds = qty * exit_price * (1 - fee)
+                    cash = cash + proceeds
+                    trades.append(times[i], SELL, exit_price, qty, cash, reason)
+                    qty = 0.0
+                    in_position = False
+                    # sanity check
+                    assert cash >= -1e-8, f"cash went negative after exit at {index[i]}: cash={cash}, proceeds={proceeds}"
+
+            equity[i] = cash + (qty * price_close)
+
+        # final liquidation
+        if in_position and qty > 0:
+            last_close = close[-1]
+            proceeds = qty * last_close * (1 - fee)
+            cash = cash + proceeds
+            trades.append(times[-1], SELL, last_close, qty, cash, LIQUIDATE_END)
+            qty = 0.0
+            equity[-1] = float(cash)
+            assert cash >= -1e-8, f"cash negative after final liquidation: cash={cash}, proceeds={proceeds}"
 
-    equity_df = pd.DataFrame(equity_records).set_index("datetime")["equity"]
+    equity_df = pd.Series(equity, index=index.rename("datetime"), name="equity")
 
     metrics = _calc_metrics(equity_df)
     # attach metadata
@@ -206,23 +477,539 @@ def run_backtest_sl_tp(df: pd.DataFrame,
     metrics["end"] = end_used
     metrics["kline"] = kline
 
+    if artifacts == "none":
+        return {"metrics": metrics, "equity": equity_df, "trades": trades}
+
     # write outputs
-    equity_df.to_csv(os.path.join(out_dir, "equity.csv"), index_label="datetime")
     with open(os.path.join(out_dir, "metrics.json"), "w") as f:
         json.dump(metrics, f, indent=2)
-    trades_df = pd.DataFrame(trades)
-    if not trades_df.empty:
-        trades_df.to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+    if artifacts == "metrics":
+        return {"metrics": metrics, "equity": equity_df, "trades": trades}
+    equity_df.to_csv(os.path.join(out_dir, "equity.csv"), index_label="datetime")
+    if len(trades):
+        trades.to_frame().to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+        round_trips(trades, index=index, fee=fee).to_csv(os.path.join(out_dir, "roundtrips.csv"), index=False)
 
     # plots
-    try:
-        plt.figure(figsize=(10, 4))
-        equity_df.plot(title="Equity")
-        plt.xlabel("")
-        plt.tight_layout()
-        plt.savefig(os.path.join(out_dir, "equity.png"))
-        plt.close()
-    except Exception:
-        pass
+    if artifacts == "full":
+        try:
+            plot_equity(equity_df.index, equity_df.to_numpy(), os.path.join(out_dir, "equity.png"),
+                        title="Equity", label=None)
+        except Exception:
+            pass
 
     return {"metrics": metrics, "equity": equity_df, "trades": trades}
+
+
+def _signals_matrix(signals_matrix, index: pd.DatetimeIndex) -> np.ndarray:
+    """Normalize a batch of signals to an (N, T) int array aligned with `index`.
+
+    Accepts a 2D array-like (rows already positional-aligned with the sorted bars) or a
+    sequence of pd.Series that are reindexed to `index` (missing bars -> 0).
+    """
+    if isinstance(signals_matrix, (np.ndarray, pd.DataFrame)):
+        mat = np.asarray(signals_matrix)
+    else:
+        rows = []
+        for s in signals_matrix:
+            if isinstance(s, pd.Series):
+                rows.append(s.reindex(index).fillna(0).to_numpy())
+            else:
+                rows.append(np.asarray(s))
+        mat = np.vstack(rows) if rows else np.zeros((0, len(index)))
+    if mat.ndim != 2 or mat.shape[1] != len(index):
+        raise ValueError(f"signals_matrix must have shape (N, {len(index)}), got {mat.shape}")
+    return np.nan_to_num(mat.astype(float)).astype(int)
+
+
+def _signal_index(df, index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Index that per-strategy signal Series are reindexed to in batch mode.
+
+    Strategy wrappers align signals on pd.DatetimeIndex(df["datetime"]) (tz preserved); columnar
+    inputs carry UTC epoch times, so their signals are matched on a UTC index.
+    """
+    if isinstance(df, Mapping):
+        return index.tz_localize("UTC")
+    return pd.DatetimeIndex(df.sort_values("datetime")["datetime"])
+
+
+def _simulate_batch(open_: np.ndarray,
+                    high: np.ndarray,
+                    low: np.ndarray,
+                    close: np.ndarray,
+                    scheduled_entry: np.ndarray,
+                    scheduled_exit: np.ndarray,
+                    init_cash: float,
+                    fee,
+                    sl_pct,
+                    tp_pct,
+                    alloc_fn=None,
+                    clamp_dust: bool = True,
+                    record_equity: bool = False) -> dict:
+    """Lockstep SL/TP simulation of N strategies over shared price arrays.
+
+    scheduled_entry / scheduled_exit are (N, T) bool arrays; fee / sl_pct / tp_pct are scalars or
+    length-N arrays. State is kept as length-N vectors and each bar applies the same order of
+    operations as `run_backtest_sl_tp` (exit at open, entry at open, intraday SL/TP, equity at close,
+    liquidation at the last close), so every row reproduces the single-run equity curve.
+
+    alloc_fn(i, completed_trades) may return a length-N array of position fractions for bar i
+    (NaN = invest all cash); this is how S3 plugs in Kelly sizing.
+
+    Metrics are accumulated online so memory stays O(N) unless record_equity=True.
+    """
+    n_rows, n_bars = scheduled_entry.shape
+    fee = np.broadcast_to(np.asarray(fee, dtype=float), (n_rows,))
+    sl_pct = np.broadcast_to(np.asarray(sl_pct, dtype=float), (n_rows,))
+    tp_pct = np.broadcast_to(np.asarray(tp_pct, dtype=float), (n_rows,))
+    buy_mult = 1 + fee
+    sell_mult = 1 - fee
+    sl_mult = 1 - sl_pct
+    tp_mult = 1 + tp_pct
+
+    cash = np.full(n_rows, float(init_cash))
+    qty = np.zeros(n_rows)
+    entry_price = np.zeros(n_rows)
+    in_pos = np.zeros(n_rows, dtype=bool)
+    completed = np.zeros(n_rows, dtype=np.int64)
+    n_trades = np.zeros(n_rows, dtype=np.int64)
+
+    first = None
+    prev = None
+    peak = None
+    max_dd = np.zeros(n_rows)
+    r_count = 0
+    r_mean = np.zeros(n_rows)
+    r_m2 = np.zeros(n_rows)
+    equity_mat = np.empty((n_rows, n_bars)) if record_equity else None
+
+    for i in range(n_bars):
+        price_open = open_[i]
+
+        ex = scheduled_exit[:, i] & in_pos
+        if ex.any():
+            cash = np.where(ex, cash + qty * price_open * sell_mult, cash)
+            qty = np.where(ex, 0.0, qty)
+            in_pos &= ~ex
+            completed += ex
+            n_trades += ex
+
+        en = scheduled_entry[:, i] & ~in_pos
+        if en.any():
+            base = cash
+            if alloc_fn is not None:
+                f = np.asarray(alloc_fn(i, completed), dtype=float)
+                invest = np.maximum(0.0, np.minimum(f * (cash + qty * price_open), cash))
+                base = np.where(np.isnan(f), cash, invest)
+            if price_open > 0:
+                new_qty = base / (price_open * buy_mult)
+            else:
+                new_qty = np.zeros(n_rows)
+            new_cash = cash - new_qty * price_open * buy_mult
+            if clamp_dust:
+                new_cash = np.where((new_cash < 0) & (new_cash > -1e-8), 0.0, new_cash)
+            cash = np.where(en, new_cash, cash)
+            qty = np.where(en, new_qty, qty)
+            entry_price = np.where(en, price_open, entry_price)
+            in_pos |= en
+            n_trades += en
+
+        if in_pos.any():
+            sl_price = entry_price * sl_mult
+            tp_price = entry_price * tp_mult
+            hit_sl = in_pos & (low[i] <= sl_price)
+            hit_tp = in_pos & ~hit_sl & (high[i] >= tp_price)
+            hit = hit_sl | hit_tp
+            if hit.any():
+                exit_price = np.where(hit_sl, sl_price, tp_price)
+                cash = np.where(hit, cash + qty * exit_price * sell_mult, cash)
+                qty = np.where(hit, 0.0, qty)
+                in_pos &= ~hit
+                completed += hit
+                n_trades += hit
+
+        equity = cash + qty * close[i]
+        if i == n_bars - 1:
+            liq = in_pos & (qty > 0)
+            if liq.any():
+                cash = np.where(liq, cash + qty * close[i] * sell_mult, cash)
+                equity = np.where(liq, cash, equity)
+                qty = np.where(liq, 0.0, qty)
+                n_trades += liq
+
+        if record_equity:
+            equity_mat[:, i] = equity
+        if first is None:
+            first = equity.copy()
+            peak = equity.copy()
+        else:
+            r = equity / prev - 1
+            r_count += 1
+            delta = r - r_mean
+            r_mean = r_mean + delta / r_count
+            r_m2 = r_m2 + delta * (r - r_mean)
+            peak = np.maximum(peak, equity)
+            max_dd = np.minimum(max_dd, (equity - peak) / peak)
+        prev = equity
+
+    return {
+        "first": first,
+        "last": prev,
+        "max_drawdown": max_dd,
+        "r_count": r_count,
+        "r_mean": r_mean,
+        "r_std": np.sqrt(r_m2 / (r_count - 1)) if r_count > 1 else np.full(n_rows, np.nan),
+        "trades": n_trades,
+        "equity": equity_mat,
+    }
+
+
+def _batch_metrics_frame(sim: dict, index: pd.DatetimeIndex, params_list: list, kline: str) -> pd.DataFrame:
+    """Turn `_simulate_batch` accumulators into one metrics row per strategy (same fields as _calc_metrics)."""
+    total_return = sim["last"] / sim["first"] - 1
+    days = (index[-1] - index[0]).days
+    annualized_return = (1 + total_return) ** (365.0 / max(days, 1)) - 1
+    volatility = sim["r_std"] * np.sqrt(252)
+    sharpe = (sim["r_mean"] * np.sqrt(252)) / (sim["r_std"] + 1e-12)
+    rows = []
+    for k, params in enumerate(params_list):
+        row = dict(params)
+        row.update({
+            "total_return": float(total_return[k]),
+            "annualized_return": float(annualized_return[k]),
+            "max_drawdown": float(sim["max_drawdown"][k]),
+            "volatility": float(volatility[k]),
+            "sharpe": float(sharpe[k]),
+            "trades": int(sim["trades"][k]),
+            "final_equity": float(sim["last"][k]),
+            "start": index[0].isoformat(),
+            "end": index[-1].isoformat(),
+            "kline": kline,
+        })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run_backtest_batch(df: pd.DataFrame,
+                       signals_matrix,
+                       params_list: list,
+                       init_cash: float = 10000.0,
+                       fee: float = 0.001,
+                       kline: str = "1d",
+                       return_equity: bool = False):
+    """Evaluate N signal vectors / SL-TP settings in one pass over shared price arrays.
+
+    - signals_matrix: (N, T) array positional-aligned with df sorted by datetime, or a list of N
+      pd.Series indexed by datetime (reindexed like the strategy wrappers do).
+    - params_list: N dicts; `sl_pct`, `tp_pct` and `fee` are used by the engine (defaults 0.05 / 0.2 /
+      `fee`), every key is copied to the output row so callers can label cells.
+
+    Returns a DataFrame with one row per strategy (params + metrics + trades + final_equity).
+    Nothing is written to disk. With return_equity=True returns (metrics_df, equity_df) where
+    equity_df has one column per row of params_list.
+    """
+    index, bars = _prepare_bars(df)
+    sig = _signals_matrix(signals_matrix, _signal_index(df, index))
+    if len(params_list) != sig.shape[0]:
+        raise ValueError(f"params_list has {len(params_list)} entries but signals_matrix has {sig.shape[0]} rows")
+    if len(index) == 0:
+        raise ValueError("empty price data")
+
+    scheduled_entry, scheduled_exit = _schedule_transitions(sig)
+    sim = _simulate_batch(bars["open"], bars["high"], bars["low"], bars["close"],
+                          scheduled_entry, scheduled_exit, init_cash,
+                          [p.get("fee", fee) for p in params_list],
+                          [p.get("sl_pct", 0.05) for p in params_list],
+                          [p.get("tp_pct", 0.2) for p in params_list],
+                          record_equity=return_equity)
+    metrics_df = _batch_metrics_frame(sim, index, params_list, kline)
+    if return_equity:
+        equity_df = pd.DataFrame(sim["equity"].T, index=pd.DatetimeIndex(index, name="datetime"))
+        return metrics_df, equity_df
+    return metrics_df
+
+
+class _StreamMetrics:
+    """Online version of `_calc_metrics`: O(1) state, fed equity values in chronological order."""
+
+    __slots__ = ("n", "first", "last", "first_time", "last_time", "r_n", "r_mean", "r_m2", "peak", "max_dd")
+
+    def __init__(self):
+        self.n = 0
+        self.first = self.last = np.nan
+        self.first_time = self.last_time = None
+        self.r_n = 0
+        self.r_mean = 0.0
+        self.r_m2 = 0.0
+        self.peak = -np.inf
+        self.max_dd = np.inf
+
+    def update(self, times: pd.DatetimeIndex, equity: np.ndarray) -> None:
+        ok = ~np.isnan(equity)
+        if not ok.all():
+            times, equity = times[ok], equity[ok]
+        if len(equity) == 0:
+            return
+        if self.n == 0:
+            self.first, self.first_time = equity[0], times[0]
+            prev = equity
+        else:
+            prev = np.concatenate([[self.last], equity])
+        # pct_change over the whole series, merged chunk by chunk (Chan et al. parallel variance)
+        r = prev[1:] / prev[:-1] - 1
+        if len(r):
+            nb = len(r)
+            mb = r.mean()
+            m2b = float(((r - mb) ** 2).sum())
+            n = self.r_n + nb
+            delta = mb - self.r_mean
+            self.r_mean += delta * nb / n
+            self.r_m2 += m2b + delta * delta * self.r_n * nb / n
+            self.r_n = n
+        peaks = np.maximum.accumulate(np.concatenate([[self.peak], equity]))[1:]
+        self.peak = peaks[-1]
+        self.max_dd = min(self.max_dd, float(((equity - peaks) / peaks).min()))
+        self.n += len(equity)
+        self.last, self.last_time = equity[-1], times[-1]
+
+    def result(self) -> dict:
+        if self.n == 0:
+            return {}
+        total_return = self.last / self.first - 1
+        days = (self.last_time - self.first_time).days
+        annualized_return = (1 + total_return) ** (365.0 / max(days, 1)) - 1
+        std = np.sqrt(self.r_m2 / (self.r_n - 1)) if self.r_n > 1 else np.nan
+        mean = self.r_mean if self.r_n else np.nan
+        return {
+            "total_return": float(total_return),
+            "annualized_return": float(annualized_return),
+            "max_drawdown": float(self.max_dd),
+            "volatility": float(std * np.sqrt(252)),
+            "sharpe": float((mean * np.sqrt(252)) / (std + 1e-12)),
+        }
+
+
+def _append_equity(f, times: pd.DatetimeIndex, equity: np.ndarray, date_unit: str) -> None:
+    stamps = np.datetime_as_string(times.values, unit=date_unit)
+    if date_unit != "D":
+        stamps = np.char.replace(stamps, "T", " ")
+    pd.Series(equity, index=stamps).to_csv(f, header=False)
+
+
+# appended to a date-only stamp when the file switches to second resolution
+_MIDNIGHT = " 00:00:00"
+
+
+def _widen_equity_dates(f) -> None:
+    """Rewrite the date-only rows written so far ("2020-01-01,...") with a midnight time.
+
+    Called once, when the first intraday bar shows up after a run of midnight-only bars, so the file
+    ends up in the layout pandas picks for the whole index.
+    """
+    f.seek(0)
+    header, *rows = f.read().splitlines(keepends=True)
+    f.seek(0)
+    f.truncate()
+    f.write(header)
+    f.writelines(row.replace(",", _MIDNIGHT + ",", 1) for row in rows)
+
+
+STREAM_STATE_FILE = "state.pkl"
+
+
+def _stream_params(init_cash, fee, sl_pct, tp_pct, kline, strategy, signal_column) -> dict:
+    source = None if strategy is None else f"{type(strategy).__module__}.{type(strategy).__qualname__}"
+    return {"init_cash": init_cash, "fee": fee, "sl_pct": sl_pct, "tp_pct": tp_pct, "kline": kline,
+            "strategy": source, "signal_column": None if strategy is not None else signal_column}
+
+
+def load_stream_state(out_dir: str) -> Optional[dict]:
+    """End-of-run engine snapshot written by `run_backtest_stream`, or None when there is none.
+
+    Keys: params, cash, qty, entry_price, sig_tail, last_time, last_close, strategy (with its
+    indicator state), bars, trades, completed_trades, plus the file offsets used to resume.
+    """
+    path = os.path.join(out_dir, STREAM_STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def run_backtest_stream(chunks,
+                        out_dir: str,
+                        init_cash: float = 10000.0,
+                        fee: float = 0.001,
+                        sl_pct: float = 0.05,
+                        tp_pct: float = 0.2,
+                        kline: str = "1d",
+                        strategy=None,
+                        signal_column: str = "signal",
+                        resume: bool = False) -> dict:
+    """Streaming `run_backtest_sl_tp`: consumes an iterator of bar chunks with O(1) carried state.
+
+    chunks: iterable of OHLCV DataFrames in chronological order (e.g. `S1.data.iter_cache_chunks`).
+    Position signals come from `strategy` (an object with `update(close) -> 0/1`, e.g. the
+    streaming strategies in `S1.strategies.streaming`) or, without one, from `signal_column`.
+
+    equity.csv and trades.csv are appended chunk by chunk and metrics are accumulated online,
+    so peak memory is bounded by the chunk size. Results match `run_backtest_sl_tp` for the same
+    bars and signals (metrics up to float rounding of the online variance); no plot is drawn.
+
+    Every run also snapshots the engine state before the end-of-data liquidation (cash, qty,
+    entry_price, last signals, strategy indicator state, online metrics, trade counts) to
+    state.pkl next to metrics.json. With resume=True the run continues from that snapshot:
+    bars up to the snapshot's last bar are skipped, the provisional final equity row and
+    liquidation trade are rolled back, and only the new bars are simulated, so the outputs equal
+    a full re-run over all bars. The snapshot's strategy object replaces `strategy` (which only
+    has to be of the same type); without a snapshot resume=True runs from scratch.
+    Returns {"metrics", "bars", "new_bars", "trades"} (counts instead of the full equity/trade lists).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    equity_path = os.path.join(out_dir, "equity.csv")
+    trades_path = os.path.join(out_dir, "trades.csv")
+    params = _stream_params(init_cash, fee, sl_pct, tp_pct, kline, strategy, signal_column)
+    state = load_stream_state(out_dir) if resume else None
+    if state is not None and state["params"] != params:
+        raise ValueError(f"cannot resume {out_dir}: snapshot parameters {state['params']} != {params}")
+
+    if state is None:
+        if os.path.exists(trades_path):
+            os.remove(trades_path)
+        cash, qty, entry_price = init_cash, 0.0, None
+        # last two signals of the previous chunk; -1 = "no bar yet" so nothing is scheduled on bars 0/1
+        sig_tail = np.array([-1, -1])
+        last_time = None
+        last_close = np.nan
+        pending = None  # (time, equity) of the newest bar: the last one may still be liquidated
+        # "D" while every bar so far is at midnight (date-only rows), "s" from the first intraday bar on
+        date_unit = None
+        n_bars = n_trades = completed_trades = equity_rows = 0
+        metrics_acc = _StreamMetrics()
+        eq_file = open(equity_path, "w+", newline="")
+        eq_file.write("datetime,equity\n")
+    else:
+        cash, qty, entry_price = state["cash"], state["qty"], state["entry_price"]
+        sig_tail, last_time, last_close = state["sig_tail"], state["last_time"], state["last_close"]
+        pending, date_unit, metrics_acc = state["pending"], state["date_unit"], state["metrics"]
+        n_bars, n_trades, completed_trades = state["bars"], state["trades"], state["completed_trades"]
+        equity_rows = state["equity_rows"]
+        if state["strategy"] is not None:
+            strategy = state["strategy"]
+        # roll back the provisional last equity row and end-of-data liquidation
+        eq_file = open(equity_path, "r+", newline="")
+        equity_bytes = state["equity_bytes"]
+        eq_file.readline()
+        if date_unit == "D" and _MIDNIGHT in eq_file.readline().split(",")[0]:
+            # an interrupted resume already widened the date-only rows
+            equity_bytes += len(_MIDNIGHT) * equity_rows
+            date_unit = "s"
+        eq_file.truncate(equity_bytes)
+        eq_file.seek(0, os.SEEK_END)
+        if state["trades_bytes"]:
+            with open(trades_path, "r+") as f:
+                f.truncate(state["trades_bytes"])
+        elif os.path.exists(trades_path):
+            os.remove(trades_path)
+    resumed_bars = n_bars
+
+    with eq_file:
+        trades_file = None
+        try:
+            for chunk in chunks:
+                if len(chunk) == 0:
+                    continue
+                times = pd.DatetimeIndex(pd.to_datetime(chunk["datetime"]).values)
+                if state is not None and state["last_time"] is not None and times[0] <= state["last_time"]:
+                    # bars already covered by the snapshot
+                    keep = times > state["last_time"]
+                    chunk, times = chunk[keep], times[keep]
+                    if len(chunk) == 0:
+                        continue
+                if not times.is_monotonic_increasing or (last_time is not None and times[0] <= last_time):
+                    raise ValueError("chunks must be sorted by datetime and must not overlap")
+                bars = {c: chunk[c].to_numpy(dtype=float) for c in ("open", "high", "low", "close")}
+                if strategy is not None:
+                    sig = np.fromiter((strategy.update(c) for c in bars["close"]), dtype=np.int64, count=len(chunk))
+                else:
+                    sig = chunk[signal_column].fillna(0).to_numpy().astype(int)
+                if date_unit != "s":
+                    # same layout pandas picks for a whole index: date only when every bar is at midnight
+                    midnight = bool((times == times.normalize()).all())
+                    if date_unit == "D" and not midnight:
+                        _widen_equity_dates(eq_file)
+                    date_unit = "D" if midnight else "s"
+
+                scheduled_entry, scheduled_exit = _schedule_transitions(np.concatenate([sig_tail, sig]))
+                equity, chunk_trades, (cash, qty, entry_price) = _sl_tp_chunk(
+                    times.values, bars["open"], bars["high"], bars["low"], bars["close"],
+                    scheduled_entry[2:], scheduled_exit[2:], fee, sl_pct, tp_pct, cash, qty, entry_price)
+                sig_tail = np.concatenate([sig_tail, sig])[-2:]
+
+                if len(chunk_trades):
+                    if trades_file is None:
+                        trades_file = open(trades_path, "a", newline="")
+                    chunk_trades.to_frame(reason_column=True).to_csv(trades_file, index=False,
+                                                                     header=n_trades == 0)
+                    n_trades += len(chunk_trades)
+                    completed_trades += int((chunk_trades.side == SELL).sum())
+
+                # everything but the newest bar is final
+                out_times, out_equity = times[:-1], equity[:-1]
+                if pending is not None:
+                    out_times = pending[0].append(out_times)
+                    out_equity = np.concatenate([pending[1], out_equity])
+                if len(out_equity):
+                    _append_equity(eq_file, out_times, out_equity, date_unit)
+                    metrics_acc.update(out_times, out_equity)
+                    equity_rows += len(out_equity)
+                pending = (times[-1:], equity[-1:])
+                last_time = times[-1]
+                last_close = bars["close"][-1]
+                n_bars += len(chunk)
+
+            # snapshot before the provisional end-of-data liquidation
+            eq_file.flush()
+            if trades_file is not None:
+                trades_file.flush()
+            snapshot = {
+                "params": params, "cash": cash, "qty": qty, "entry_price": entry_price,
+                "sig_tail": sig_tail, "last_time": last_time, "last_close": last_close,
+                "pending": pending, "date_unit": date_unit, "metrics": copy.deepcopy(metrics_acc),
+                "strategy": strategy, "bars": n_bars, "trades": n_trades,
+                "completed_trades": completed_trades, "equity_rows": equity_rows, "equity_bytes": eq_file.tell(),
+                "trades_bytes": os.path.getsize(trades_path) if os.path.exists(trades_path) else 0,
+            }
+
+            # final liquidation at the last close
+            if entry_price is not None and qty > 0:
+                proceeds = qty * last_close * (1 - fee)
+                cash = cash + proceeds
+                last_stamp = last_time.to_datetime64()
+                final = TradeLog(1, unit=np.datetime_data(last_stamp.dtype)[0])
+                final.append(last_stamp.view(np.int64), SELL, last_close, qty, cash, LIQUIDATE_END)
+                if trades_file is None:
+                    trades_file = open(trades_path, "a", newline="")
+                final.to_frame(reason_column=True).to_csv(trades_file, index=False, header=n_trades == 0)
+                n_trades += 1
+                qty = 0.0
+                pending = (pending[0], np.array([float(cash)]))
+                assert cash >= -1e-8, f"cash negative after final liquidation: cash={cash}, proceeds={proceeds}"
+            if pending is not None:
+                _append_equity(eq_file, pending[0], pending[1], date_unit)
+                metrics_acc.update(pending[0], pending[1])
+        finally:
+            if trades_file is not None:
+                trades_file.close()
+
+    metrics = metrics_acc.result()
+    metrics["start"] = metrics_acc.first_time.isoformat() if metrics_acc.first_time is not None else None
+    metrics["end"] = metrics_acc.last_time.isoformat() if metrics_acc.last_time is not None else None
+    metrics["kline"] = kline
+    with open(os.path.join(out_dir, "metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+    state_path = os.path.join(out_dir, STREAM_STATE_FILE)
+    with open(state_path + ".tmp", "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(state_path + ".tmp", state_path)
+    return {"metrics": metrics, "bars": n_bars, "new_bars": n_bars - resumed_bars, "trades": n_trades}
@@ -1,29 +1,64 @@
 import os
-import pandas as pd
+import argparse
 
+from S1.data import load_dataset, iter_cache_chunks
+from S1.result_cache import DEFAULT_CACHE_DIR, ResultCache, cached_backtest
 from S2.strategies.ma_crossover import backtest as ma_backtest
 from S2.strategies.rsi import backtest as rsi_backtest
 from S2.strategies.macd import backtest as macd_backtest
 
+DATA_PATH = os.path.join("data", "raw", "btc_daily.csv")
+
 
 def load_data():
-    path = os.path.join("data", "raw", "btc_daily.csv")
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Data file not found: {path}. Please run S1 data downloader first.")
-    df = pd.read_csv(path, parse_dates=["datetime"]) 
+    path = DATA_PATH
+    # prefers a converted binary cache (btc_daily.cols/.parquet/.feather) when present
+    df = load_dataset(path)
     return df
 
 
-def run_all():
+def run_all(cache: ResultCache = None):
+    """Backtest the three strategies; with a cache, unchanged runs are restored instead of recomputed."""
     df = load_data()
     results = {}
-    results["ma"] = ma_backtest(df, out_dir="results/s2/ma_crossover_sl_tp")
-    results["rsi"] = rsi_backtest(df, out_dir="results/s2/rsi_sl_tp")
-    results["macd"] = macd_backtest(df, out_dir="results/s2/macd_sl_tp")
+    results["ma"] = cached_backtest(cache, ma_backtest, df, out_dir="results/s2/ma_crossover_sl_tp")
+    results["rsi"] = cached_backtest(cache, rsi_backtest, df, out_dir="results/s2/rsi_sl_tp")
+    results["macd"] = cached_backtest(cache, macd_backtest, df, out_dir="results/s2/macd_sl_tp")
     for k, v in results.items():
         metrics = v.get("metrics", {})
         print(f"{k} -> {metrics}")
+    if cache is not None:
+        print(f"result cache: {cache.hits} hits, {cache.misses} misses")
+
+
+def run_all_stream(data_path: str = DATA_PATH, chunksize: int = 100_000, resume: bool = False):
+    """Same three strategies through the streaming engine: bars are read chunk by chunk from the cache.
+
+    resume=True continues each strategy from its last snapshot (state.pkl) over the new bars only.
+    """
+    from S1.strategies.streaming import STREAMS
+    from S2.backtest import load_stream_state, run_backtest_stream
+
+    for key, name in (("ma", "ma_crossover"), ("rsi", "rsi"), ("macd", "macd")):
+        out_dir = f"results/s2/{name}_sl_tp_stream"
+        state = load_stream_state(out_dir) if resume else None
+        after = state["last_time"] if state is not None else None
+        out = run_backtest_stream(iter_cache_chunks(data_path, chunksize=chunksize, after=after),
+                                  out_dir=out_dir, strategy=STREAMS[name](), resume=resume)
+        print(f"{key} -> {out['new_bars']} new bars, {out['metrics']}")
 
 
 if __name__ == "__main__":
-    run_all()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true", help="read the cache in chunks (memory bounded by --chunksize)")
+    parser.add_argument("--data", default=DATA_PATH, help="cache file for --stream (.csv/.cols/.parquet/.feather)")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--resume", action="store_true",
+                        help="with --stream: continue from each strategy's snapshot over the new bars only")
+    parser.add_argument("--no-cache", action="store_true", help="always recompute (skip the result cache)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+    if args.stream:
+        run_all_stream(args.data, args.chunksize, resume=args.resume)
+    else:
+        run_all(cache=None if args.no_cache else ResultCache(args.cache_dir))
@@ -2,8 +2,14 @@ import os
 import json
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from typing import Optional
+from typing import Optional, Union
+
+from S1.backtest import check_artifacts
+from S1.plotting import plot_equity
+from S1.roundtrips import round_trips
+from S2.backtest import (BUY, SELL, SIGNAL_EXIT, STOP_LOSS, TAKE_PROFIT, LIQUIDATE_END, TradeLog,
+                         _prepare_bars, _schedule_transitions, _signals_matrix, _signal_index,
+                         _simulate_batch, _batch_metrics_frame)
 
 
 def _calc_metrics(equity_series: pd.Series) -> dict:
@@ -30,10 +36,24 @@ def _calc_metrics(equity_series: pd.Series) -> dict:
 
 
 def _read_kelly_series(kelly_dir: Optional[str], prefer_field: str = "f_smooth") -> Optional[pd.DataFrame]:
-    """Try to read precomputed kelly CSVs under kelly_dir and return a DataFrame with a datetime index or trade_index."""
+    """Try to read precomputed kelly CSVs under kelly_dir and return a DataFrame with a datetime index or trade_index.
+
+    A `prefer_field` that names a column of the batch outputs of scripts/kelly_estimate.py
+    (kelly_returns_wide.csv / kelly_trades_wide.csv, e.g. "ma_crossover_w100_f_smooth") is read on its own.
+    """
     if not kelly_dir:
         return None
     base = os.path.abspath(kelly_dir)
+    try:
+        for name, index_col in (("kelly_returns_wide.csv", "datetime"), ("kelly_trades_wide.csv", "trade_index")):
+            wide_csv = os.path.join(base, name)
+            if os.path.exists(wide_csv) and prefer_field in pd.read_csv(wide_csv, nrows=0).columns:
+                df = pd.read_csv(wide_csv, usecols=[index_col, prefer_field])
+                if index_col == "datetime":
+                    return df.set_index(pd.DatetimeIndex(pd.to_datetime(df.pop("datetime"))))
+                return df.set_index(index_col)
+    except Exception:
+        return None
     # prefer returns-based CSV
     returns_csv = os.path.join(base, "kelly_returns_rolling.csv")
     trades_csv = os.path.join(base, "kelly_trades_rolling.csv")
@@ -57,9 +77,91 @@ def _read_kelly_series(kelly_dir: Optional[str], prefer_field: str = "f_smooth")
     return None
 
 
+def _kelly_column(kelly_df: pd.DataFrame, kelly_field: str) -> np.ndarray:
+    """Values of `kelly_field` (or the last column as fallback) as float array."""
+    if kelly_field in kelly_df.columns:
+        return kelly_df[kelly_field].to_numpy(dtype=float)
+    return kelly_df.iloc[:, -1].to_numpy(dtype=float)
+
+
+def _naive_utc_ns(index) -> np.ndarray:
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.as_unit("ns").asi8
+
+
+def _align_kelly_to_bars(kelly_df: pd.DataFrame, bar_index, kelly_field: str) -> np.ndarray:
+    """As-of join of a datetime-indexed Kelly series onto the bars: value of the last row <= bar time.
+
+    Returns a float array with one entry per bar (NaN where no estimate exists yet).
+    """
+    try:
+        vals = _kelly_column(kelly_df, kelly_field)
+        keys = _naive_utc_ns(kelly_df.index)
+        order = np.argsort(keys, kind="stable")
+        pos = np.searchsorted(keys[order], _naive_utc_ns(bar_index), side="right") - 1
+        out = vals[order][np.maximum(pos, 0)]
+        out[pos < 0] = np.nan
+        return out
+    except Exception:
+        return np.full(len(bar_index), np.nan)
+
+
+def _kelly_by_trade(kelly_df: pd.DataFrame, kelly_field: str) -> np.ndarray:
+    """Dense lookup table for a trade-indexed Kelly series: out[k] = fraction after k completed trades.
+
+    Callers clamp k to len(out) - 1, matching the "last available estimate" rule of the bar loop.
+    """
+    try:
+        vals = _kelly_column(kelly_df, kelly_field)
+        ti = np.asarray(kelly_df.index, dtype=np.int64)
+        out = np.full(int(ti.max()) + 1, np.nan)
+        ok = ti >= 0
+        out[ti[ok]] = vals[ok]
+        return out
+    except Exception:
+        return np.full(1, np.nan)
+
+
+def _kelly_frame(kelly, kelly_field: str) -> pd.DataFrame:
+    """Normalise an in-memory Kelly Series/DataFrame to the shape `_read_kelly_series` returns
+    (datetime index for returns-based estimates, integer trade_index otherwise)."""
+    if isinstance(kelly, pd.Series):
+        kelly = kelly.to_frame(kelly_field if kelly.name is None else kelly.name)
+    if "datetime" in kelly.columns:
+        kelly = kelly.set_index(pd.DatetimeIndex(pd.to_datetime(kelly["datetime"])))
+    elif "trade_index" in kelly.columns:
+        kelly = kelly.set_index("trade_index")
+    return kelly
+
+
+def _resolve_kelly(kelly, kelly_dir: Optional[str], kelly_field: str, bar_index):
+    """Kelly fractions as (per-bar array, per-trade array); exactly one is set, or both None if unavailable.
+
+    `kelly` (in memory) takes precedence over the CSVs in `kelly_dir`. A 1-D array must already be
+    aligned to the bars; a Series/DataFrame is as-of joined (datetime index) or used as a
+    completed-trade lookup (integer index / trade_index column).
+    """
+    if kelly is None:
+        kelly_df = _read_kelly_series(kelly_dir, prefer_field=kelly_field)
+    elif isinstance(kelly, (pd.Series, pd.DataFrame)):
+        kelly_df = _kelly_frame(kelly, kelly_field)
+    else:
+        arr = np.asarray(kelly, dtype=float)
+        if arr.shape != (len(bar_index),):
+            raise ValueError(f"kelly array has shape {arr.shape}, expected one value per bar ({len(bar_index)},)")
+        return arr, None
+    if kelly_df is None:
+        return None, None
+    if isinstance(kelly_df.index, pd.DatetimeIndex):
+        return _align_kelly_to_bars(kelly_df, bar_index, kelly_field), None
+    return None, _kelly_by_trade(kelly_df, kelly_field)
+
+
 def run_backtest_sl_tp(df: pd.DataFrame,
                        signals: pd.Series,
-                       out_dir: str,
+                       out_dir: Optional[str],
                        init_cash: float = 10000.0,
                        fee: float = 0.001,
                        sl_pct: float = 0.05,
@@ -73,65 +175,75 @@ def run_backtest_sl_tp(df: pd.DataFrame,
                        kelly_dir: Optional[str] = None,
                        kelly_min_alloc: float = 0.0,
                        kelly_max_alloc: float = 0.25,
-                       kelly_field: str = "f_smooth") -> dict:
+                       kelly_field: str = "f_smooth",
+                       kelly: Optional[Union[pd.Series, pd.DataFrame, np.ndarray]] = None,
+                       kelly_scale: float = 1.0,
+                       artifacts: str = "full") -> dict:
     """A simple daily backtester with optional Kelly-based position sizing.
 
     New parameters (S3):
     - enable_kelly: if True, attempt to read precomputed Kelly fractions from `kelly_dir`.
-    - kelly_dir: directory where `kelly_returns_rolling.csv` or `kelly_trades_rolling.csv` live.
+    - kelly_dir: directory where `kelly_returns_rolling.csv` or `kelly_trades_rolling.csv` live (or the
+      batch `kelly_*_wide.csv` files, with kelly_field naming a column such as "rsi_w100_f_smooth").
     - kelly_min_alloc / kelly_max_alloc: clamp the chosen fraction.
     - kelly_field: which column to use from the kelly CSV (default 'f_smooth').
-    """
-    os.makedirs(out_dir, exist_ok=True)
+    - kelly: in-memory Kelly estimates used instead of `kelly_dir` (Series/DataFrame with a datetime
+      or trade index, or an array with one value per bar), so sweeps need not write CSVs.
+    - kelly_scale: multiplier applied to the estimate before clamping (fractional Kelly).
+    - artifacts: "full" writes equity/trades/roundtrips/metrics/plot files, "data" the same without the plot,
+      "metrics" only metrics.json, "none" nothing; out_dir=None is the same as artifacts="none".
 
-    # read kelly series if requested
-    kelly_df = None
-    if enable_kelly:
-        kelly_df = _read_kelly_series(kelly_dir, prefer_field=kelly_field)
+    df may also be a mapping of column arrays (e.g. `S1.data.load_memmap`), used without copying.
+    """
+    check_artifacts(artifacts)
+    if out_dir is None:
+        artifacts = "none"
+    if artifacts != "none":
+        os.makedirs(out_dir, exist_ok=True)
 
-    # Re-implement a straightforward, robust simulation similar to the debug runner
-    df = df.copy()
-    df = df.sort_values("datetime").reset_index(drop=True)
-    df["datetime"] = pd.to_datetime(df["datetime"]) 
-    df.set_index(pd.DatetimeIndex(df["datetime"].values), inplace=True)
+    # sorted bar times plus plain float arrays for the simulation
+    index, bars = _prepare_bars(df)
+    open_, high, low, close = bars["open"], bars["high"], bars["low"], bars["close"]
+    times = index.asi8
 
     # align signals explicitly to the dataframe datetimes unless caller already aligned
     if skip_reindex:
         sig = pd.Series(signals).fillna(0).astype(int)
-        if len(sig) != len(df):
-            sig = signals.reindex(pd.DatetimeIndex(df["datetime"].values)).fillna(0).astype(int)
+        if len(sig) != len(index):
+            sig = signals.reindex(index).fillna(0).astype(int)
     else:
-        sig = signals.reindex(pd.DatetimeIndex(df["datetime"].values)).fillna(0).astype(int)
+        sig = signals.reindex(index).fillna(0).astype(int)
 
     cash = init_cash
     qty = 0.0
-    equity_records = []
-    trades = []
+    equity = np.empty(len(index))
+    trades = TradeLog(unit=index.unit)
 
     in_position = False
     entry_price = None
 
     # Precompute scheduled entries/exits to enforce "signal -> next-day open" semantics
-    scheduled_entry = [False] * len(sig)
-    scheduled_exit = [False] * len(sig)
-    for j in range(1, len(sig)):
-        prev = sig.iloc[j - 1]
-        cur = sig.iloc[j]
-        if prev == 0 and cur == 1:
-            if j + 1 < len(sig):
-                scheduled_entry[j + 1] = True
-        if prev == 1 and cur == 0:
-            if j + 1 < len(sig):
-                scheduled_exit[j + 1] = True
+    scheduled_entry, scheduled_exit = _schedule_transitions(sig.to_numpy())
 
     # track number of completed trades to align with trades-based kelly if needed
     completed_trades = 0
 
-    for i, idx in enumerate(df.index):
-        price_open = df.at[idx, "open"]
-        price_high = df.at[idx, "high"]
-        price_low = df.at[idx, "low"]
-        price_close = df.at[idx, "close"]
+    # pre-align the Kelly series once: per-bar as-of values (datetime-indexed CSV) or a dense
+    # table keyed by completed-trade count (trade-indexed CSV); the loop then indexes directly
+    kelly_by_bar = None
+    kelly_by_trade = None
+    if enable_kelly:
+        kelly_by_bar, kelly_by_trade = _resolve_kelly(kelly, kelly_dir, kelly_field, index)
+        if kelly_scale != 1.0:
+            kelly_by_bar = None if kelly_by_bar is None else kelly_by_bar * kelly_scale
+            kelly_by_trade = None if kelly_by_trade is None else kelly_by_trade * kelly_scale
+    use_kelly = kelly_by_bar is not None or kelly_by_trade is not None
+
+    for i in range(len(index)):
+        price_open = open_[i]
+        price_high = high[i]
+        price_low = low[i]
+        price_close = close[i]
 
         # First, handle scheduled exit at today's open (signal 1->0 from previous day)
         if scheduled_exit[i] and in_position:
@@ -139,14 +251,7 @@ def run_backtest_sl_tp(df: pd.DataFrame,
             # add proceeds to cash rather than overwriting (protect against qty==0)
             proceeds = qty * exit_price * (1 - fee)
             cash = cash + proceeds
-            trades.append({
-                "datetime": idx.isoformat(),
-                "side": "sell",
-                "price": float(exit_price),
-                "qty": float(qty),
-                "cash": float(cash),
-                "reason": "signal_exit",
-            })
+            trades.append(times[i], SELL, exit_price, qty, cash, SIGNAL_EXIT)
             qty = 0.0
             in_position = False
             completed_trades += 1
@@ -157,30 +262,14 @@ def run_backtest_sl_tp(df: pd.DataFrame,
 
             # determine position size: either full-cash (old behavior) or Kelly-based
             desired_qty = 0.0
-            if enable_kelly and kelly_df is not None:
-                try:
-                    f = None
-                    # if kelly_df indexed by datetime, pick last <= idx
-                    if isinstance(kelly_df.index, pd.DatetimeIndex):
-                        sel = kelly_df.loc[kelly_df.index <= idx]
-                        if not sel.empty:
-                            if kelly_field in sel.columns:
-                                f = float(sel[kelly_field].iloc[-1])
-                            else:
-                                # fallback
-                                f = float(sel.iloc[-1].iloc[-1])
-                    else:
-                        # trades-based: use completed_trades as index
-                        ti = min(completed_trades, int(kelly_df.index.max()))
-                        if ti in kelly_df.index:
-                            if kelly_field in kelly_df.columns:
-                                f = float(kelly_df.loc[ti, kelly_field])
-                            else:
-                                f = float(kelly_df.iloc[ti].iloc[-1])
-                    if f is None or np.isnan(f):
-                        f = 0.0
-                except Exception:
-                    f = 0.0
+            if use_kelly:
+                if kelly_by_bar is not None:
+                    # last estimate <= this bar
+                    f = kelly_by_bar[i]
+                else:
+                    # trades-based: use completed_trades as index (last available estimate beyond the end)
+                    f = kelly_by_trade[min(completed_trades, len(kelly_by_trade) - 1)]
+                f = 0.0 if np.isnan(f) else float(f)
                 # clamp
                 f = max(kelly_min_alloc, min(kelly_max_alloc, f))
                 invest = f * (cash + qty * entry_price)
@@ -198,13 +287,7 @@ def run_backtest_sl_tp(df: pd.DataFrame,
             buy_cost = qty * entry_price * (1 + fee)
             cash = cash - buy_cost
             in_position = True
-            trades.append({
-                "datetime": idx.isoformat(),
-                "side": "buy",
-                "price": float(entry_price),
-                "qty": float(qty),
-                "cash": float(cash),
-            })
+            trades.append(times[i], BUY, entry_price, qty, cash)
 
         # If in position, check SL/TP intraday (using today's high/low)
         if in_position:
@@ -215,13 +298,13 @@ def run_backtest_sl_tp(df: pd.DataFrame,
 
             if hit_sl and hit_tp:
                 exit_price = sl_price
-                reason = "sl"
+                reason = STOP_LOSS
             elif hit_sl:
                 exit_price = sl_price
-                reason = "sl"
+                reason = STOP_LOSS
             elif hit_tp:
                 exit_price = tp_price
-                reason = "tp"
+                reason = TAKE_PROFIT
             else:
                 exit_price = None
 
@@ -229,39 +312,23 @@ def run_backtest_sl_tp(df: pd.DataFrame,
                 # add proceeds to cash (do not overwrite existing cash)
                 proceeds = qty * exit_price * (1 - fee)
                 cash = cash + proceeds
-                trades.append({
-                    "datetime": idx.isoformat(),
-                    "side": "sell",
-                    "price": float(exit_price),
-                    "qty": float(qty),
-                    "cash": float(cash),
-                    "reason": reason,
-                })
+                trades.append(times[i], SELL, exit_price, qty, cash, reason)
                 qty = 0.0
                 in_position = False
                 completed_trades += 1
 
-        equity = cash + (qty * price_close)
-        equity_records.append({"datetime": idx, "equity": float(equity)})
+        equity[i] = cash + (qty * price_close)
 
     # final liquidation
     if in_position and qty > 0:
-        last_idx = df.index[-1]
-        last_close = df.at[last_idx, "close"]
+        last_close = close[-1]
         proceeds = qty * last_close * (1 - fee)
         cash = cash + proceeds
-        trades.append({
-            "datetime": last_idx.isoformat(),
-            "side": "sell",
-            "price": float(last_close),
-            "qty": float(qty),
-            "cash": float(cash),
-            "reason": "liquidate_end",
-        })
+        trades.append(times[-1], SELL, last_close, qty, cash, LIQUIDATE_END)
         qty = 0.0
-        equity_records[-1]["equity"] = float(cash)
+        equity[-1] = float(cash)
 
-    equity_df = pd.DataFrame(equity_records).set_index("datetime")["equity"]
+    equity_df = pd.Series(equity, index=index.rename("datetime"), name="equity")
 
     metrics = _calc_metrics(equity_df)
     # attach metadata
@@ -275,23 +342,88 @@ def run_backtest_sl_tp(df: pd.DataFrame,
     metrics["end"] = end_used
     metrics["kline"] = kline
 
+    if artifacts == "none":
+        return {"metrics": metrics, "equity": equity_df, "trades": trades}
+
     # write outputs
-    equity_df.to_csv(os.path.join(out_dir, "equity.csv"), index_label="datetime")
     with open(os.path.join(out_dir, "metrics.json"), "w") as f:
         json.dump(metrics, f, indent=2)
-    trades_df = pd.DataFrame(trades)
-    if not trades_df.empty:
-        trades_df.to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+    if artifacts == "metrics":
+        return {"metrics": metrics, "equity": equity_df, "trades": trades}
+    equity_df.to_csv(os.path.join(out_dir, "equity.csv"), index_label="datetime")
+    if len(trades):
+        trades.to_frame().to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+        round_trips(trades, index=index, fee=fee).to_csv(os.path.join(out_dir, "roundtrips.csv"), index=False)
 
     # plots
-    try:
-        plt.figure(figsize=(10, 4))
-        equity_df.plot(title="Equity")
-        plt.xlabel("")
-        plt.tight_layout()
-        plt.savefig(os.path.join(out_dir, "equity.png"))
-        plt.close()
-    except Exception:
-        pass
+    if artifacts == "full":
+        try:
+            plot_equity(equity_df.index, equity_df.to_numpy(), os.path.join(out_dir, "equity.png"),
+                        title="Equity", label=None)
+        except Exception:
+            pass
 
     return {"metrics": metrics, "equity": equity_df, "trades": trades}
+
+
+def run_backtest_batch(df: pd.DataFrame,
+                       signals_matrix,
+                       params_list: list,
+                       init_cash: float = 10000.0,
+                       fee: float = 0.001,
+                       kline: str = "1d",
+                       kelly_dir: Optional[str] = None,
+                       kelly_field: str = "f_smooth",
+                       return_equity: bool = False,
+                       kelly: Optional[Union[pd.Series, pd.DataFrame, np.ndarray]] = None):
+    """Batch version of `run_backtest_sl_tp`: N signal vectors / parameter sets in one pass.
+
+    Per-row keys in params_list (all optional): sl_pct, tp_pct, fee, enable_kelly,
+    kelly_scale (multiplier applied to the Kelly estimate, e.g. fractional Kelly),
+    kelly_min_alloc, kelly_max_alloc. Every key is copied to the output row.
+
+    The Kelly series is read once from `kelly_dir` (or taken from `kelly`, see
+    `run_backtest_sl_tp`) and aligned to the bars (or to the completed-trade count for
+    trade-indexed estimates) instead of being looked up per entry.
+    Returns a metrics DataFrame (or (metrics_df, equity_df) with return_equity=True).
+    """
+    bar_index, bars = _prepare_bars(df)
+    sig = _signals_matrix(signals_matrix, _signal_index(df, bar_index))
+    if len(params_list) != sig.shape[0]:
+        raise ValueError(f"params_list has {len(params_list)} entries but signals_matrix has {sig.shape[0]} rows")
+    if len(bar_index) == 0:
+        raise ValueError("empty price data")
+
+    kelly_rows = np.array([bool(p.get("enable_kelly", False)) for p in params_list])
+    alloc_fn = None
+    kelly_bar, kelly_trade = (_resolve_kelly(kelly, kelly_dir, kelly_field, bar_index)
+                              if kelly_rows.any() else (None, None))
+    if kelly_bar is not None or kelly_trade is not None:
+        scale = np.array([float(p.get("kelly_scale", 1.0)) for p in params_list])
+        lo = np.array([float(p.get("kelly_min_alloc", 0.0)) for p in params_list])
+        hi = np.array([float(p.get("kelly_max_alloc", 0.25)) for p in params_list])
+        if kelly_bar is not None:
+            def raw_fraction(i, completed):
+                return np.full(len(params_list), kelly_bar[i])
+        else:
+            def raw_fraction(i, completed):
+                return kelly_trade[np.minimum(completed, len(kelly_trade) - 1)]
+
+        def alloc_fn(i, completed):
+            f = np.nan_to_num(raw_fraction(i, completed) * scale, nan=0.0)
+            f = np.maximum(lo, np.minimum(hi, f))
+            return np.where(kelly_rows, f, np.nan)
+
+    scheduled_entry, scheduled_exit = _schedule_transitions(sig)
+    sim = _simulate_batch(bars["open"], bars["high"], bars["low"], bars["close"],
+                          scheduled_entry, scheduled_exit, init_cash,
+                          [p.get("fee", fee) for p in params_list],
+                          [p.get("sl_pct", 0.05) for p in params_list],
+                          [p.get("tp_pct", 0.2) for p in params_list],
+                          alloc_fn=alloc_fn, clamp_dust=False,
+                          record_equity=return_equity)
+    metrics_df = _batch_metrics_frame(sim, bar_index, params_list, kline)
+    if return_equity:
+        equity_df = pd.DataFrame(sim["equity"].T, index=pd.DatetimeIndex(bar_index, name="datetime"))
+        return metrics_df, equity_df
+    return metrics_df
@@ -1,4 +1,3 @@
-import os
 import pandas as pd
 
 from S3.backtest import run_backtest_sl_tp
@@ -14,7 +13,6 @@ def generate_signals(df: pd.DataFrame) -> pd.Series:
 
 
 def backtest(df: pd.DataFrame, out_dir: str, sl_pct: float = 0.05, tp_pct: float = 0.2, **kwargs):
-    os.makedirs(out_dir, exist_ok=True)
     signals = generate_signals(df)
     signals = signals.reindex(pd.DatetimeIndex(df["datetime"]))
     signals = signals.fillna(0).astype(int)
@@ -22,6 +20,7 @@ def backtest(df: pd.DataFrame, out_dir: str, sl_pct: float = 0.05, tp_pct: float
 
 
 if __name__ == "__main__":
-    df = pd.read_csv("data/raw/btc_daily.csv", parse_dates=["datetime"]) 
+    from S1.data import load_dataset
+    df = load_dataset()
     out = backtest(df, out_dir="results/s3/macd", sl_pct=0.05, tp_pct=0.2)
     print(out["metrics"])
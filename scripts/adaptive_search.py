@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Adaptive SL/TP and Kelly parameter search: successive halving on growing data windows.
+
+The fixed grids of s2_grid_search.py (SL_GRID x TP_GRID) and compare_kelly_grid.py (MAX_ALLOCS x
+FRAC_FACTORS) backtest every cell on the full history. Here candidates are drawn from continuous
+ranges (Latin hypercube; --grid uses those fixed grids instead) and first evaluated on a short prefix
+of the data. The best 1/eta by the objective move on to a window eta times longer, until the last
+survivors are run on the full history. Each rung is one run_backtest_batch call: S2.backtest for
+sl_pct/tp_pct, S3.backtest (Kelly sizing, frac -> kelly_scale) when kelly_max_alloc or frac is searched.
+
+Objectives: sharpe, calmar (annualized_return / |max_drawdown|) and pareto (non-dominated sorting rank
+on annualized_return and max_drawdown); ties are broken by sharpe.
+
+Produces:
+- results/<s2|s3>/adaptive_search.csv: every evaluation (strategy, rung, bars, params, metrics, score)
+- one sweep in the SQLite experiment store with the full-history rows (S1.experiments; --db)
+- with --write-best: the best cell per strategy re-run through the strategy's backtest() into
+  results/<s2|s3>/adaptive_best/<strategy>/
+
+Usage: python3 scripts/adaptive_search.py                      # sl_pct/tp_pct for the S2 strategies
+       python3 scripts/adaptive_search.py --objective calmar --candidates 243 --range sl_pct=0.01:0.2
+       python3 scripts/adaptive_search.py --grid               # halving over SL_GRID x TP_GRID
+       python3 scripts/adaptive_search.py --params kelly_max_alloc frac --strategy ma_crossover \\
+           --kelly-dir results/s3/ma_crossover_kelly
+"""
+import argparse
+import datetime
+import itertools
+import math
+import os
+import subprocess
+import sys
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from S1.data import load_dataset
+from S1.experiments import DEFAULT_DB, ExperimentStore
+from S1.pareto import pareto_rank
+
+STRATEGIES = ["ma_crossover", "rsi", "macd"]
+DATA_PATH = os.path.join(ROOT, "data", "raw", "btc_daily.csv")
+
+# continuous search ranges (inclusive); --range overrides
+PARAM_RANGES = {
+    "sl_pct": (0.01, 0.10),
+    "tp_pct": (0.05, 0.40),
+    "kelly_max_alloc": (0.01, 0.50),
+    "frac": (0.10, 1.00),
+}
+KELLY_PARAMS = ("kelly_max_alloc", "frac")
+# values of the parameters that are not searched (compare_kelly_grid's fixed SL/TP)
+DEFAULTS = {"sl_pct": 0.05, "tp_pct": 0.2, "kelly_max_alloc": 0.25, "frac": 1.0}
+
+# shortest data window a rung may use (about a year of daily bars)
+MIN_BARS = 250
+
+
+def _calmar(table: pd.DataFrame) -> pd.Series:
+    drawdown = -table["max_drawdown"]
+    return table["annualized_return"] / drawdown.where(drawdown > 0)
+
+
+def _pareto(table: pd.DataFrame) -> pd.Series:
+    rank = pareto_rank(table[["annualized_return", "max_drawdown"]].to_numpy(dtype=float))
+    return pd.Series(0.0 - rank, index=table.index)
+
+
+# objective name -> score per metrics row (larger is better, NaN ranks last)
+OBJECTIVES: Dict[str, Callable[[pd.DataFrame], pd.Series]] = {
+    "sharpe": lambda table: table["sharpe"],
+    "calmar": _calmar,
+    "pareto": _pareto,
+}
+
+
+def sample_candidates(ranges: Dict[str, Sequence[float]], n: int, seed: int = 0) -> List[Dict]:
+    """n Latin-hypercube points: every range is cut into n strata and each stratum is hit once."""
+    rng = np.random.default_rng(seed)
+    names = list(ranges)
+    strata = np.column_stack([rng.permutation(n) for _ in names]) if names else np.zeros((n, 0))
+    u = (strata + rng.random(strata.shape)) / n
+    lo = np.array([ranges[p][0] for p in names], dtype=float)
+    hi = np.array([ranges[p][1] for p in names], dtype=float)
+    points = np.round(lo + u * (hi - lo), 4)
+    return [dict(zip(names, map(float, row))) for row in points]
+
+
+def grid_candidates(params: Sequence[str]) -> List[Dict]:
+    """The fixed grids of the exhaustive scripts, restricted to `params`."""
+    grids = {}
+    if {"sl_pct", "tp_pct"} & set(params):
+        from scripts.s2_grid_search import SL_GRID, TP_GRID
+        grids.update(sl_pct=SL_GRID, tp_pct=TP_GRID)
+    if set(KELLY_PARAMS) & set(params):
+        from scripts.compare_kelly_grid import FRAC_FACTORS, MAX_ALLOCS
+        grids.update(kelly_max_alloc=MAX_ALLOCS, frac=FRAC_FACTORS)
+    return [dict(zip(params, map(float, values))) for values in itertools.product(*(grids[p] for p in params))]
+
+
+def _engine(params: Sequence[str]) -> str:
+    return "s3" if set(KELLY_PARAMS) & set(params) else "s2"
+
+
+def _engine_params(cell: Dict, engine: str) -> Dict:
+    row = {k: v for k, v in DEFAULTS.items() if engine == "s3" or k not in KELLY_PARAMS}
+    row.update(cell)
+    if engine == "s3":
+        row.update(enable_kelly=True, kelly_scale=row["frac"], kelly_min_alloc=0.0)
+    return row
+
+
+def batch_evaluator(df: pd.DataFrame, strategy: str, engine: str = "s2", kelly_dir: Optional[str] = None,
+                    kelly_field: str = "f_smooth"):
+    """evaluate(cells, n_bars) -> metrics DataFrame of `cells` backtested on the first n_bars bars.
+
+    Signals are generated once on the full history and sliced, so a rung sees exactly the prefix of
+    the full-history run (indicator warm-up included). The S3 engine's Kelly estimates are read from
+    kelly_dir once here and passed to every rung in memory.
+    """
+    df = df.sort_values("datetime").reset_index(drop=True)
+    mod = __import__(f"{engine.upper()}.strategies.{strategy}", fromlist=["generate_signals"])
+    sig = mod.generate_signals(df).reindex(pd.DatetimeIndex(df["datetime"])).fillna(0).astype(int).to_numpy()
+    run_backtest_batch = __import__(f"{engine.upper()}.backtest", fromlist=["run_backtest_batch"]).run_backtest_batch
+    kwargs = {}
+    if engine == "s3":
+        from S3.backtest import _read_kelly_series
+        kelly = _read_kelly_series(kelly_dir, prefer_field=kelly_field)
+        if kelly is None:
+            raise FileNotFoundError(f"no Kelly estimates in {kelly_dir}; run scripts/kelly_estimate.py first")
+        kwargs = {"kelly": kelly, "kelly_field": kelly_field}
+
+    def evaluate(cells: List[Dict], n_bars: int) -> pd.DataFrame:
+        rows = [_engine_params(cell, engine) for cell in cells]
+        signals = np.broadcast_to(sig[:n_bars], (len(rows), n_bars))
+        return run_backtest_batch(df.iloc[:n_bars], signals, rows, **kwargs)
+
+    return evaluate
+
+
+def _rung_bars(n_candidates: int, n_bars: int, eta: int, min_bars: int) -> List[int]:
+    """Window length of every rung, shortest first; the last one is the full history.
+
+    The last rung keeps at least eta survivors, and eta**2 candidates or fewer (e.g. the 3x3
+    SL_GRID x TP_GRID) are run on the full history directly: with so few cells a short window
+    drops the full-grid best too often for the bars it saves.
+    """
+    rungs = 1
+    if n_candidates <= eta ** 2:
+        return [n_bars]
+    while eta ** (rungs + 1) <= n_candidates and n_bars / eta ** rungs >= min_bars:
+        rungs += 1
+    return [math.ceil(n_bars / eta ** (rungs - 1 - r)) for r in range(rungs)]
+
+
+def _ranked(table: pd.DataFrame) -> np.ndarray:
+    """Positions of `table` rows, best first: by score, then sharpe; NaN last."""
+    score = table["score"].to_numpy(dtype=float)
+    sharpe = table["sharpe"].to_numpy(dtype=float)
+    return np.lexsort((-np.nan_to_num(sharpe, nan=-np.inf), -np.nan_to_num(score, nan=-np.inf)))
+
+
+def successive_halving(evaluate, candidates: List[Dict], n_bars: int, objective: str = "sharpe",
+                       eta: int = 3, min_bars: int = MIN_BARS) -> pd.DataFrame:
+    """Run `candidates` through growing windows, keeping the best ceil(n / eta) after every rung.
+
+    Returns one row per evaluation with rung, bars and score columns; rows of the last rung are
+    full-history results, best first.
+    """
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    score_fn = OBJECTIVES[objective]
+    tables = []
+    live = list(candidates)
+    for rung, bars in enumerate(_rung_bars(len(live), n_bars, eta, min_bars)):
+        table = evaluate(live, bars)
+        table.insert(0, "rung", rung)
+        table.insert(1, "bars", bars)
+        table["score"] = score_fn(table).to_numpy(dtype=float)
+        order = _ranked(table)
+        tables.append(table.iloc[order])
+        live = [live[i] for i in order[:math.ceil(len(live) / eta)]]
+    return pd.concat(tables, ignore_index=True)
+
+
+def full_grid_cost(table: pd.DataFrame, n_bars: int) -> float:
+    """Bars simulated by the search, as a fraction of running every candidate on the full history."""
+    return float(table["bars"].sum() / (n_bars * (table["rung"] == 0).sum()))
+
+
+def _git_short():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT).decode().strip()
+    except Exception:
+        return ""
+
+
+def _write_best(df, strategy, engine, row, out_dir, kelly_dir, kelly_field) -> None:
+    mod = __import__(f"{engine.upper()}.strategies.{strategy}", fromlist=["backtest"])
+    kwargs = {}
+    if engine == "s3":
+        kwargs = dict(enable_kelly=True, kelly_dir=kelly_dir, kelly_field=kelly_field, kelly_scale=row["frac"],
+                      kelly_min_alloc=0.0, kelly_max_alloc=row["kelly_max_alloc"])
+    res = mod.backtest(df, out_dir=out_dir, sl_pct=row["sl_pct"], tp_pct=row["tp_pct"], **kwargs)
+    print(f"Wrote {out_dir} (sharpe {res['metrics'].get('sharpe')})")
+
+
+def run(strategies: Sequence[str] = STRATEGIES, params: Sequence[str] = ("sl_pct", "tp_pct"),
+        ranges: Optional[Dict] = None, objective: str = "sharpe", candidates: int = 81, eta: int = 3,
+        min_bars: int = MIN_BARS, grid: bool = False, seed: int = 0, kelly_dir: Optional[str] = None,
+        kelly_field: str = "f_smooth", write_best: bool = False, db: str = os.path.join(ROOT, DEFAULT_DB)):
+    engine = _engine(params)
+    results_dir = os.path.join(ROOT, "results", engine)
+    os.makedirs(results_dir, exist_ok=True)
+    ranges = {p: (ranges or {}).get(p, PARAM_RANGES[p]) for p in params}
+    cells = grid_candidates(params) if grid else sample_candidates(ranges, candidates, seed)
+
+    df = load_dataset(DATA_PATH)
+    tables = []
+    for strat in strategies:
+        strat_kelly_dir = kelly_dir or os.path.join(ROOT, "results", "s3", f"{strat}_kelly")
+        evaluate = batch_evaluator(df, strat, engine, strat_kelly_dir, kelly_field)
+        table = successive_halving(evaluate, cells, len(df), objective, eta, min_bars)
+        table.insert(0, "strategy", strat)
+        tables.append(table)
+        best = table[table["rung"] == table["rung"].max()].iloc[0]
+        print(f"{strat}: best {', '.join(f'{p}={best[p]:g}' for p in params)} {objective}={best['score']:.4f} "
+              f"({len(table)} evaluations, {full_grid_cost(table, len(df)):.0%} of a full-history grid)")
+        if write_best:
+            _write_best(df, strat, engine, best, os.path.join(results_dir, "adaptive_best", strat),
+                        strat_kelly_dir, kelly_field)
+
+    out = pd.concat(tables, ignore_index=True)
+    out_csv = os.path.join(results_dir, "adaptive_search.csv")
+    out.to_csv(out_csv, index=False)
+    print(f"Wrote {out_csv}")
+
+    if db:
+        final = out[out["rung"] == out.groupby("strategy")["rung"].transform("max")]
+        config = {"params": list(params), "ranges": ranges, "grid": grid, "objective": objective,
+                  "candidates": len(cells), "eta": eta, "min_bars": min_bars, "seed": seed,
+                  "evaluations": len(out), "data": os.path.relpath(DATA_PATH, ROOT)}
+        with ExperimentStore(db) as store:
+            sweep_id = store.record_sweep("adaptive_search", final.to_dict("records"), param_keys=params,
+                                          tag=_git_short(), date=datetime.date.today().isoformat(),
+                                          config=config)
+        print(f"Recorded sweep {sweep_id} ({len(final)} full-history cells) in {db}")
+    return out
+
+
+def _parse_range(text: str):
+    name, _, bounds = text.partition("=")
+    lo, _, hi = bounds.partition(":")
+    if name not in PARAM_RANGES or not lo or not hi:
+        raise argparse.ArgumentTypeError(f"expected <param>=<low>:<high> with param in {list(PARAM_RANGES)}")
+    return name, (float(lo), float(hi))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", nargs="+", default=STRATEGIES)
+    parser.add_argument("--params", nargs="+", choices=list(PARAM_RANGES), default=["sl_pct", "tp_pct"],
+                        help="parameters to search (a Kelly parameter switches to the S3 engine)")
+    parser.add_argument("--range", type=_parse_range, action="append", default=[],
+                        help="override a search range, e.g. sl_pct=0.01:0.2 (repeatable)")
+    parser.add_argument("--objective", choices=list(OBJECTIVES), default="sharpe")
+    parser.add_argument("--candidates", type=int, default=81, help="number of sampled starting points")
+    parser.add_argument("--eta", type=int, default=3, help="keep 1/eta of the candidates per rung")
+    parser.add_argument("--min-bars", type=int, default=MIN_BARS, help="shortest data window")
+    parser.add_argument("--grid", action="store_true", help="start from the fixed grids instead of sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kelly-dir", default=None,
+                        help="Kelly estimates for the S3 engine (default: results/s3/<strategy>_kelly)")
+    parser.add_argument("--kelly-field", default="f_smooth")
+    parser.add_argument("--write-best", action="store_true",
+                        help="re-run each strategy's best cell through its backtest() with full artifacts")
+    parser.add_argument("--db", default=os.path.join(ROOT, DEFAULT_DB),
+                        help="SQLite experiment store the sweep is recorded in (empty string to skip)")
+    args = parser.parse_args()
+    run(strategies=args.strategy, params=args.params, ranges=dict(args.range), objective=args.objective,
+        candidates=args.candidates, eta=args.eta, min_bars=args.min_bars, grid=args.grid, seed=args.seed,
+        kelly_dir=args.kelly_dir, kelly_field=args.kelly_field, write_best=args.write_best, db=args.db)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Timing of the rolling discrete Kelly estimate in scripts/kelly_estimate.py.
+
+Times rolling_discrete_kelly on a synthetic series of per-trade returns and, on the first
+--check-trades trades, compares it with a per-window rolling().apply reference.
+
+Usage:
+  PYTHONPATH=. python3 scripts/bench_kelly_estimate.py
+  PYTHONPATH=. python3 scripts/bench_kelly_estimate.py --trades 10000000 --window 250
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.kelly_estimate import rolling_discrete_kelly
+
+
+def window_kelly(x: np.ndarray) -> float:
+    wins, losses = x[x > 0], x[x <= 0]
+    if len(x) < 5 or len(wins) == 0 or len(losses) == 0:
+        return np.nan
+    p = len(wins) / len(x)
+    return p - (1 - p) / (wins.mean() / -losses.mean())
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--trades", type=int, default=1_000_000)
+    p.add_argument("--window", type=int, default=100)
+    p.add_argument("--check-trades", type=int, default=20_000, help="trades compared with the per-window reference")
+    args = p.parse_args()
+
+    r = pd.Series(np.random.default_rng(1).normal(0.001, 0.02, args.trades))
+    f, t = timed(lambda: rolling_discrete_kelly(r, args.window))
+    print(f"rolling_discrete_kelly: {t:8.3f}s for {len(r)} trades (window {args.window})")
+
+    sub = r.iloc[:args.check_trades]
+    ref, t_ref = timed(lambda: sub.rolling(args.window, min_periods=5).apply(window_kelly, raw=True))
+    same = np.allclose(f.iloc[:len(sub)], ref, rtol=1e-9, atol=1e-12, equal_nan=True)
+    print(f"per-window reference:   {t_ref:8.3f}s for {len(sub)} trades "
+          f"(~{t_ref * len(r) / len(sub):.1f}s extrapolated); matches: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Timing of S1.pareto.pareto_mask on random objective tables.
+
+Times the 2-objective sweep and the k-objective block method on normally distributed points,
+and checks them against the O(n^2) pairwise test on a subset (--check-rows).
+
+Usage:
+  PYTHONPATH=. python3 scripts/bench_pareto.py
+  PYTHONPATH=. python3 scripts/bench_pareto.py --rows 1000000 --rows-k 100000 --k 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from S1.pareto import pareto_mask
+
+
+def pairwise_mask(values: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(values), dtype=bool)
+    for i, row in enumerate(values):
+        out[i] = not ((values >= row).all(axis=1) & (values > row).any(axis=1)).any()
+    return out
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=200_000, help="points for the 2-objective case")
+    p.add_argument("--rows-k", type=int, default=20_000, help="points for the k-objective case")
+    p.add_argument("--k", type=int, default=4)
+    p.add_argument("--check-rows", type=int, default=2_000, help="rows compared with the pairwise test")
+    args = p.parse_args()
+
+    rng = np.random.default_rng(2)
+    for n, k in [(args.rows, 2), (args.rows_k, args.k)]:
+        values = rng.normal(size=(n, k))
+        mask, t = timed(lambda: pareto_mask(values))
+        sub = values[:args.check_rows]
+        same = np.array_equal(pareto_mask(sub), pairwise_mask(sub))
+        print(f"k={k} rows={n}: {t:8.3f}s, front {int(mask.sum())} rows; "
+              f"matches pairwise on {len(sub)} rows: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Timing comparison of the S1 backtest engines on a synthetic minute-bar series.
+
+Runs `S1.backtest.run_backtest` with engine="loop" and engine="array" on the same
+random-walk OHLC data and random 0/1 position signals, checks the outputs match,
+and prints wall times for the simulation kernel and the full call (including CSV/PNG export).
+
+Usage:
+  PYTHONPATH=. python3 scripts/bench_s1_kernel.py --bars 1000000
+  PYTHONPATH=. python3 scripts/bench_s1_kernel.py --bars 1000000 --loop-bars 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from S1.backtest import run_backtest, _simulate_arrays
+
+
+def make_data(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    opens = np.concatenate([[close[0]], close[:-1]])
+    df = pd.DataFrame({
+        "datetime": pd.date_range("2020-01-01", periods=n, freq="min", tz="UTC"),
+        "open": opens,
+        "high": np.maximum(opens, close),
+        "low": np.minimum(opens, close),
+        "close": close,
+        "volume": 1.0,
+    })
+    # flip position roughly every 500 bars
+    flips = rng.random(n) < 1 / 500
+    sig = pd.Series(np.cumsum(flips) % 2, index=df["datetime"])
+    return df, sig
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.add_argument("--loop-bars", type=int, default=None,
+                   help="run the loop engine on the first N bars only and extrapolate (it is slow)")
+    args = p.parse_args()
+
+    df, sig = make_data(args.bars)
+    print(f"bars={len(df)} transitions={int((sig.diff().abs() > 0).sum())}")
+
+    _, t_kernel = timed(lambda: _simulate_arrays(df["open"].to_numpy(), df["close"].to_numpy(),
+                                                 sig.to_numpy(), 10000.0, 0.001))
+    print(f"array kernel only:      {t_kernel:8.3f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_arr, t_arr = timed(lambda: run_backtest(df, sig, os.path.join(tmp, "array"), engine="array"))
+        print(f"run_backtest(array):    {t_arr:8.3f}s")
+
+        n_loop = min(args.loop_bars or len(df), len(df))
+        df_loop, sig_loop = df.iloc[:n_loop], sig.iloc[:n_loop]
+        out_loop, t_loop = timed(lambda: run_backtest(df_loop, sig_loop, os.path.join(tmp, "loop"), engine="loop"))
+        if n_loop < len(df):
+            est = t_loop * len(df) / n_loop
+            print(f"run_backtest(loop):     {t_loop:8.3f}s on {n_loop} bars (~{est:.1f}s extrapolated)")
+            out_arr = run_backtest(df_loop, sig_loop, os.path.join(tmp, "array_sub"), engine="array")
+        else:
+            est = t_loop
+            print(f"run_backtest(loop):     {t_loop:8.3f}s")
+
+    same = out_loop["trades"] == out_arr["trades"] and out_loop["metrics"] == out_arr["metrics"]
+    print(f"outputs identical: {same}; speedup ~{est / t_arr:.1f}x "
+          f"(array run time is mostly CSV/PNG export: kernel {t_kernel:.3f}s of {t_arr:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
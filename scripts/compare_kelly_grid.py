@@ -4,93 +4,178 @@
 Outputs:
 - results/s3/ma_crossover_compare/grid/summary.csv
 - results/s3/ma_crossover_compare/grid/return_vs_alloc.png
-- per-run folders under results/s3/ma_crossover_compare/grid/run_<idx>/
+- one sweep in the SQLite experiment store (results/experiments.sqlite, S1.experiments; --db)
+- per-run folders under results/s3/ma_crossover_compare/grid/run_<idx>/ (skipped with --summary-only);
+  their equity.png files are rendered after all runs finish, in a process pool (--plot-jobs)
+
+The Kelly series is read once and passed to the backtester in memory, scaled per cell via
+kelly_scale; no per-run Kelly CSVs are written. With --batch the whole grid is evaluated in one
+vectorized pass (S3.backtest.run_backtest_batch) and no per-run folders are written either.
+Per-run results are cached by content (S1.result_cache): unchanged runs are restored, not recomputed
+(--no-cache to disable).
 """
+import argparse
+import datetime
 import json
+import subprocess
 import pandas as pd
-import matplotlib.pyplot as plt
 from pathlib import Path
-from S3.strategies.ma_crossover import backtest
+from S1.data import load_dataset
+from S1.experiments import DEFAULT_DB, ExperimentStore
+from S1.plotting import render_run_dirs
+from S1.result_cache import DEFAULT_CACHE_DIR, ResultCache, cached_backtest
+from S3.strategies.ma_crossover import backtest, generate_signals
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_CSV = ROOT / 'data' / 'raw' / 'btc_daily.csv'
 ORIG_KELLY = Path('results/s3/ma_crossover_kelly/kelly_returns_rolling.csv')
 OUT_DIR = Path('results/s3/ma_crossover_compare/grid')
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # grid settings (can be tuned)
 MAX_ALLOCS = [0.01, 0.05, 0.1, 0.25, 0.5]
 FRAC_FACTORS = [0.25, 0.5, 1.0]
 
-runs = []
-idx = 0
-
-df = pd.read_csv(DATA_CSV, parse_dates=['datetime'])
-orig_kelly = pd.read_csv(ORIG_KELLY, parse_dates=['datetime']).set_index('datetime')
-
-for frac in FRAC_FACTORS:
-    for max_alloc in MAX_ALLOCS:
-        idx += 1
-        run_dir = OUT_DIR / f'run_{idx:02d}_f{frac}_max{max_alloc}'
-        run_dir.mkdir(parents=True, exist_ok=True)
-        # prepare modified kelly dir
-        kelly_dir = run_dir / 'kelly'
-        kelly_dir.mkdir(exist_ok=True)
-        # adjust f_smooth (if present) by frac
-        mod = orig_kelly.copy()
-        # find a sensible column to scale
-        for col in ['f_smooth', 'f_adj', 'f_raw']:
-            if col in mod.columns:
-                mod[col] = mod[col].astype(float) * frac
-                break
-        # write to kelly_returns_rolling.csv in the kelly_dir
-        mod.reset_index().to_csv(kelly_dir / 'kelly_returns_rolling.csv', index=False)
-
-        # run backtest using this modified kelly_dir and the max_alloc clamp
-        print(f'Run {idx}: frac={frac}, max_alloc={max_alloc} -> out {run_dir}')
-        out = backtest(df, out_dir=str(run_dir), sl_pct=0.05, tp_pct=0.2,
-                       enable_kelly=True, kelly_dir=str(kelly_dir), kelly_min_alloc=0.0,
-                       kelly_max_alloc=float(max_alloc), kelly_field='f_smooth')
-
-        metrics = out['metrics']
-        trades_count = len(out.get('trades', [])) if out.get('trades') is not None else 0
-        final_equity = float(out['equity'].iloc[-1])
-
-        runs.append({
-            'run_idx': idx,
-            'frac': frac,
-            'kelly_max_alloc': max_alloc,
-            'total_return': metrics.get('total_return'),
-            'annualized_return': metrics.get('annualized_return'),
-            'max_drawdown': metrics.get('max_drawdown'),
-            'volatility': metrics.get('volatility'),
-            'sharpe': metrics.get('sharpe'),
-            'trades': trades_count,
-            'final_equity': final_equity,
-            'out_dir': str(run_dir),
-        })
-
-# save summary
-summary_df = pd.DataFrame(runs)
-summary_df.to_csv(OUT_DIR / 'summary.csv', index=False)
-print('Wrote', OUT_DIR / 'summary.csv')
-
-# plot total_return vs max_alloc for each frac
-plt.figure(figsize=(8,5))
-for frac in sorted(summary_df['frac'].unique()):
-    sub = summary_df[summary_df['frac']==frac]
-    plt.plot(sub['kelly_max_alloc'], sub['total_return'], marker='o', label=f'frac={frac}')
-plt.xlabel('kelly_max_alloc')
-plt.ylabel('total_return')
-plt.title('Total return vs kelly_max_alloc (per frac)')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig(OUT_DIR / 'return_vs_alloc.png')
-print('Wrote', OUT_DIR / 'return_vs_alloc.png')
-
-# also write JSON summary
-with open(OUT_DIR / 'summary.json','w') as f:
-    json.dump(runs, f, indent=2)
-
-print('Done grid runs. Summary in', OUT_DIR)
+
+def _summary_row(idx, frac, max_alloc, metrics, trades_count, final_equity, out_dir):
+    return {
+        'run_idx': idx,
+        'frac': frac,
+        'kelly_max_alloc': max_alloc,
+        'total_return': metrics.get('total_return'),
+        'annualized_return': metrics.get('annualized_return'),
+        'max_drawdown': metrics.get('max_drawdown'),
+        'volatility': metrics.get('volatility'),
+        'sharpe': metrics.get('sharpe'),
+        'trades': trades_count,
+        'final_equity': final_equity,
+        'out_dir': out_dir,
+    }
+
+
+def _load_kelly():
+    """Original Kelly estimates, read once; the column actually present is reported as kelly_field."""
+    orig_kelly = pd.read_csv(ORIG_KELLY, parse_dates=['datetime']).set_index('datetime')
+    for col in ['f_smooth', 'f_adj', 'f_raw']:
+        if col in orig_kelly.columns:
+            return orig_kelly, col
+    return orig_kelly, 'f_smooth'
+
+
+def run_serial(df, summary_only=False, cache=None):
+    runs = []
+    idx = 0
+    kelly, kelly_field = _load_kelly()
+
+    for frac in FRAC_FACTORS:
+        for max_alloc in MAX_ALLOCS:
+            idx += 1
+            run_dir = None if summary_only else OUT_DIR / f'run_{idx:02d}_f{frac}_max{max_alloc}'
+
+            # run backtest with the in-memory kelly series scaled by frac and the max_alloc clamp
+            print(f'Run {idx}: frac={frac}, max_alloc={max_alloc} -> out {run_dir or "-"}')
+            out = cached_backtest(cache, backtest, df, out_dir=None if run_dir is None else str(run_dir),
+                                  sl_pct=0.05, tp_pct=0.2, enable_kelly=True, kelly=kelly, kelly_scale=frac,
+                                  kelly_min_alloc=0.0, kelly_max_alloc=float(max_alloc), kelly_field=kelly_field,
+                                  artifacts='data')
+
+            trades_count = len(out.get('trades', [])) if out.get('trades') is not None else 0
+            final_equity = float(out['equity'].iloc[-1])
+            runs.append(_summary_row(idx, frac, max_alloc, out['metrics'], trades_count, final_equity,
+                                     '' if run_dir is None else str(run_dir)))
+    return runs
+
+
+def run_batch(df):
+    from S3.backtest import run_backtest_batch
+
+    kelly, kelly_field = _load_kelly()
+    sig = generate_signals(df)
+    sig = sig.reindex(pd.DatetimeIndex(df['datetime'])).fillna(0).astype(int)
+    params = []
+    for frac in FRAC_FACTORS:
+        for max_alloc in MAX_ALLOCS:
+            params.append({'frac': frac, 'kelly_max_alloc': float(max_alloc), 'kelly_scale': frac,
+                           'kelly_min_alloc': 0.0, 'enable_kelly': True, 'sl_pct': 0.05, 'tp_pct': 0.2})
+    print(f'Running {len(params)} grid cells in one batch')
+    table = run_backtest_batch(df, [sig] * len(params), params, kelly=kelly, kelly_field=kelly_field)
+    return [_summary_row(i + 1, r['frac'], r['kelly_max_alloc'], r, r['trades'], r['final_equity'], '')
+            for i, r in enumerate(table.to_dict('records'))]
+
+
+def _git_short():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT).decode().strip()
+    except Exception:
+        return ''
+
+
+def record_sweep(db_path, runs, batch):
+    """All runs of this grid as one sweep, inserted in a single transaction."""
+    config = {'batch': batch, 'max_allocs': MAX_ALLOCS, 'frac_factors': FRAC_FACTORS,
+              'sl_pct': 0.05, 'tp_pct': 0.2, 'kelly': str(ORIG_KELLY)}
+    with ExperimentStore(db_path) as store:
+        sweep_id = store.record_sweep('compare_kelly_grid', runs, param_keys=('frac', 'kelly_max_alloc'),
+                                      tag=_git_short(), date=datetime.date.today().isoformat(),
+                                      config=config, strategy='ma_crossover')
+    print(f'Recorded sweep {sweep_id} ({len(runs)} runs) in {db_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch', action='store_true', help='evaluate the grid in one vectorized pass (no per-run folders)')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='skip per-run folders (equity/trades/plots); only the summary is written')
+    parser.add_argument('--plot-jobs', type=int, default=None,
+                        help='processes rendering the per-run plots after the grid (default: all CPUs; 1 = in-process)')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every run (skip the result cache)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help='SQLite experiment store the sweep is recorded in (empty string to skip)')
+    args = parser.parse_args()
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    df = load_dataset(str(DATA_CSV))
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    runs = run_batch(df) if args.batch else run_serial(df, summary_only=args.summary_only, cache=cache)
+
+    # save summary
+    summary_df = pd.DataFrame(runs)
+    summary_df.to_csv(OUT_DIR / 'summary.csv', index=False)
+    print('Wrote', OUT_DIR / 'summary.csv')
+    if args.db:
+        record_sweep(args.db, runs, args.batch)
+
+    # plot total_return vs max_alloc for each frac
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(8,5))
+    for frac in sorted(summary_df['frac'].unique()):
+        sub = summary_df[summary_df['frac']==frac]
+        plt.plot(sub['kelly_max_alloc'], sub['total_return'], marker='o', label=f'frac={frac}')
+    plt.xlabel('kelly_max_alloc')
+    plt.ylabel('total_return')
+    plt.title('Total return vs kelly_max_alloc (per frac)')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(OUT_DIR / 'return_vs_alloc.png')
+    print('Wrote', OUT_DIR / 'return_vs_alloc.png')
+
+    # also write JSON summary
+    with open(OUT_DIR / 'summary.json','w') as f:
+        json.dump(runs, f, indent=2)
+
+    # deferred per-run plots from the saved equity.csv files
+    run_dirs = [r['out_dir'] for r in runs if r['out_dir']]
+    if run_dirs:
+        print(f'Rendering plots for {len(run_dirs)} runs')
+        for run_dir, paths in render_run_dirs(run_dirs, jobs=args.plot_jobs, return_exceptions=True):
+            if isinstance(paths, Exception):
+                print(f'Plot rendering failed for {run_dir}: {paths!r}')
+            else:
+                print('Wrote', ', '.join(paths))
+
+    print('Done grid runs. Summary in', OUT_DIR)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import pandas as pd
+from S1.data import load_dataset
 
-df = pd.read_csv('data/raw/btc_daily.csv', parse_dates=['datetime'])
+df = load_dataset('data/raw/btc_daily.csv')
 from S1.strategies.ma_crossover import generate_signals
 
 sig = generate_signals(df)
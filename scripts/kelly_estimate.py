@@ -6,9 +6,17 @@ and save CSV + plot to results/s3/<strategy>_kelly/.
 
 Usage examples:
   python3 scripts/kelly_estimate.py --strategy ma_crossover --window 100 --kelly_frac 0.25
+  python3 scripts/kelly_estimate.py --strategy ma_crossover rsi macd --window 50 100 250  # batch mode
 
-This script is defensive: it first tries to use `results/s1/<strategy>/trades.csv` (per-trade returns,
-discrete Kelly). If not available or not parseable, it falls back to `results/s1/<strategy>/equity.csv`
+Batch mode (several strategies/windows, or --batch) reads each strategy's input once, computes f_raw,
+f_adj and f_smooth for every window and writes them side by side, one column per
+<strategy>_w<window>_<variant>, to results/s3/kelly_batch/kelly_returns_wide.csv (continuous, by datetime)
+and kelly_trades_wide.csv (discrete, by trade_index); no plots. S3.backtest picks a column with
+kelly_dir=results/s3/kelly_batch, kelly_field="ma_crossover_w100_f_smooth".
+
+This script is defensive: it first tries to use `results/s1/<strategy>/roundtrips.csv` or `trades.csv`
+(per-trade returns, discrete Kelly; the engines' native buy/sell logs are paired into round trips by
+S1.roundtrips). If not available or not parseable, it falls back to `results/s1/<strategy>/equity.csv`
 and computes continuous (returns-based) Kelly.
 """
 from __future__ import annotations
@@ -20,9 +28,17 @@ import sys
 
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+
+# make sure repository root is on sys.path so `python3 scripts/kelly_estimate.py` can import S1
+ROOT = str(Path(__file__).resolve().parents[1])
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from S1.roundtrips import is_trade_log, round_trips
+
+KELLY_VARIANTS = ("f_raw", "f_adj", "f_smooth")
+WIDE_RETURNS_CSV = "kelly_returns_wide.csv"
+WIDE_TRADES_CSV = "kelly_trades_wide.csv"
 
 
 def read_trades_returns(trades_path: Path) -> pd.Series | None:
@@ -40,6 +56,11 @@ def read_trades_returns(trades_path: Path) -> pd.Series | None:
             # if values look like percent (e.g., 1.5 for 1.5%) try to detect; but we won't convert automatically
             if len(s) > 0:
                 return s.reset_index(drop=True)
+    # Native engine log (alternating buy/sell rows with price/qty/cash): pair into round trips
+    if is_trade_log(df.columns):
+        s = round_trips(df)["return"].dropna()
+        if len(s) > 0:
+            return s.reset_index(drop=True)
     # Try computing from entry/exit prices
     if {"entry_price", "exit_price"}.issubset(set(df.columns)):
         ep = pd.to_numeric(df["entry_price"], errors="coerce")
@@ -76,30 +97,43 @@ def read_equity_returns(equity_path: Path) -> pd.Series:
     return r
 
 
+# fewest trades in a window for a discrete Kelly estimate
+MIN_TRADES = 5
+
+
 def rolling_discrete_kelly(trade_returns: pd.Series, window: int) -> pd.Series:
     # trade_returns: sequence of per-trade return ratios (e.g., 0.02 = +2%)
     # Compute rolling p, g, l and then f* = p - (1-p)/b where b = g/l
+    # All windows at once: win/loss counts and gain/loss sums are differences of cumulative sums.
+    # NaN when fewer than MIN_TRADES non-NaN returns, no wins, or no losses (a zero return counts as a
+    # loss; windows whose losses are all zero have l = 0 and are NaN as well). p is taken over the whole
+    # window, NaN entries included, as the original per-window computation did.
     r = trade_returns.reset_index(drop=True)
+    if window < MIN_TRADES:
+        raise ValueError(f"window must be >= {MIN_TRADES}, got {window}")
+    x = r.to_numpy(dtype=float)
+    n = len(x)
+    hi = np.arange(1, n + 1)
+    lo = np.maximum(hi - window, 0)
 
-    def calc(sub: pd.Series):
-        if len(sub) < 5:
-            return np.nan
-        wins = sub[sub > 0]
-        losses = sub[sub <= 0]
-        p = len(wins) / len(sub)
-        if len(wins) == 0 or len(losses) == 0:
-            return np.nan
-        g = wins.mean()
-        l = (-losses).mean()
-        if l <= 0 or g <= 0:
-            return np.nan
-        b = g / l if l != 0 else np.inf
-        f = p - (1 - p) / b
-        return f
-
-    out = r.rolling(window=window, min_periods=5).apply(lambda x: calc(pd.Series(x)), raw=False)
-    out.index = r.index
-    return out
+    def window_sum(values):
+        c = np.concatenate([[0], np.cumsum(values)])
+        return c[hi] - c[lo]
+
+    win = x > 0
+    loss = x <= 0
+    n_valid = window_sum(~np.isnan(x))
+    n_win = window_sum(win)
+    n_loss = window_sum(loss)
+    n_neg = window_sum(x < 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = n_win / (hi - lo)
+        g = window_sum(np.where(win, x, 0.0)) / n_win
+        l = window_sum(np.where(loss, -x, 0.0)) / n_loss
+        f = p - (1 - p) / (g / l)
+    undefined = (n_valid < MIN_TRADES) | (n_win == 0) | (n_neg == 0) | ~(g > 0) | ~(l > 0)
+    f[undefined] = np.nan
+    return pd.Series(f, index=r.index, name=r.name)
 
 
 def rolling_continuous_kelly(returns: pd.Series, window: int) -> pd.Series:
@@ -116,10 +150,94 @@ def smooth_series(s: pd.Series, alpha: float) -> pd.Series:
     return s.ewm(alpha=alpha, adjust=False).mean()
 
 
+def load_strategy_returns(results_s1: Path, method: str = "auto"):
+    """Inputs of one strategy, read once: ("discrete", per-trade returns), ("continuous", equity returns
+    indexed by datetime) or (None, None) when neither is available."""
+    if method in ("auto", "discrete"):
+        trade_returns = read_trades_returns(results_s1 / "roundtrips.csv")
+        if trade_returns is None:
+            trade_returns = read_trades_returns(results_s1 / "trades.csv")
+        if trade_returns is not None:
+            return "discrete", trade_returns
+    equity_path = results_s1 / "equity.csv"
+    if not equity_path.exists():
+        return None, None
+    return "continuous", read_equity_returns(equity_path)
+
+
+def kelly_wide(kind: str, returns: pd.Series, windows, kelly_frac: float, alpha: float,
+               prefix: str = "") -> pd.DataFrame:
+    """f_raw / f_adj / f_smooth for every window as one wide frame with <prefix>w<window>_<variant> columns.
+
+    Index: trade_index (discrete) or the returns' datetimes (continuous), as in the single-run CSVs.
+    """
+    r = returns if kind == "discrete" else returns.dropna()
+    values = np.empty((len(r), len(windows) * len(KELLY_VARIANTS)))
+    columns = []
+    for j, window in enumerate(windows):
+        if kind == "discrete":
+            f_raw = rolling_discrete_kelly(r, window=window)
+        else:
+            f_raw = rolling_continuous_kelly(r, window=window)
+        f_adj = kelly_frac * f_raw
+        f_s = smooth_series(f_adj, alpha)
+        k = j * len(KELLY_VARIANTS)
+        values[:, k], values[:, k + 1], values[:, k + 2] = f_raw.to_numpy(), f_adj.to_numpy(), f_s.to_numpy()
+        columns.extend(f"{prefix}w{window}_{v}" for v in KELLY_VARIANTS)
+    if kind == "discrete":
+        index = pd.RangeIndex(len(r), name="trade_index")
+    else:
+        index = pd.DatetimeIndex(r.index, name="datetime")
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def _join_padded(frames) -> pd.DataFrame:
+    """Side-by-side join on the union of the indexes. Each frame is forward-filled onto rows it does not
+    have, so an as-of (datetime) or last-available (trade_index) lookup of any column returns the same
+    value as on that frame alone."""
+    index = frames[0].index
+    for frame in frames[1:]:
+        index = index.union(frame.index)
+    index.name = frames[0].index.name
+    return pd.concat([frame.reindex(index, method="ffill") for frame in frames], axis=1)
+
+
+def run_batch(strategies, windows, kelly_frac: float, alpha: float, method: str, out_dir: Path,
+              results_s1: Path | None = None) -> dict:
+    """Batch mode: every strategy x window in one process; returns {kind: written CSV path}.
+
+    Inputs are read from results_s1/<strategy>/ (default results/s1).
+    """
+    if results_s1 is None:
+        results_s1 = Path(__file__).resolve().parents[1] / "results" / "s1"
+    wide = {"discrete": [], "continuous": []}
+    for strategy in strategies:
+        kind, returns = load_strategy_returns(Path(results_s1) / strategy, method)
+        if kind is None:
+            print(f"Skipping {strategy}: no usable trades.csv and no equity.csv", file=sys.stderr)
+            continue
+        print(f"{strategy}: {kind} Kelly for windows {list(windows)}")
+        wide[kind].append(kelly_wide(kind, returns, windows, kelly_frac, alpha, prefix=f"{strategy}_"))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = {}
+    for kind, name in (("continuous", WIDE_RETURNS_CSV), ("discrete", WIDE_TRADES_CSV)):
+        if wide[kind]:
+            path = out_dir / name
+            table = _join_padded(wide[kind])
+            table.to_csv(path)
+            print(f"Wrote {table.shape[1]} Kelly columns: {path}")
+            written[kind] = path
+    return written
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--strategy", required=True)
-    parser.add_argument("--window", type=int, default=100, help="rolling window (trades or days)")
+    parser.add_argument("--strategy", required=True, nargs="+", help="one strategy, or several for batch mode")
+    parser.add_argument("--window", type=int, default=[100], nargs="+",
+                        help="rolling window (trades or days); several windows imply batch mode")
+    parser.add_argument("--batch", action="store_true",
+                        help="write the wide batch CSVs even for a single strategy and window")
     parser.add_argument("--kelly_frac", type=float, default=0.25, help="fractional Kelly to apply")
     parser.add_argument("--smoothing_alpha", type=float, default=0.0, help="EWMA alpha for smoothing final f")
     parser.add_argument("--out_dir", type=str, default=None)
@@ -127,26 +245,28 @@ def main():
     args = parser.parse_args()
 
     repo_root = Path(__file__).resolve().parents[1]
-    results_s1 = repo_root / "results" / "s1" / args.strategy
-    trades_path = results_s1 / "trades.csv"
-    equity_path = results_s1 / "equity.csv"
+    if args.batch or len(args.strategy) > 1 or len(args.window) > 1:
+        out_dir = Path(args.out_dir) if args.out_dir else (repo_root / "results" / "s3" / "kelly_batch")
+        if not run_batch(args.strategy, args.window, args.kelly_frac, args.smoothing_alpha, args.method, out_dir):
+            sys.exit(2)
+        return
 
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    args.strategy, args.window = args.strategy[0], args.window[0]
+    results_s1 = repo_root / "results" / "s1" / args.strategy
     out_base = Path(args.out_dir) if args.out_dir else (repo_root / "results" / "s3" / f"{args.strategy}_kelly")
     out_base.mkdir(parents=True, exist_ok=True)
 
-    use_discrete = False
-    trade_returns = None
-    if args.method in ("auto", "discrete"):
-        trade_returns = read_trades_returns(trades_path)
-        if trade_returns is not None:
-            use_discrete = True
-
-    returns = None
-    if not use_discrete:
-        if not equity_path.exists():
-            print(f"Error: no trades.csv usable and no equity.csv found for strategy {args.strategy}", file=sys.stderr)
-            sys.exit(2)
-        returns = read_equity_returns(equity_path)
+    kind, series = load_strategy_returns(results_s1, args.method)
+    if kind is None:
+        print(f"Error: no trades.csv usable and no equity.csv found for strategy {args.strategy}", file=sys.stderr)
+        sys.exit(2)
+    use_discrete = kind == "discrete"
+    trade_returns = series if use_discrete else None
+    returns = None if use_discrete else series
 
     if use_discrete:
         print(f"Using discrete/trade-based Kelly for strategy {args.strategy}")
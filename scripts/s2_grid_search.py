@@ -4,17 +4,30 @@
 Produces:
 - results/s2/experiments_grid.csv
 - results/s2/pareto_front.png
+- one sweep in the SQLite experiment store (results/experiments.sqlite, S1.experiments; --db)
 
 Usage: python3 scripts/s2_grid_search.py
+       python3 scripts/s2_grid_search.py --jobs 8  # distribute grid cells over 8 worker processes
+       python3 scripts/s2_grid_search.py --batch   # all cells in one vectorized pass, no per-cell folders
+       python3 scripts/s2_grid_search.py --artifacts metrics  # per-cell metrics.json only (none: no per-cell files)
+       python3 scripts/s2_grid_search.py --plot-jobs 4  # render per-cell equity.png on 4 processes after the grid
+
+With --artifacts full (default) the cells are backtested without plots first; the per-cell
+equity.png files are then rendered from the saved equity.csv by S1.plotting.render_run_dirs.
+Cell results are kept in a content-addressed cache (S1.result_cache, --cache-dir): a re-run with
+the same data, code and parameters restores them instead of recomputing (--no-cache to disable).
+All cells of a run are inserted into the experiment store in one transaction; query across sweeps with
+`python -m S1.experiments best --metric sharpe --last 50`.
 """
 import os
 import csv
+import argparse
 import datetime
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict
 
 import pandas as pd
-import matplotlib.pyplot as plt
 
 # strategies to test (module path under S2.strategies)
 STRATEGIES = [
@@ -27,13 +40,18 @@ ROOT = os.path.dirname(os.path.dirname(__file__))
 RESULTS_S2 = os.path.join(ROOT, "results", "s2")
 OUT_CSV = os.path.join(RESULTS_S2, "experiments_grid.csv")
 OUT_PARETO = os.path.join(RESULTS_S2, "pareto_front.png")
-os.makedirs(RESULTS_S2, exist_ok=True)
 
 # make sure repository root is on sys.path so imports like S2.strategies.* work
 import sys
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
+from S1.data import load_dataset, load_memmap, frame_from_columns
+from S1.experiments import DEFAULT_DB, ExperimentStore
+from S1.pareto import pareto_mask
+from S1.plotting import render_run_dirs
+from S1.result_cache import DEFAULT_CACHE_DIR, ResultCache, cached_backtest
+
 # grid
 SL_GRID = [0.03, 0.05, 0.08]
 TP_GRID = [0.10, 0.20, 0.30]
@@ -49,54 +67,142 @@ def _get_git_short():
         return ""
 
 
-def run():
-    # load market data once
-    df = pd.read_csv(DATA_PATH, parse_dates=["datetime"]) 
+def _metrics_row(tag, date, strat, sl, tp, metrics, notes):
+    return {
+        "tag": tag,
+        "date": date,
+        "strategy": strat,
+        "sl_pct": sl,
+        "tp_pct": tp,
+        "total_return": metrics.get("total_return", None),
+        "annualized_return": metrics.get("annualized_return", None),
+        "max_drawdown": metrics.get("max_drawdown", None),
+        "volatility": metrics.get("volatility", None),
+        "sharpe": metrics.get("sharpe", None),
+        "notes": notes,
+    }
 
-    rows: List[Dict] = []
-    tag = _get_git_short()
-    date = datetime.date.today().isoformat()
 
-    for strat in STRATEGIES:
-        mod_path = f"S2.strategies.{strat}"
+def _cell_dir(strat, sl, tp):
+    return os.path.join(RESULTS_S2, f"{strat}_sl{int(sl*100)}_tp{int(tp*100)}")
+
+
+def _run_cell(df, tag, date, strat, sl, tp, artifacts="full", cache=None) -> Dict:
+    mod_path = f"S2.strategies.{strat}"
+    out_dir = _cell_dir(strat, sl, tp)
+    print(f"Running {strat} sl={sl} tp={tp} -> {out_dir if artifacts != 'none' else '-'}")
+    try:
         mod = __import__(mod_path, fromlist=["backtest"])
         backtest = getattr(mod, "backtest")
+        res = cached_backtest(cache, backtest, df, out_dir=out_dir, sl_pct=sl, tp_pct=tp, artifacts=artifacts)
+        return _metrics_row(tag, date, strat, sl, tp, res.get("metrics", {}), "grid-search")
+    except Exception as e:
+        return _metrics_row(tag, date, strat, sl, tp, {}, f"error: {e}")
+
+
+def _grid_cells():
+    return [(strat, sl, tp) for strat in STRATEGIES for sl in SL_GRID for tp in TP_GRID]
+
+
+def _run_serial(df, tag, date, artifacts="full", cache=None) -> List[Dict]:
+    return [_run_cell(df, tag, date, strat, sl, tp, artifacts, cache) for strat, sl, tp in _grid_cells()]
+
+
+# per-process market data, loaded once by the pool initializer
+_WORKER_DF = None
+
+
+def _init_worker(data_path):
+    """Prefer memory-mapping the .cols sibling so all workers share one page-cached copy of the columns."""
+    global _WORKER_DF
+    cols_path = os.path.splitext(data_path)[0] + ".cols"
+    if os.path.isdir(cols_path) and (not os.path.exists(data_path)
+                                     or os.path.getmtime(cols_path) >= os.path.getmtime(data_path)):
+        try:
+            _WORKER_DF = frame_from_columns(load_memmap(cols_path))
+            return
+        except ValueError:
+            # pending append segments: fall back to a private copy
+            pass
+    _WORKER_DF = load_dataset(data_path)
+
+
+def _run_cell_worker(tag, date, strat, sl, tp, artifacts="full", cache=None) -> Dict:
+    return _run_cell(_WORKER_DF, tag, date, strat, sl, tp, artifacts, cache)
 
+
+def _run_parallel(tag, date, jobs: int, artifacts="full", cache=None) -> List[Dict]:
+    """Run grid cells on a process pool; rows come back in grid order regardless of completion order."""
+    cells = _grid_cells()
+    rows: List[Dict] = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(DATA_PATH,)) as pool:
+        futures = [pool.submit(_run_cell_worker, tag, date, strat, sl, tp, artifacts, cache) for strat, sl, tp in cells]
+        for (strat, sl, tp), fut in zip(cells, futures):
+            try:
+                rows.append(fut.result())
+            except Exception as e:
+                # worker died (e.g. killed / BrokenProcessPool): keep the cell in the table
+                rows.append(_metrics_row(tag, date, strat, sl, tp, {}, f"error: {e!r}"))
+    return rows
+
+
+def _run_batch(df, tag, date) -> List[Dict]:
+    """Evaluate the whole strategy x SL x TP grid with one run_backtest_batch call."""
+    from S2.backtest import run_backtest_batch
+
+    signals = []
+    params = []
+    for strat in STRATEGIES:
+        mod = __import__(f"S2.strategies.{strat}", fromlist=["generate_signals"])
+        sig = mod.generate_signals(df)
+        sig = sig.reindex(pd.DatetimeIndex(df["datetime"])).fillna(0).astype(int)
         for sl in SL_GRID:
             for tp in TP_GRID:
-                out_dir = os.path.join(RESULTS_S2, f"{strat}_sl{int(sl*100)}_tp{int(tp*100)}")
-                print(f"Running {strat} sl={sl} tp={tp} -> {out_dir}")
-                try:
-                    res = backtest(df, out_dir=out_dir, sl_pct=sl, tp_pct=tp)
-                    metrics = res.get("metrics", {})
-                    row = {
-                        "tag": tag,
-                        "date": date,
-                        "strategy": strat,
-                        "sl_pct": sl,
-                        "tp_pct": tp,
-                        "total_return": metrics.get("total_return", None),
-                        "annualized_return": metrics.get("annualized_return", None),
-                        "max_drawdown": metrics.get("max_drawdown", None),
-                        "volatility": metrics.get("volatility", None),
-                        "sharpe": metrics.get("sharpe", None),
-                        "notes": "grid-search",
-                    }
-                except Exception as e:
-                    row = {
-                        "tag": tag,
-                        "date": date,
-                        "strategy": strat,
-                        "sl_pct": sl,
-                        "tp_pct": tp,
-                        "total_return": None,
-                        "annualized_return": None,
-                        "max_drawdown": None,
-                        "volatility": None,
-                        "sharpe": None,
-                        "notes": f"error: {e}",
-                    }
-                rows.append(row)
+                signals.append(sig)
+                params.append({"strategy": strat, "sl_pct": sl, "tp_pct": tp})
+    print(f"Running {len(params)} grid cells in one batch")
+    table = run_backtest_batch(df, signals, params)
+    return [_metrics_row(tag, date, r["strategy"], r["sl_pct"], r["tp_pct"], r, "grid-search")
+            for r in table.to_dict("records")]
+
+
+def _render_cell_plots(rows: List[Dict], plot_jobs) -> None:
+    """Deferred plot stage: equity.png for every successful cell, printed as each one finishes."""
+    run_dirs = [_cell_dir(r["strategy"], r["sl_pct"], r["tp_pct"]) for r in rows if r["notes"] == "grid-search"]
+    print(f"Rendering plots for {len(run_dirs)} cells")
+    try:
+        for run_dir, paths in render_run_dirs(run_dirs, jobs=plot_jobs, return_exceptions=True):
+            if isinstance(paths, Exception):
+                # one bad cell must not stop the remaining plots
+                print(f"Plot rendering failed for {run_dir}: {paths!r}")
+            else:
+                print(f"Wrote {', '.join(paths)}")
+    except Exception as e:
+        # the process pool itself could not be used
+        print(f"Plot rendering failed: {e!r}")
+
+
+def _record_sweep(db_path, rows, tag, date, config) -> None:
+    with ExperimentStore(db_path) as store:
+        sweep_id = store.record_sweep("s2_grid_search", rows, param_keys=("sl_pct", "tp_pct"),
+                                      tag=tag, date=date, config=config)
+    print(f"Recorded sweep {sweep_id} ({len(rows)} cells) in {db_path}")
+
+
+def run(batch: bool = False, jobs: int = 1, artifacts: str = "full", plot_jobs=None, cache: ResultCache = None,
+        db: str = os.path.join(ROOT, DEFAULT_DB)):
+    os.makedirs(RESULTS_S2, exist_ok=True)
+    tag = _get_git_short()
+    date = datetime.date.today().isoformat()
+    # plots are rendered in a separate stage once all backtests are done
+    cell_artifacts = "data" if artifacts == "full" else artifacts
+    if jobs > 1 and not batch:
+        # each worker loads the data once in its initializer
+        rows = _run_parallel(tag, date, jobs, cell_artifacts, cache)
+    else:
+        # load market data once
+        df = load_dataset(DATA_PATH)
+        rows = _run_batch(df, tag, date) if batch else _run_serial(df, tag, date, cell_artifacts, cache)
 
     # write CSV
     keys = ["tag", "date", "strategy", "sl_pct", "tp_pct", "total_return", "annualized_return", "max_drawdown", "volatility", "sharpe", "notes"]
@@ -106,6 +212,14 @@ def run():
         for r in rows:
             writer.writerow(r)
 
+    if db:
+        config = {"batch": batch, "jobs": jobs, "artifacts": artifacts, "sl_grid": SL_GRID, "tp_grid": TP_GRID,
+                  "strategies": STRATEGIES, "data": os.path.relpath(DATA_PATH, ROOT)}
+        _record_sweep(db, rows, tag, date, config)
+
+    if artifacts == "full" and not batch:
+        _render_cell_plots(rows, plot_jobs)
+
     # compute pareto across all strategies combined
     dfres = pd.DataFrame(rows).dropna(subset=["annualized_return", "max_drawdown"]) 
     if dfres.empty:
@@ -118,22 +232,7 @@ def run():
 
     # Pareto: higher annualized_return better, higher max_drawdown (less negative) better
     pts = dfres[["strategy", "sl_pct", "tp_pct", "annualized_return", "max_drawdown"]].copy()
-
-    def is_dominated(i):
-        r_i = pts.iloc[i]
-        for j in range(len(pts)):
-            if i == j:
-                continue
-            r_j = pts.iloc[j]
-            # j dominates i if j.return >= i.return and j.drawdown >= i.drawdown and at least one strict
-            if (r_j["annualized_return"] >= r_i["annualized_return"] and
-                r_j["max_drawdown"] >= r_i["max_drawdown"] and
-                (r_j["annualized_return"] > r_i["annualized_return"] or r_j["max_drawdown"] > r_i["max_drawdown"])):
-                return True
-        return False
-
-    dominated = [is_dominated(i) for i in range(len(pts))]
-    pts["dominated"] = dominated
+    pts["dominated"] = ~pareto_mask(pts[["annualized_return", "max_drawdown"]].to_numpy(dtype=float))
     pareto = pts[~pts["dominated"]].copy()
 
     # save pareto table
@@ -141,6 +240,7 @@ def run():
     pareto.to_csv(pareto_out, index=False)
 
     # plot
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(8, 5))
     # scatter all
     for strat in pts["strategy"].unique():
@@ -164,4 +264,17 @@ def run():
 
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", action="store_true", help="evaluate all cells in one vectorized pass (metrics only)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes for the per-cell runs")
+    parser.add_argument("--artifacts", choices=["none", "metrics", "full"], default="full",
+                        help="per-cell outputs: none, metrics.json only, or full csv/json/png (default)")
+    parser.add_argument("--plot-jobs", type=int, default=None,
+                        help="processes for the deferred per-cell plot stage (default: all CPUs; 1 = in-process)")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every cell (skip the result cache)")
+    parser.add_argument("--cache-dir", default=os.path.join(ROOT, DEFAULT_CACHE_DIR))
+    parser.add_argument("--db", default=os.path.join(ROOT, DEFAULT_DB),
+                        help="SQLite experiment store the sweep is recorded in (empty string to skip)")
+    args = parser.parse_args()
+    run(batch=args.batch, jobs=args.jobs, artifacts=args.artifacts, plot_jobs=args.plot_jobs,
+        cache=None if args.no_cache else ResultCache(args.cache_dir), db=args.db)
@@ -0,0 +1,36 @@
+"""Synthetic bars and position signals shared by the engine tests."""
+import numpy as np
+import pandas as pd
+
+
+def make_df(n, seed=0, drift=0.0, vol=0.03, open_noise=0.005, wick=0.02, random_wicks=True, gap_open=True):
+    """Daily UTC OHLCV bars of a log-normal random walk.
+
+    Opens sit on the previous close (the bar's own close when gap_open is False), jittered by
+    open_noise; highs/lows reach `wick` beyond the body, drawn per bar as |N(0, wick)| when
+    random_wicks is set and fixed otherwise.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(drift, vol, n)))
+    opens = np.concatenate([[100.0], close[:-1]]) if gap_open else close
+    if open_noise:
+        opens = opens * (1 + rng.normal(0, open_noise, n))
+    if random_wicks:
+        up, down = np.abs(rng.normal(0, wick, n)), np.abs(rng.normal(0, wick, n))
+    else:
+        up = down = wick
+    return pd.DataFrame({
+        "datetime": pd.date_range("2020-01-01", periods=n, freq="D", tz="UTC"),
+        "open": opens,
+        "high": np.maximum(opens, close) * (1 + up),
+        "low": np.minimum(opens, close) * (1 - down),
+        "close": close,
+        "volume": 1.0,
+    })
+
+
+def make_signals(df, seed=1, hold=8):
+    """0/1 positions that flip with probability 1/hold per bar, indexed by the bars' datetimes."""
+    rng = np.random.default_rng(seed)
+    flips = rng.random(len(df)) < 1 / hold
+    return pd.Series(np.cumsum(flips) % 2, index=pd.DatetimeIndex(df["datetime"]))
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+import synthetic
+from S1.backtest import run_backtest
+
+make_df = partial(synthetic.make_df, vol=0.02, wick=0.01, random_wicks=False, gap_open=False)
+
+
+def random_signals(df, seed=1):
+    rng = np.random.default_rng(seed)
+    # hold each state for a random number of bars so there are many transitions
+    vals = rng.integers(0, 2, len(df))
+    vals = pd.Series(vals).rolling(3, min_periods=1).max().astype(int).values
+    return pd.Series(vals, index=df["datetime"])
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_array_engine_matches_loop(tmp_path):
+    df = make_df(1500)
+    sig = random_signals(df)
+    loop_dir = tmp_path / "loop"
+    arr_dir = tmp_path / "array"
+    out_loop = run_backtest(df, sig, out_dir=str(loop_dir), engine="loop")
+    out_arr = run_backtest(df, sig, out_dir=str(arr_dir), engine="array")
+
+    assert out_loop["trades"] == out_arr["trades"]
+    assert len(out_arr["trades"]) > 10
+    for name in ["equity.csv", "trades.csv", "metrics.json"]:
+        assert _read(loop_dir / name) == _read(arr_dir / name), name
+
+
+def test_array_engine_window_and_edges(tmp_path):
+    df = make_df(300, seed=3)
+    # always long from the first bar, and a signal flip on the very last bar
+    sig = pd.Series(1, index=df["datetime"])
+    sig.iloc[-1] = 0
+    kw = dict(start="2020-02-01", end="2020-09-01")
+    out_loop = run_backtest(df, sig, out_dir=str(tmp_path / "loop"), engine="loop", **kw)
+    out_arr = run_backtest(df, sig, out_dir=str(tmp_path / "array"), engine="array", **kw)
+    assert out_loop["trades"] == out_arr["trades"]
+    pd.testing.assert_frame_equal(out_loop["equity"], out_arr["equity"])
+    assert out_loop["metrics"] == out_arr["metrics"]
+
+
+def test_artifact_levels(tmp_path):
+    df = make_df(200)
+    sig = random_signals(df)
+    full = run_backtest(df, sig, out_dir=str(tmp_path / "full"), engine="array")
+    metrics_only = run_backtest(df, sig, out_dir=str(tmp_path / "metrics"), engine="array", artifacts="metrics")
+    data = run_backtest(df, sig, out_dir=str(tmp_path / "data"), engine="array", artifacts="data")
+    none = run_backtest(df, sig, out_dir=None, engine="array", artifacts="none")
+
+    assert sorted(p.name for p in (tmp_path / "full").iterdir()) == [
+        "drawdown.png", "equity.csv", "equity.png", "metrics.json", "roundtrips.csv", "trades.csv"]
+    assert [p.name for p in (tmp_path / "metrics").iterdir()] == ["metrics.json"]
+    assert sorted(p.name for p in (tmp_path / "data").iterdir()) == [
+        "equity.csv", "metrics.json", "roundtrips.csv", "trades.csv"]
+    assert _read(tmp_path / "full" / "metrics.json") == _read(tmp_path / "metrics" / "metrics.json")
+    assert full["trades"] == metrics_only["trades"] == data["trades"] == none["trades"]
+    assert full["metrics"] == none["metrics"]
+    with pytest.raises(ValueError):
+        run_backtest(df, sig, out_dir=None, artifacts="plots")
+
+
+def test_backtest_modules_do_not_import_matplotlib():
+    code = ("import sys, S1.backtest, S2.backtest, S3.backtest, S2.strategies.ma_crossover; "
+            "sys.exit('matplotlib' in sys.modules)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_array_engine_matches_loop(Path(d))
+        test_array_engine_window_and_edges(Path(d))
+        test_artifact_levels(Path(d))
+        test_backtest_modules_do_not_import_matplotlib()
+    print("ok")
@@ -0,0 +1,195 @@
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import S1.data as data
+from S1.data import load_cached, write_cache, convert_cache, load_dataset, append_cache, compact_cache
+
+
+def make_df(n=50):
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        "datetime": pd.date_range("2021-01-01", periods=n, freq="D", tz="UTC"),
+        "open": close + 0.5,
+        "high": close + 1.0,
+        "low": close - 1.0,
+        "close": close,
+        "volume": rng.uniform(1, 10, n),
+    })
+
+
+@pytest.mark.parametrize("ext", [".csv", ".cols", ".parquet", ".feather"])
+def test_cache_roundtrip(tmp_path, ext):
+    if ext in (".parquet", ".feather"):
+        pytest.importorskip("pyarrow")
+    df = make_df()
+    path = str(tmp_path / f"btc_daily{ext}")
+    write_cache(df, path)
+    out = load_cached(path)
+    pd.testing.assert_frame_equal(out, df, check_dtype=False, check_index_type=False)
+    assert str(out["datetime"].dt.tz) == "UTC"
+
+
+def test_unknown_extension_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_cache(make_df(), str(tmp_path / "btc_daily.txt"))
+
+
+def test_load_dataset_prefers_fresh_binary_sibling(tmp_path):
+    df = make_df()
+    csv_path = str(tmp_path / "btc_daily.csv")
+    write_cache(df, csv_path)
+    convert_cache(csv_path, str(tmp_path / "btc_daily.cols"))
+    out = load_dataset(csv_path)
+    pd.testing.assert_frame_equal(out, load_cached(csv_path), check_dtype=False)
+
+    # a CSV newer than the binary copy wins (stale sibling is ignored)
+    newer = df.iloc[:10]
+    time.sleep(0.01)
+    write_cache(newer, csv_path)
+    os.utime(csv_path, (time.time() + 5, time.time() + 5))
+    assert len(load_dataset(csv_path)) == 10
+
+    with pytest.raises(FileNotFoundError):
+        load_dataset(str(tmp_path / "missing.csv"))
+
+
+@pytest.mark.parametrize("ext", [".csv", ".cols"])
+def test_append_cache_only_writes_new_rows(tmp_path, ext):
+    df = make_df(60)
+    path = str(tmp_path / f"btc_daily{ext}")
+    write_cache(df.iloc[:40], path)
+    base_mtime = os.path.getmtime(path)
+    assert append_cache(df.iloc[40:50], path) == 10
+    assert append_cache(df.iloc[50:], path) == 10
+    pd.testing.assert_frame_equal(load_cached(path), df, check_dtype=False)
+    if ext == ".cols":
+        # the main file is untouched until compaction
+        assert os.path.getmtime(path) == base_mtime
+        assert len(os.listdir(path + ".segments")) == 2
+        compact_cache(path)
+        assert not os.path.exists(path + ".segments")
+        pd.testing.assert_frame_equal(load_cached(path), df, check_dtype=False)
+
+    with pytest.raises(ValueError):
+        append_cache(df.iloc[-1:], path)
+
+
+def test_append_cache_auto_compacts(tmp_path):
+    df = make_df(30)
+    path = str(tmp_path / "btc_daily.cols")
+    write_cache(df.iloc[:10], path)
+    for i in range(10, 30):
+        append_cache(df.iloc[i:i + 1], path, compact_every=8)
+    assert len(os.listdir(path + ".segments")) == 20 % 8
+    pd.testing.assert_frame_equal(load_cached(path), df, check_dtype=False)
+
+
+def test_crashed_write_leftovers_are_not_segments(tmp_path):
+    df = make_df(30)
+    path = str(tmp_path / "btc_daily.cols")
+    write_cache(df.iloc[:10], path)
+    append_cache(df.iloc[10:20], path)
+    # a segment write that died before its final rename, and one that died before removing .old
+    os.makedirs(path + ".segments/seg_000002.cols.tmp")
+    os.makedirs(path + ".segments/seg_000001.cols.old")
+    pd.testing.assert_frame_equal(load_cached(path), df.iloc[:20], check_dtype=False)
+    append_cache(df.iloc[20:], path)
+    assert os.path.isdir(path + ".segments/seg_000002.cols/")
+    pd.testing.assert_frame_equal(load_cached(path), df, check_dtype=False)
+
+
+@pytest.mark.parametrize("crash_at", ["write", "cleanup"])
+def test_compaction_crash_keeps_rows_once(tmp_path, monkeypatch, crash_at):
+    df = make_df(40)
+    path = str(tmp_path / "btc_daily.cols")
+    write_cache(df.iloc[:10], path)
+    for lo in (10, 20, 30):
+        append_cache(df.iloc[lo:lo + 10], path)
+
+    rmtree = shutil.rmtree
+
+    def crash(target, *args, **kwargs):
+        if crash_at == "write" or target.endswith(".segments"):
+            raise KeyboardInterrupt
+        return rmtree(target, *args, **kwargs)
+    with monkeypatch.context() as m:
+        # before the main file is replaced, or after it is replaced but before the segments are removed
+        if crash_at == "write":
+            m.setattr(data, "write_cache", crash)
+        else:
+            m.setattr(shutil, "rmtree", crash)
+        with pytest.raises(KeyboardInterrupt):
+            compact_cache(path)
+    assert len(data._segment_paths(path)) == 3
+    pd.testing.assert_frame_equal(load_cached(path), df, check_dtype=False)
+    chunks = pd.concat(data.iter_cache_chunks(path, chunksize=7), ignore_index=True)
+    pd.testing.assert_frame_equal(chunks, df, check_dtype=False)
+    assert data._cache_tail(path) == df["datetime"].iloc[-1]
+
+    more = make_df(45).iloc[40:]
+    append_cache(more, path)
+    full = pd.concat([df, more], ignore_index=True)
+    pd.testing.assert_frame_equal(load_cached(path), full, check_dtype=False)
+    compact_cache(path)
+    assert not os.path.exists(path + ".segments")
+    pd.testing.assert_frame_equal(load_cached(path), full, check_dtype=False)
+
+
+def test_download_and_cache_appends(tmp_path, monkeypatch):
+    today = pd.Timestamp.now(tz="UTC").normalize()
+    full = make_df(40)
+    full["datetime"] = pd.date_range(end=today, periods=40, freq="D", tz="UTC")
+
+    def fake_fetch(limit=2000, to_ts=None):
+        end = pd.Timestamp(to_ts, unit="s", tz="UTC") if to_ts else today
+        return full[(full["datetime"] <= end) & (full["datetime"] >= end - pd.Timedelta(days=limit))].reset_index(drop=True)
+
+    monkeypatch.setattr(data, "_fetch_cc", fake_fetch)
+    path = str(tmp_path / "btc_daily.cols")
+    write_cache(full.iloc[:35], path)
+    out = data.download_and_cache(save_path=path)
+    pd.testing.assert_frame_equal(out.reset_index(drop=True), full, check_dtype=False)
+    assert os.path.isdir(path + ".segments")
+    pd.testing.assert_frame_equal(load_cached(path), full, check_dtype=False)
+
+    # refresh only: the cached history is never loaded
+    path = str(tmp_path / "refresh.cols")
+    write_cache(full.iloc[:37], path)
+    monkeypatch.setattr(data, "load_cached", lambda *a, **k: pytest.fail("history loaded"))
+    assert data.download_and_cache(save_path=path, return_data=False) is None
+    pd.testing.assert_frame_equal(load_cached(path), full, check_dtype=False)
+
+
+def test_memmap_input_matches_dataframe(tmp_path):
+    from S1.backtest import run_backtest
+    from S1.data import load_memmap
+    from S2.backtest import run_backtest_sl_tp as run_s2
+    from S3.backtest import run_backtest_sl_tp as run_s3
+
+    df = make_df(300)
+    path = str(tmp_path / "btc_daily.cols")
+    write_cache(df, path)
+    cols = load_memmap(path)
+    assert isinstance(cols["close"], np.memmap)
+
+    sig = pd.Series((np.arange(300) // 7) % 2, index=pd.DatetimeIndex(df["datetime"]))
+    a = run_backtest(df, sig, out_dir=str(tmp_path / "s1a"), engine="array")
+    b = run_backtest(cols, sig, out_dir=str(tmp_path / "s1b"), engine="array")
+    pd.testing.assert_frame_equal(a["equity"], b["equity"], check_freq=False, check_index_type=False)
+
+    naive = sig.copy()
+    naive.index = naive.index.tz_localize(None)
+    for run, kw in [(run_s2, {"engine": "vectorized"}), (run_s3, {})]:
+        a = run(df, naive, out_dir=str(tmp_path / "a"), sl_pct=0.03, tp_pct=0.1, **kw)
+        b = run(cols, naive, out_dir=str(tmp_path / "b"), sl_pct=0.03, tp_pct=0.1, **kw)
+        assert a["trades"] == b["trades"]
+        pd.testing.assert_series_equal(a["equity"], b["equity"], check_index_type=False)
+
+    with pytest.raises(ValueError):
+        load_memmap(str(tmp_path / "btc_daily.csv"))
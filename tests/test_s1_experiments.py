@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from S1.experiments import ExperimentStore, main
+
+
+def make_rows(seed, strategies=("ma_crossover", "rsi", "macd")):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for strat in strategies:
+        for sl in (0.03, 0.05):
+            for tp in (0.1, 0.2):
+                rows.append({"tag": "abc", "date": "2026-01-01", "strategy": strat, "sl_pct": sl, "tp_pct": tp,
+                             "total_return": rng.normal(), "annualized_return": rng.normal(),
+                             "max_drawdown": -rng.random(), "volatility": rng.random(),
+                             "sharpe": rng.normal(), "notes": "grid-search"})
+    return rows
+
+
+def test_record_and_query_best_per_strategy(tmp_path):
+    db = str(tmp_path / "exp.sqlite")
+    sweeps = [make_rows(seed) for seed in range(4)]
+    with ExperimentStore(db) as store:
+        ids = [store.record_sweep("s2_grid_search", rows, param_keys=("sl_pct", "tp_pct"), tag=f"t{i}")
+               for i, rows in enumerate(sweeps)]
+        # a failed cell has no metrics and must not win
+        store.add_runs(ids[-1], [{"strategy": "rsi", "sl_pct": 0.08, "tp_pct": 0.3, "sharpe": float("nan"),
+                                  "notes": "error: boom"}], param_keys=("sl_pct", "tp_pct"))
+        assert list(store.sweeps()["id"]) == ids[::-1]
+
+        best = store.best_per_strategy("sharpe", last_sweeps=2)
+        recent = pd.DataFrame([dict(r, sweep=i) for i, rows in enumerate(sweeps) for r in rows if i >= 2])
+        expected = recent.loc[recent.groupby("strategy")["sharpe"].idxmax()]
+        assert sorted(best["strategy"]) == sorted(expected["strategy"])
+        for _, row in best.iterrows():
+            exp = expected[expected["strategy"] == row["strategy"]].iloc[0]
+            assert row["sharpe"] == exp["sharpe"]
+            assert json.loads(row["params"]) == {"sl_pct": exp["sl_pct"], "tp_pct": exp["tp_pct"]}
+            assert row["tag"] == f"t{exp['sweep']}"
+
+        # lower volatility is better; the unrestricted query covers every sweep
+        low_vol = store.best_per_strategy("volatility", last_sweeps=None)
+        everything = pd.DataFrame([r for rows in sweeps for r in rows])
+        assert np.allclose(sorted(low_vol["volatility"]), sorted(everything.groupby("strategy")["volatility"].min()))
+
+        runs = store.runs(ids[-1], strategy="rsi")
+        assert len(runs) == 5 and runs["sharpe"].isna().sum() == 1
+        assert json.loads(runs["extra"].iloc[0]) == {}
+
+        with pytest.raises(ValueError):
+            store.best_per_strategy("sharpe; DROP TABLE runs")
+
+
+def test_sweep_is_atomic_and_extra_fields_kept(tmp_path):
+    db = str(tmp_path / "exp.sqlite")
+    with ExperimentStore(db) as store:
+        with pytest.raises(Exception):
+            store.record_sweep("compare_kelly_grid", [{"frac": 0.5, "sharpe": 1.0}, object()],
+                               param_keys=("frac",), strategy="ma_crossover")
+        assert store.sweeps().empty and store.runs().empty
+
+        sweep_id = store.record_sweep("compare_kelly_grid",
+                                      [{"run_idx": 1, "frac": np.float64(0.5), "kelly_max_alloc": 0.1,
+                                        "sharpe": 1.2, "trades": np.int64(7), "final_equity": 12000.0,
+                                        "out_dir": "results/x"}],
+                                      param_keys=("frac", "kelly_max_alloc"), strategy="ma_crossover")
+        row = store.runs(sweep_id).iloc[0]
+        assert row["strategy"] == "ma_crossover" and row["out_dir"] == "results/x"
+        assert json.loads(row["extra"]) == {"run_idx": 1, "trades": 7, "final_equity": 12000.0}
+        assert store.delete_sweeps([sweep_id]) == 1
+        assert store.runs().empty
+
+
+def test_cli_best(tmp_path, capsys):
+    db = str(tmp_path / "exp.sqlite")
+    with ExperimentStore(db) as store:
+        store.record_sweep("s2_grid_search", make_rows(0), param_keys=("sl_pct", "tp_pct"))
+    main(["--db", db, "best", "--metric", "annualized_return", "--last", "0"])
+    out = capsys.readouterr().out
+    assert all(s in out for s in ("ma_crossover", "rsi", "macd"))
+    main(["--db", db, "pareto", "--max", "sharpe", "--min", "volatility"])
+    assert "sharpe" in capsys.readouterr().out
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from S1.pareto import pareto_front, pareto_mask, pareto_rank
+
+
+def brute_force(values, maximize):
+    # the O(n^2) pairwise check the grid script used to do
+    v = np.asarray(values, dtype=float) * np.where(maximize, 1.0, -1.0)
+    valid = ~np.isnan(v).any(axis=1)
+    out = np.zeros(len(v), dtype=bool)
+    for i in np.flatnonzero(valid):
+        others = v[valid]
+        dominated = ((others >= v[i]).all(axis=1) & (others > v[i]).any(axis=1)).any()
+        out[i] = not dominated
+    return out
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_matches_pairwise_check(k, seed):
+    rng = np.random.default_rng(seed)
+    # small integer grid: many ties and exact duplicates
+    values = rng.integers(0, 6, size=(700, k)).astype(float)
+    values[rng.random(700) < 0.05, 0] = np.nan
+    maximize = [True, False, True, False][:k]
+    mask = pareto_mask(values, maximize)
+    assert mask.any()
+    np.testing.assert_array_equal(mask, brute_force(values, maximize))
+
+    continuous = rng.normal(size=(700, k))
+    continuous[:, 0] = np.round(continuous[:, 0], 1)
+    np.testing.assert_array_equal(pareto_mask(continuous), brute_force(continuous, [True] * k))
+
+
+def test_infinite_values():
+    values = np.array([[5.0, -np.inf], [1.0, 2.0], [0.0, np.inf], [0.0, 1.0]])
+    np.testing.assert_array_equal(pareto_mask(values), [True, True, True, False])
+
+
+def test_rank_peels_successive_fronts():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 8, size=(300, 3)).astype(float)
+    values[::17, 1] = np.nan
+    rank = pareto_rank(values, [True, False, True])
+    assert np.isnan(rank[::17]).all()
+    remaining = ~np.isnan(values).any(axis=1)
+    level = 0
+    while remaining.any():
+        idx = np.flatnonzero(remaining)
+        front = idx[brute_force(values[idx], [True, False, True])]
+        assert (rank[front] == level).all()
+        remaining[front] = False
+        level += 1
+    assert np.nanmax(rank) == level - 1
+
+
+def test_pareto_front_on_experiment_table():
+    table = pd.DataFrame({
+        "strategy": ["a", "b", "c", "d", "e"],
+        "annualized_return": [0.10, 0.20, 0.15, None, 0.20],
+        "max_drawdown": [-0.05, -0.30, -0.10, -0.01, -0.30],
+        "volatility": [0.2, 0.5, 0.1, 0.1, 0.6],
+    })
+    front = pareto_front(table, ["annualized_return", "max_drawdown"])
+    assert list(front["strategy"]) == ["a", "b", "c", "e"]
+    front = pareto_front(table, {"annualized_return": "max", "max_drawdown": "max", "volatility": "min"})
+    assert list(front["strategy"]) == ["a", "b", "c"]
+    with pytest.raises(ValueError):
+        pareto_front(table, {"sharpe": "best"})
+
+
+def test_large_sweeps():
+    # timings: scripts/bench_pareto.py
+    rng = np.random.default_rng(2)
+    mask2 = pareto_mask(rng.normal(size=(200_000, 2)))
+    mask4 = pareto_mask(rng.normal(size=(20_000, 4)))
+    assert 0 < mask2.sum() < 100 and 0 < mask4.sum() < 2000
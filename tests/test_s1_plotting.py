@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from S1.backtest import run_backtest
+from S1.plotting import downsample, lttb_indices, render_run_dirs
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    rng = np.random.default_rng(0)
+    y = np.cumsum(rng.normal(size=10_000))
+    y[1234], y[8765] = 1e3, -1e3
+    idx = lttb_indices(np.arange(len(y)), y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert (np.diff(idx) > 0).all()
+    assert 1234 in idx and 8765 in idx
+    # short series and degenerate thresholds are returned unchanged
+    np.testing.assert_array_equal(lttb_indices(np.arange(10), y[:10], 50), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(np.arange(10), y[:10], 2), np.arange(10))
+
+
+def test_downsample_uses_time_axis_and_drops_nan():
+    times = pd.date_range("2020-01-01", periods=5000, freq="h", tz="UTC")
+    values = np.sin(np.arange(5000) / 50.0)
+    values[:10] = np.nan
+    t, v = downsample(times, values, 300)
+    assert len(t) == len(v) == 300
+    assert t[0] == times[10] and t[-1] == times[-1]
+    assert not np.isnan(v).any()
+
+
+def test_deferred_render_matches_artifacts(tmp_path):
+    times = pd.date_range("2020-01-01", periods=400, freq="D", tz="UTC")
+    close = 100 + np.cumsum(np.random.default_rng(1).normal(size=400))
+    df = pd.DataFrame({"datetime": times, "open": close, "high": close, "low": close, "close": close, "volume": 1.0})
+    sig = pd.Series((np.arange(400) // 20) % 2, index=times)
+    run_dirs = []
+    for k in range(3):
+        run_dir = tmp_path / f"run{k}"
+        run_backtest(df, sig, out_dir=str(run_dir), engine="array", artifacts="data")
+        assert not (run_dir / "equity.png").exists()
+        run_dirs.append(str(run_dir))
+
+    rendered = dict(render_run_dirs(run_dirs, jobs=2, drawdown=True))
+    assert sorted(rendered) == sorted(run_dirs)
+    for run_dir, paths in rendered.items():
+        assert [p.rsplit("/", 1)[-1] for p in paths] == ["equity.png", "drawdown.png"]
+        with open(paths[0], "rb") as f:
+            assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failing_run_dir_does_not_stop_the_others(tmp_path, jobs):
+    times = pd.date_range("2020-01-01", periods=50, freq="D")
+    run_dirs = []
+    for k in range(3):
+        run_dir = tmp_path / f"run{k}"
+        run_dir.mkdir()
+        if k != 1:  # run1 has no equity.csv
+            pd.DataFrame({"datetime": times, "equity": np.linspace(1, 2, 50)}).to_csv(run_dir / "equity.csv",
+                                                                                   index=False)
+        run_dirs.append(str(run_dir))
+    with pytest.raises(Exception):
+        list(render_run_dirs(run_dirs, jobs=jobs))
+    rendered = dict(render_run_dirs(run_dirs, jobs=jobs, return_exceptions=True))
+    assert sorted(rendered) == sorted(run_dirs)
+    assert isinstance(rendered[run_dirs[1]], Exception)
+    assert all((tmp_path / f"run{k}" / "equity.png").exists() for k in (0, 2))
@@ -0,0 +1,125 @@
+import os
+from functools import partial
+
+import pandas as pd
+import synthetic
+from S1.result_cache import ResultCache, cached_backtest, main, make_key
+from S2.strategies.ma_crossover import backtest
+
+make_df = partial(synthetic.make_df, open_noise=0, wick=0.01, random_wicks=False)
+
+
+def _counting(fn):
+    calls = []
+
+    def wrapper(df, out_dir=None, **kwargs):
+        calls.append(kwargs)
+        return fn(df, out_dir=out_dir, **kwargs)
+
+    wrapper.__module__, wrapper.__qualname__ = fn.__module__, fn.__qualname__
+    return wrapper, calls
+
+
+def test_hit_restores_results_and_files(tmp_path):
+    df = make_df(600)
+    cache = ResultCache(str(tmp_path / "cache"))
+    bt, calls = _counting(backtest)
+    first = cached_backtest(cache, bt, df, out_dir=str(tmp_path / "a"), sl_pct=0.05, tp_pct=0.2, artifacts="data")
+    second = cached_backtest(cache, bt, df, out_dir=str(tmp_path / "b"), sl_pct=0.05, tp_pct=0.2, artifacts="data")
+    assert len(calls) == 1 and (cache.hits, cache.misses) == (1, 1)
+    assert first["metrics"] == second["metrics"] and first["trades"] == second["trades"]
+    pd.testing.assert_series_equal(first["equity"], second["equity"])
+    for name in ("equity.csv", "trades.csv", "metrics.json"):
+        with open(tmp_path / "a" / name) as fa, open(tmp_path / "b" / name) as fb:
+            assert fa.read() == fb.read(), name
+
+    # different parameters, different data, or an entry lacking the requested files: recompute
+    cached_backtest(cache, bt, df, out_dir=None, sl_pct=0.03, tp_pct=0.2)
+    cached_backtest(cache, bt, make_df(600, seed=5), out_dir=None, sl_pct=0.05, tp_pct=0.2)
+    cached_backtest(cache, bt, df, out_dir=str(tmp_path / "c"), sl_pct=0.05, tp_pct=0.2, artifacts="full")
+    assert len(calls) == 4
+    # a lower artifacts level is served by the richer entry
+    cached_backtest(cache, bt, df, out_dir=str(tmp_path / "d"), sl_pct=0.05, tp_pct=0.2, artifacts="metrics")
+    assert len(calls) == 4
+
+
+def test_keys_for_frame_and_series_params():
+    frame = pd.DataFrame({"f_smooth": [0.1, 0.2]})
+    assert make_key({"kelly": frame}) == make_key({"kelly": frame.copy()})
+    assert make_key({"kelly": frame}) != make_key({"kelly": frame.rename(columns={"f_smooth": "f_raw"})})
+    assert make_key({"kelly": frame["f_smooth"]}) != make_key({"kelly": frame["f_smooth"].rename("x")})
+
+
+def test_size_eviction_and_invalidate(tmp_path):
+    root = str(tmp_path / "cache")
+    cache = ResultCache(root, max_bytes=0)
+    payload = {"metrics": {}, "blob": b"x" * 10_000}
+    keys = [make_key({"backtest": "bt", "params": {"sl_pct": sl}}) for sl in (0.01, 0.02, 0.03)]
+    for k, sl in zip(keys, (0.01, 0.02, 0.03)):
+        cache.put(k, payload, parts={"backtest": "bt", "params": {"sl_pct": sl}})
+        os.utime(os.path.join(root, k[:2], k, "meta.json"), (1000 + sl * 100, 1000 + sl * 100))
+    assert cache.info()["entries"] == 3
+
+    cache.get(keys[0])  # touch: now the most recently used
+    cache.max_bytes = 15_000
+    assert cache.evict() == 2
+    assert cache.get(keys[0]) is not None and cache.get(keys[1]) is None and cache.get(keys[2]) is None
+
+    cache.max_bytes = 0
+    cache.put(keys[1], payload, parts={"backtest": "bt", "params": {"sl_pct": 0.02}})
+    assert cache.invalidate(match={"params.sl_pct": "0.02"}) == 1
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) is not None
+    main(["--root", root, "invalidate", "--all"])
+    assert cache.info()["entries"] == 0
+
+
+def test_puts_do_not_rescan_the_cache(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1 << 30)
+    scans = []
+    entries = ResultCache._entries
+    monkeypatch.setattr(ResultCache, "_entries", lambda self: scans.append(1) or entries(self))
+    payload = {"metrics": {}, "blob": b"x" * 1_000}
+    for i in range(50):
+        cache.put(make_key({"i": i}), payload)
+    assert len(scans) == 1
+
+    # at capacity, each eviction frees enough room for several more puts
+    cache.max_bytes = 10_000
+    scans.clear()
+    for i in range(50, 100):
+        cache.put(make_key({"i": i}), payload)
+    assert 0 < len(scans) <= 50 // 2
+    assert cache.info()["bytes"] <= 10_000 and cache.info()["entries"] >= 7
+
+
+def test_only_files_written_by_the_run_are_stored(tmp_path):
+    df = make_df(300)
+    cache = ResultCache(str(tmp_path / "cache"))
+    out_dir = tmp_path / "a"
+    out_dir.mkdir()
+    (out_dir / "old_equity.png").write_text("leftover")
+    (out_dir / "state.pkl").write_text("leftover")
+    cached_backtest(cache, backtest, df, out_dir=str(out_dir), artifacts="data")
+    cached_backtest(cache, backtest, df, out_dir=str(tmp_path / "b"), artifacts="data")
+    assert cache.hits == 1
+    assert "old_equity.png" not in os.listdir(tmp_path / "b") and "state.pkl" not in os.listdir(tmp_path / "b")
+    assert "equity.csv" in os.listdir(tmp_path / "b")
+
+
+def test_kelly_dir_contents_are_part_of_the_key(tmp_path):
+    from S3.strategies.ma_crossover import backtest as s3_backtest
+
+    df = make_df(400)
+    kelly_dir = tmp_path / "kelly"
+    kelly_dir.mkdir()
+    times = df["datetime"].dt.tz_localize(None)
+    pd.DataFrame({"datetime": times, "f_smooth": 0.5}).to_csv(kelly_dir / "kelly_returns_rolling.csv", index=False)
+    cache = ResultCache(str(tmp_path / "cache"))
+    kw = dict(out_dir=None, enable_kelly=True, kelly_dir=str(kelly_dir), kelly_max_alloc=1.0)
+    first = cached_backtest(cache, s3_backtest, df, **kw)
+    assert cached_backtest(cache, s3_backtest, df, **kw)["metrics"] == first["metrics"] and cache.hits == 1
+
+    # kelly_estimate.py regenerated the estimates: the stale result is not served
+    pd.DataFrame({"datetime": times, "f_smooth": 0.1}).to_csv(kelly_dir / "kelly_returns_rolling.csv", index=False)
+    second = cached_backtest(cache, s3_backtest, df, **kw)
+    assert cache.hits == 1 and second["metrics"] != first["metrics"]
@@ -0,0 +1,74 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+import synthetic
+from S1.backtest import run_backtest
+from S1.roundtrips import ROUNDTRIP_COLUMNS, round_trips
+from S2.backtest import run_backtest_sl_tp
+from scripts.kelly_estimate import read_trades_returns
+from synthetic import make_signals
+
+make_df = partial(synthetic.make_df, random_wicks=False)
+
+
+def reference_round_trips(trades, bar_times, fee):
+    # pair each buy with the following sell one trade at a time
+    rows = []
+    for buy, sell in zip(trades[:-1], trades[1:]):
+        if buy["side"] != "buy":
+            continue
+        rows.append({
+            "return": sell["qty"] * sell["price"] * (1 - fee) / (buy["qty"] * buy["price"] * (1 + fee)) - 1,
+            "holding_bars": bar_times.index(sell["datetime"]) - bar_times.index(buy["datetime"]),
+            "exit_reason": sell.get("reason", "signal_exit"),
+        })
+    return pd.DataFrame(rows)
+
+
+def test_s1_round_trips_and_artifact(tmp_path):
+    df = make_df(600)
+    out = run_backtest(df, make_signals(df), out_dir=str(tmp_path), fee=0.002, artifacts="data")
+    trades = out["trades"]
+    table = round_trips(trades, index=out["equity"].index, fee=0.002)
+    assert tuple(table.columns) == ROUNDTRIP_COLUMNS
+    assert len(table) == sum(t["side"] == "sell" for t in trades) > 10
+    expected = reference_round_trips(trades, [t.isoformat() for t in out["equity"].index], 0.002)
+    np.testing.assert_allclose(table["return"], expected["return"], rtol=1e-12)
+    assert list(table["holding_bars"]) == list(expected["holding_bars"])
+    assert (table["exit_reason"] == "signal_exit").all()
+    # fee recovered from the cash column when not given
+    np.testing.assert_allclose(round_trips(trades)["return"], table["return"], rtol=1e-9)
+
+    csv = pd.read_csv(tmp_path / "roundtrips.csv")
+    np.testing.assert_allclose(csv["return"], table["return"])
+    # kelly_estimate reads the native trade log as round-trip returns
+    np.testing.assert_allclose(read_trades_returns(tmp_path / "trades.csv"), table["return"], rtol=1e-9)
+
+
+def test_s2_round_trips_keep_exit_reasons(tmp_path):
+    df = make_df(800, seed=3)
+    out = run_backtest_sl_tp(df, make_signals(df, seed=4), out_dir=str(tmp_path), sl_pct=0.03, tp_pct=0.08,
+                             skip_reindex=True, artifacts="data")
+    trades = list(out["trades"])
+    csv = pd.read_csv(tmp_path / "roundtrips.csv")
+    bar_times = [t.isoformat() for t in pd.DatetimeIndex(df["datetime"]).tz_localize(None)]
+    expected = reference_round_trips(trades, bar_times, 0.001)
+    assert len(csv) == len(expected) and {"sl", "tp", "signal_exit"} <= set(csv["exit_reason"])
+    assert list(csv["exit_reason"]) == list(expected["exit_reason"])
+    assert list(csv["holding_bars"]) == list(expected["holding_bars"])
+    np.testing.assert_allclose(csv["return"], expected["return"], rtol=1e-12)
+    assert list(csv["entry_time"]) == [t["datetime"] for t in trades if t["side"] == "buy"][:len(csv)]
+
+
+def test_open_position_and_malformed_logs():
+    trades = [{"datetime": "2020-01-02T00:00:00", "side": "buy", "price": 10.0, "qty": 1.0, "cash": 0.0},
+              {"datetime": "2020-01-05T00:00:00", "side": "sell", "price": 12.0, "qty": 1.0, "cash": 12.0},
+              {"datetime": "2020-01-06T00:00:00", "side": "buy", "price": 11.0, "qty": 1.0, "cash": 1.0}]
+    table = round_trips(trades, fee=0.0)
+    assert len(table) == 1 and table["return"].iloc[0] == pytest.approx(0.2)
+    assert table["holding_bars"].isna().all()
+    assert round_trips([]).empty
+    with pytest.raises(ValueError):
+        round_trips(trades[:1] + trades[2:])
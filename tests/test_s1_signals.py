@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from S1.strategies import ma_crossover, macd, rsi
+from S1.strategies.common import latch_positions
+
+
+def _reference_latch(buy, sell):
+    # the per-bar loop the strategies used before the vectorized latch
+    out = np.zeros(len(buy), dtype=np.int64)
+    position = 0
+    for i in range(len(buy)):
+        if buy[i] and position == 0:
+            position = 1
+        elif sell[i] and position == 1:
+            position = 0
+        out[i] = position
+    return out
+
+
+def make_df(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+    return pd.DataFrame({
+        "datetime": pd.date_range("2020-01-01", periods=n, freq="D", tz="UTC"),
+        "open": close, "high": close, "low": close, "close": close, "volume": 1.0,
+    })
+
+
+@pytest.mark.parametrize("p_buy,p_sell", [(0.1, 0.1), (0.5, 0.5), (0.9, 0.2), (0.0, 0.3)])
+def test_latch_matches_loop(p_buy, p_sell):
+    rng = np.random.default_rng(int(p_buy * 10 + p_sell * 100))
+    buy = rng.random((5, 300)) < p_buy
+    sell = rng.random((5, 300)) < p_sell
+    out = latch_positions(buy, sell)
+    assert out.shape == (5, 300)
+    for k in range(5):
+        np.testing.assert_array_equal(out[k], _reference_latch(buy[k], sell[k]))
+        np.testing.assert_array_equal(latch_positions(buy[k], sell[k]), out[k])
+
+
+def test_latch_rejects_mismatched_shapes():
+    with pytest.raises(ValueError):
+        latch_positions(np.zeros(3, bool), np.zeros(4, bool))
+
+
+def test_strategies_match_loop():
+    df = make_df()
+    close = df["close"]
+    ma_s, ma_l = close.rolling(ma_crossover.SHORT).mean(), close.rolling(ma_crossover.LONG).mean()
+    m = macd._ema(close, 12) - macd._ema(close, 26)
+    s = macd._ema(m, 9)
+    r = rsi._rsi(close, rsi.PERIOD)
+    cases = [
+        (ma_crossover, (ma_s.shift(1) <= ma_l.shift(1)) & (ma_s > ma_l), (ma_s.shift(1) >= ma_l.shift(1)) & (ma_s < ma_l)),
+        (macd, (m.shift(1) <= s.shift(1)) & (m > s), (m.shift(1) >= s.shift(1)) & (m < s)),
+        (rsi, r < rsi.RSI_LOW, r > rsi.RSI_HIGH),
+    ]
+    for mod, buy, sell in cases:
+        sig = mod.generate_signals(df)
+        assert sig.index.equals(pd.Index(df["datetime"]))
+        expected = _reference_latch(buy.to_numpy(), sell.to_numpy())
+        assert expected.any()
+        np.testing.assert_array_equal(sig.to_numpy(), expected)
+
+
+def test_indicator_cache_reuses_signals():
+    from S1.strategies.common import INDICATOR_CACHE, IndicatorCache
+
+    INDICATOR_CACHE.clear()
+    df = make_df(200)
+    first = ma_crossover.generate_signals(df)
+    misses = INDICATOR_CACHE.misses
+    assert INDICATOR_CACHE.hits == 0 and misses == 3  # signal + two SMAs
+
+    again = ma_crossover.generate_signals(df.copy())
+    assert INDICATOR_CACHE.hits == 1 and INDICATOR_CACHE.misses == misses
+    pd.testing.assert_series_equal(first, again)
+    again.iloc[:] = 0  # callers get their own copy
+    pd.testing.assert_series_equal(ma_crossover.generate_signals(df), first)
+
+    changed = df.copy()
+    changed.loc[150, "close"] *= 1.5
+    ma_crossover.generate_signals(changed)
+    assert INDICATOR_CACHE.misses == misses + 3
+
+    lru = IndicatorCache(maxsize=2)
+    for k in ("a", "b", "a", "c"):
+        lru.get(k, lambda: k)
+    assert lru.info() == {"hits": 1, "misses": 3, "size": 2, "maxsize": 2, "bytes": 0,
+                          "max_bytes": lru.max_bytes}
+    assert lru.get("b", lambda: "new") == "new"  # "b" was least recently used, so it was evicted
+
+
+def test_indicator_cache_is_bounded_by_bytes():
+    from S1.strategies.common import IndicatorCache
+
+    series = {k: pd.Series(np.zeros(1000)) for k in "abcd"}
+    size = int(series["a"].memory_usage(index=True))
+    cache = IndicatorCache(maxsize=64, max_bytes=3 * size)
+    for k in "abca":
+        cache.get(k, lambda: series[k])
+    cache.get("d", lambda: series["d"])
+    # "b" is the least recently used once "a" was hit again
+    assert len(cache) == 3 and cache.bytes == 3 * size
+    assert cache.get("b", lambda: None) is None and cache.get("a", lambda: None) is series["a"]
+
+    big = pd.Series(np.zeros(10_000))
+    assert cache.get("big", lambda: big) is big
+    assert cache.get("big", lambda: "recomputed") == "recomputed" and cache.bytes <= 3 * size
+
+
+def test_ma_matrix_matches_rolling_and_signals():
+    df = make_df(800, seed=2)
+    df.loc[100, "close"] = np.nan
+    windows = [1, 3, 5, 20, 50]
+    sma = ma_crossover.sma_matrix(df["close"], windows)
+    ema = ma_crossover.ema_matrix(df["close"], windows)
+    for k, w in enumerate(windows):
+        np.testing.assert_allclose(sma[:, k], df["close"].rolling(w).mean().to_numpy(), rtol=1e-10, equal_nan=True)
+        np.testing.assert_array_equal(ema[:, k], macd._ema(df["close"], w).to_numpy())
+
+    df = make_df(800, seed=2)
+    pairs = [(5, 20), (3, 50), (20, 5)]
+    mat = ma_crossover.generate_signals_matrix(df, pairs)
+    assert mat.shape == (3, 800)
+    np.testing.assert_array_equal(mat[0], ma_crossover.generate_signals(df).to_numpy())
+    for row, (a, b) in zip(mat, pairs):
+        fast, slow = df["close"].rolling(a).mean(), df["close"].rolling(b).mean()
+        buy = (fast.shift(1) <= slow.shift(1)) & (fast > slow)
+        sell = (fast.shift(1) >= slow.shift(1)) & (fast < slow)
+        np.testing.assert_array_equal(row, _reference_latch(buy.to_numpy(), sell.to_numpy()))
+    with pytest.raises(ValueError):
+        ma_crossover.generate_signals_matrix(df, pairs, kind="wma")
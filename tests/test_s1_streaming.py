@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from S1.strategies import ma_crossover, macd, rsi
+from S1.strategies.streaming import STREAMS, StreamingEMA, StreamingRSI, StreamingSMA
+
+BTC_CACHE = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "btc_daily.csv")
+
+
+def _history():
+    """The cached BTC daily history when available, otherwise a BTC-like random walk with flat stretches."""
+    if os.path.exists(BTC_CACHE):
+        from S1.data import load_dataset
+        return load_dataset(BTC_CACHE)
+    rng = np.random.default_rng(7)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.035, 3000)))
+    close[1000:1030] = close[999]  # flat run exercises the repeated-value path of rolling mean
+    return pd.DataFrame({
+        "datetime": pd.date_range("2015-01-01", periods=len(close), freq="D", tz="UTC"),
+        "open": close, "high": close, "low": close, "close": close, "volume": 1.0,
+    })
+
+
+def _feed(obj, values):
+    return np.array([obj.update(v) for v in values])
+
+
+def test_streaming_indicators_match_batch():
+    close = _history()["close"].copy()
+    close.iloc[[40, 41, 500]] = np.nan
+    for w in (1, 5, 20):
+        np.testing.assert_array_equal(_feed(StreamingSMA(w), close), close.rolling(w).mean().to_numpy())
+    for span in (9, 12, 26):
+        np.testing.assert_array_equal(_feed(StreamingEMA(span), close), macd._ema(close, span).to_numpy())
+    np.testing.assert_array_equal(_feed(StreamingRSI(), close), rsi._rsi(close).to_numpy())
+
+
+@pytest.mark.parametrize("name,module", [("ma_crossover", ma_crossover), ("macd", macd), ("rsi", rsi)])
+def test_streaming_strategy_matches_generate_signals(name, module):
+    df = _history()
+    expected = module.generate_signals(df).to_numpy()
+    assert expected.any()
+    np.testing.assert_array_equal(_feed(STREAMS[name](), df["close"]), expected)
+
+
+def test_streaming_objects_use_slots():
+    with pytest.raises(AttributeError):
+        StreamingSMA(5).extra = 1
+    with pytest.raises(AttributeError):
+        STREAMS["macd"]().extra = 1
@@ -0,0 +1,150 @@
+import subprocess
+import sys
+import textwrap
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import synthetic
+from S2.backtest import run_backtest_batch
+from S2.strategies.rsi import generate_signals
+from S3.strategies import ma_crossover as s3_ma_crossover
+from scripts.adaptive_search import (OBJECTIVES, batch_evaluator, full_grid_cost, grid_candidates,
+                                     sample_candidates, successive_halving)
+
+make_df = partial(synthetic.make_df, drift=0.0005)
+
+
+def grid(sl_values, tp_values):
+    return [{"sl_pct": float(sl), "tp_pct": float(tp)} for sl in sl_values for tp in tp_values]
+
+
+def test_latin_hypercube_covers_every_stratum():
+    cells = sample_candidates({"sl_pct": (0.01, 0.1), "frac": (0.1, 1.0)}, 50, seed=4)
+    sl = np.array([c["sl_pct"] for c in cells])
+    frac = np.array([c["frac"] for c in cells])
+    assert sorted(np.floor((sl - 0.01) / 0.09 * 50).astype(int).clip(0, 49)) == list(range(50))
+    assert frac.min() >= 0.1 and frac.max() <= 1.0
+    assert cells == sample_candidates({"sl_pct": (0.01, 0.1), "frac": (0.1, 1.0)}, 50, seed=4)
+
+
+def test_rungs_grow_and_keep_the_best_third():
+    df = make_df(2000)
+    evaluate = batch_evaluator(df, "rsi")
+    cells = grid(np.linspace(0.01, 0.1, 9), np.linspace(0.05, 0.4, 9))
+    table = successive_halving(evaluate, cells, len(df), "calmar", eta=3, min_bars=200)
+    sizes = table.groupby("rung").size()
+    assert list(sizes) == [81, 27, 9]
+    assert list(table.groupby("rung")["bars"].first()) == [223, 667, 2000]
+    assert full_grid_cost(table, len(df)) == pytest.approx((81 * 223 + 27 * 667 + 9 * 2000) / (81 * 2000))
+    for rung in (0, 1):
+        prev = table[table["rung"] == rung]
+        kept = table[table["rung"] == rung + 1]
+        top = prev.iloc[:len(kept)]
+        assert set(zip(kept["sl_pct"], kept["tp_pct"])) == set(zip(top["sl_pct"], top["tp_pct"]))
+        assert prev["score"].iloc[len(kept) - 1] >= prev["score"].iloc[len(kept):].max()
+
+    # a rung is the full-history engine run on the prefix window
+    rung0 = table[table["rung"] == 0].reset_index(drop=True)
+    signals = generate_signals(df).reindex(pd.DatetimeIndex(df["datetime"])).fillna(0).astype(int)
+    prefix = run_backtest_batch(df.iloc[:223], [signals.iloc[:223]], [dict(rung0.loc[0, ["sl_pct", "tp_pct"]])])
+    assert prefix["sharpe"].iloc[0] == pytest.approx(rung0["sharpe"].iloc[0])
+
+
+def predictive_evaluator(n_bars):
+    """Metrics whose ranking on a short window predicts the full-history one, up to window noise."""
+    def evaluate(cells, bars):
+        sl = np.array([c["sl_pct"] for c in cells])
+        tp = np.array([c["tp_pct"] for c in cells])
+        quality = 1 - ((sl - 0.043) / 0.09) ** 2 - ((tp - 0.27) / 0.35) ** 2
+        noise = 0.05 * np.sqrt(1 - bars / n_bars) * np.sin(997 * sl + 331 * tp)
+        sharpe = quality + noise
+        return pd.DataFrame({"sl_pct": sl, "tp_pct": tp, "sharpe": sharpe, "annualized_return": sharpe / 5,
+                             "max_drawdown": -0.2 + 0 * sl})
+    return evaluate
+
+
+@pytest.mark.parametrize("objective", list(OBJECTIVES))
+@pytest.mark.parametrize("grid_mode", [True, False])
+def test_search_recovers_the_full_grid_best(objective, grid_mode):
+    n_bars = 2500
+    evaluate = predictive_evaluator(n_bars)
+    if grid_mode:
+        cells = grid_candidates(["sl_pct", "tp_pct"])
+    else:
+        cells = sample_candidates({"sl_pct": (0.01, 0.1), "tp_pct": (0.05, 0.4)}, 80, seed=3)
+    table = successive_halving(evaluate, cells, n_bars, objective)
+    full = evaluate(cells, n_bars)
+    full["score"] = OBJECTIVES[objective](full)
+    best = table[table["rung"] == table["rung"].max()]
+    assert len(best) >= 3
+    top = full.loc[full["score"].idxmax()]
+    assert (best.iloc[0]["sl_pct"], best.iloc[0]["tp_pct"]) == (top["sl_pct"], top["tp_pct"])
+    if grid_mode:
+        # the 3x3 grid is too small to halve: every cell runs on the full history
+        assert (table["bars"] == n_bars).all() and len(table) == len(cells)
+    else:
+        assert table["rung"].max() == 2 and full_grid_cost(table, n_bars) < 0.5
+
+
+@pytest.mark.parametrize("objective", list(OBJECTIVES))
+def test_single_rung_is_the_full_grid(objective):
+    df = make_df(600, seed=2)
+    evaluate = batch_evaluator(df, "macd")
+    cells = grid([0.03, 0.05, 0.08], [0.1, 0.2, 0.3])
+    table = successive_halving(evaluate, cells, len(df), objective, min_bars=len(df))
+    assert (table["rung"] == 0).all() and (table["bars"] == len(df)).all() and len(table) == 9
+    full = evaluate(cells, len(df))
+    score = OBJECTIVES[objective](full)
+    best = table.iloc[0]
+    assert best["score"] == pytest.approx(score.max())
+
+
+def test_kelly_search_matches_the_strategy_backtest(tmp_path):
+    df = make_df(900, seed=5)
+    kelly_dir = tmp_path / "kelly"
+    kelly_dir.mkdir()
+    f = np.clip(np.sin(np.arange(len(df)) / 40) * 0.4 + 0.2, 0, None)
+    pd.DataFrame({"datetime": df["datetime"].dt.tz_localize(None), "f_smooth": f}).to_csv(
+        kelly_dir / "kelly_returns_rolling.csv", index=False)
+
+    evaluate = batch_evaluator(df, "ma_crossover", "s3", str(kelly_dir))
+    cells = sample_candidates({"kelly_max_alloc": (0.01, 0.5), "frac": (0.1, 1.0)}, 27, seed=1)
+    table = successive_halving(evaluate, cells, len(df), "sharpe", min_bars=100)
+    final = table[table["rung"] == table["rung"].max()]
+    assert table["rung"].max() == 2 and len(final) == 3
+    assert final["total_return"].nunique() == 3
+    best = final.iloc[0]
+    out = s3_ma_crossover.backtest(df, out_dir=None, sl_pct=0.05, tp_pct=0.2, enable_kelly=True,
+                                   kelly_dir=str(kelly_dir), kelly_scale=best["frac"], kelly_min_alloc=0.0,
+                                   kelly_max_alloc=best["kelly_max_alloc"])
+    assert out["metrics"]["sharpe"] == pytest.approx(best["sharpe"], rel=1e-9)
+    assert float(out["equity"].iloc[-1]) == pytest.approx(best["final_equity"], rel=1e-9)
+
+
+def test_kelly_estimates_are_read_once(tmp_path):
+    df = make_df(300, seed=5)
+    kelly_csv = tmp_path / "kelly_returns_rolling.csv"
+    pd.DataFrame({"datetime": df["datetime"].dt.tz_localize(None), "f_smooth": 0.3}).to_csv(kelly_csv, index=False)
+    evaluate = batch_evaluator(df, "ma_crossover", "s3", str(tmp_path))
+    cells = [{"kelly_max_alloc": 0.2, "frac": 0.5}]
+    first = evaluate(cells, 150)
+    kelly_csv.unlink()
+    assert evaluate(cells, 150)["final_equity"].iloc[0] == first["final_equity"].iloc[0]
+    assert len(evaluate(cells, len(df))) == 1
+
+    with pytest.raises(FileNotFoundError):
+        batch_evaluator(df, "ma_crossover", "s3", str(tmp_path))
+
+
+def test_grid_candidates_import_has_no_side_effects():
+    code = textwrap.dedent("""
+        import os, sys
+        os.makedirs = lambda *a, **k: sys.exit("makedirs called")
+        from scripts.adaptive_search import grid_candidates
+        assert len(grid_candidates(["sl_pct", "tp_pct", "kelly_max_alloc", "frac"])) > 0
+        assert "matplotlib.pyplot" not in sys.modules
+    """)
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parents[1])
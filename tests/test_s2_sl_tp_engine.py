@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+import pytest
+from S2.backtest import run_backtest_sl_tp, run_backtest_batch
+from synthetic import make_df, make_signals
+
+
+def _run_both(df, sig, tmp_path, **kw):
+    out_loop = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "loop"), engine="loop", skip_reindex=True, **kw)
+    out_vec = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "vec"), engine="vectorized", skip_reindex=True, **kw)
+    return out_loop, out_vec
+
+
+def test_vectorized_matches_loop(tmp_path):
+    df = make_df(2000)
+    sig = make_signals(df)
+    for sl, tp in [(0.03, 0.1), (0.05, 0.2), (0.5, 5.0)]:
+        out_loop, out_vec = _run_both(df, sig, tmp_path, sl_pct=sl, tp_pct=tp)
+        assert out_loop["trades"] == out_vec["trades"]
+        pd.testing.assert_series_equal(out_loop["equity"], out_vec["equity"])
+        assert out_loop["metrics"] == out_vec["metrics"]
+    reasons = {t.get("reason") for t in out_loop["trades"]}
+    assert "signal_exit" in reasons
+
+
+def test_vectorized_sl_wins_and_liquidates(tmp_path):
+    # bar 2 hits both SL and TP: SL must win; later entry is held to the end and liquidated
+    opens = [100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0]
+    df = pd.DataFrame({
+        "datetime": pd.date_range("2020-01-01", periods=7, freq="D"),
+        "open": opens,
+        "high": [100.0, 100.0, 130.0, 100.0, 100.0, 100.0, 100.0],
+        "low": [100.0, 100.0, 90.0, 100.0, 100.0, 100.0, 100.0],
+        "close": [100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 101.0],
+        "volume": 1.0,
+    })
+    sig = pd.Series([0, 1, 1, 0, 1, 1, 1], index=pd.DatetimeIndex(df["datetime"]))
+    out_loop, out_vec = _run_both(df, sig, tmp_path, sl_pct=0.05, tp_pct=0.2)
+    assert out_loop["trades"] == out_vec["trades"]
+    assert [t.get("reason") for t in out_vec["trades"]] == [None, "sl", None, "liquidate_end"]
+    pd.testing.assert_series_equal(out_loop["equity"], out_vec["equity"])
+
+
+def test_batch_matches_single_runs(tmp_path):
+    df = make_df(1200, seed=4)
+    signals = []
+    params = []
+    for seed in range(3):
+        for sl, tp in [(0.03, 0.1), (0.08, 0.3)]:
+            signals.append(make_signals(df, seed=seed))
+            params.append({"seed": seed, "sl_pct": sl, "tp_pct": tp})
+    table, equity = run_backtest_batch(df, signals, params, return_equity=True)
+    assert list(table["seed"]) == [p["seed"] for p in params]
+    for k, (sig, p) in enumerate(zip(signals, params)):
+        out = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "single"), skip_reindex=True,
+                                 sl_pct=p["sl_pct"], tp_pct=p["tp_pct"])
+        np.testing.assert_array_equal(out["equity"].values, equity[k].values)
+        assert table.loc[k, "trades"] == len(out["trades"])
+        for key in ["total_return", "annualized_return", "max_drawdown", "volatility", "sharpe"]:
+            assert abs(table.loc[k, key] - out["metrics"][key]) < 1e-9, key
+
+
+def _chunks(df, size):
+    for lo in range(0, len(df), size):
+        yield df.iloc[lo:lo + size]
+
+
+def test_stream_matches_in_memory(tmp_path):
+    from S2.backtest import run_backtest_stream
+
+    df = make_df(1500, seed=3)
+    sig = make_signals(df, hold=6)
+    ref = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "ref"), engine="vectorized", skip_reindex=True,
+                             sl_pct=0.04, tp_pct=0.08)
+    streamed = df.assign(signal=sig.to_numpy())
+    for size in (1, 7, 250, 5000):
+        out_dir = tmp_path / f"stream_{size}"
+        res = run_backtest_stream(_chunks(streamed, size), out_dir=str(out_dir), sl_pct=0.04, tp_pct=0.08)
+        assert res["bars"] == 1500 and res["trades"] == len(ref["trades"])
+        for name in ("equity.csv", "trades.csv"):
+            assert (out_dir / name).read_text() == (tmp_path / "ref" / name).read_text()
+        for k, v in ref["metrics"].items():
+            if isinstance(v, float):
+                assert res["metrics"][k] == pytest.approx(v, rel=1e-9)
+            else:
+                assert res["metrics"][k] == v
+
+
+def test_stream_intraday_bars_keep_their_times(tmp_path):
+    from S2.backtest import run_backtest_stream
+
+    df = make_df(300, seed=7)
+    df["datetime"] = pd.date_range("2020-01-01", periods=len(df), freq="h", tz="UTC")
+    sig = make_signals(df, hold=6)
+    ref = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "ref"), engine="vectorized", skip_reindex=True,
+                             sl_pct=0.04, tp_pct=0.08)
+    streamed = df.assign(signal=sig.to_numpy())
+    # chunksize=1: the first chunk is a lone midnight bar
+    for size in (1, 24, 1000):
+        out_dir = tmp_path / f"stream_{size}"
+        run_backtest_stream(_chunks(streamed, size), out_dir=str(out_dir), sl_pct=0.04, tp_pct=0.08)
+        for name in ("equity.csv", "trades.csv"):
+            assert (out_dir / name).read_text() == (tmp_path / "ref" / name).read_text()
+    assert "2020-01-01 01:00:00," in (tmp_path / "stream_1" / "equity.csv").read_text()
+    assert len(ref["trades"]) > 0
+
+
+def test_stream_with_strategy_object_and_cache_chunks(tmp_path):
+    from S1.data import iter_cache_chunks, write_cache
+    from S1.strategies.ma_crossover import generate_signals
+    from S1.strategies.streaming import MACrossoverStream
+    from S2.backtest import run_backtest_stream
+
+    df = make_df(800, seed=4)
+    path = str(tmp_path / "btc.cols")
+    write_cache(df, path)
+    res = run_backtest_stream(iter_cache_chunks(path, chunksize=64), out_dir=str(tmp_path / "s"),
+                              strategy=MACrossoverStream())
+    ref = run_backtest_sl_tp(df, generate_signals(df), out_dir=str(tmp_path / "r"), skip_reindex=True)
+    assert (tmp_path / "s" / "trades.csv").read_text() == (tmp_path / "r" / "trades.csv").read_text()
+    assert res["metrics"]["total_return"] == pytest.approx(ref["metrics"]["total_return"], rel=1e-12)
+
+    with pytest.raises(ValueError):
+        run_backtest_stream([df.iloc[10:20], df.iloc[:10]], out_dir=str(tmp_path / "bad"), strategy=MACrossoverStream())
+
+
+def test_stream_resume_matches_full_run(tmp_path):
+    from S1.data import append_cache, iter_cache_chunks, write_cache
+    from S1.strategies.streaming import MACrossoverStream
+    from S2.backtest import load_stream_state, run_backtest_stream
+
+    df = make_df(700, seed=6)
+    kw = dict(sl_pct=0.5, tp_pct=5.0)  # wide limits: positions stay open across refreshes
+    full = run_backtest_stream(_chunks(df, 100), out_dir=str(tmp_path / "full"), strategy=MACrossoverStream(), **kw)
+
+    path = str(tmp_path / "btc.cols")
+    out_dir = str(tmp_path / "inc")
+    write_cache(df.iloc[:470], path)
+    run_backtest_stream(iter_cache_chunks(path, chunksize=64), out_dir=out_dir, strategy=MACrossoverStream(), **kw)
+    held_open = False
+    # nightly refreshes: a few bars, then single bars, each resumed from the previous snapshot
+    for lo, hi in [(470, 475), (475, 476), (476, 477), (477, 700)]:
+        append_cache(df.iloc[lo:hi], path)
+        state = load_stream_state(out_dir)
+        held_open |= state["entry_price"] is not None
+        res = run_backtest_stream(iter_cache_chunks(path, chunksize=64, after=state["last_time"]), out_dir=out_dir,
+                                  strategy=MACrossoverStream(), resume=True, **kw)
+        assert res["new_bars"] == hi - lo and res["bars"] == hi
+    assert held_open
+    assert res["trades"] == full["trades"]
+    for name in ("equity.csv", "trades.csv"):
+        assert (tmp_path / "inc" / name).read_text() == (tmp_path / "full" / name).read_text()
+    for k, v in full["metrics"].items():
+        assert res["metrics"][k] == (pytest.approx(v, rel=1e-9) if isinstance(v, float) else v)
+
+    with pytest.raises(ValueError):
+        run_backtest_stream([], out_dir=out_dir, strategy=MACrossoverStream(), sl_pct=0.01, resume=True)
+
+
+def test_stream_resume_intraday_after_one_bar(tmp_path):
+    from S2.backtest import load_stream_state, run_backtest_stream
+
+    df = make_df(400, seed=8)
+    # three daily bars, then hourly bars
+    df["datetime"] = pd.DatetimeIndex(list(pd.date_range("2020-01-01", periods=3, freq="D", tz="UTC"))
+                                      + list(pd.date_range("2020-01-04", periods=len(df) - 3, freq="h", tz="UTC")))
+    streamed = df.assign(signal=make_signals(df, hold=6).to_numpy())
+    kw = dict(sl_pct=0.04, tp_pct=0.08)
+    run_backtest_stream(_chunks(streamed, 50), out_dir=str(tmp_path / "full"), **kw)
+
+    for first in (1, 3):
+        out_dir = str(tmp_path / f"inc_{first}")
+        run_backtest_stream(_chunks(streamed.iloc[:first], 1), out_dir=out_dir, **kw)
+        assert load_stream_state(out_dir)["date_unit"] == "D"
+
+        def interrupted():
+            yield streamed.iloc[first:40]
+            raise RuntimeError("killed")
+
+        # a resume that dies after rewriting the date-only rows leaves the old snapshot behind
+        with pytest.raises(RuntimeError):
+            run_backtest_stream(interrupted(), out_dir=out_dir, resume=True, **kw)
+        res = run_backtest_stream(_chunks(streamed.iloc[first:], 7), out_dir=out_dir, resume=True, **kw)
+        assert res["bars"] == len(df)
+        for name in ("equity.csv", "trades.csv"):
+            assert (tmp_path / f"inc_{first}" / name).read_text() == (tmp_path / "full" / name).read_text()
+
+
+def test_trade_log_behaves_like_list_of_dicts():
+    from S2.backtest import BUY, SELL, SIGNAL_EXIT, TradeLog
+
+    log = TradeLog(capacity=1)
+    t0 = pd.Timestamp("2021-03-04 05:06:07").value
+    log.append(t0, BUY, 100.0, 2.0, 0.0)
+    log.append(t0 + 1_500_000_000, SELL, 101.5, 2.0, 203.0, SIGNAL_EXIT)
+    expected = [
+        {"datetime": "2021-03-04T05:06:07", "side": "buy", "price": 100.0, "qty": 2.0, "cash": 0.0},
+        {"datetime": "2021-03-04T05:06:08.500000", "side": "sell", "price": 101.5, "qty": 2.0, "cash": 203.0,
+         "reason": "signal_exit"},
+    ]
+    assert len(log) == 2 and log == expected and log[-1] == expected[-1] and log[:1] == expected[:1]
+    assert log.side.dtype == np.int8 and log.time.dtype == np.int64
+    pd.testing.assert_frame_equal(log.to_frame(), pd.DataFrame(expected))
+    with pytest.raises(IndexError):
+        log[2]
+
+
+def test_trade_times_beyond_nanosecond_range(tmp_path):
+    df = make_df(400)
+    df["datetime"] = pd.date_range("2262-01-01", periods=len(df), freq="D", tz="UTC", unit="s")
+    sig = make_signals(df, hold=5)
+    out_loop, out_vec = _run_both(df, sig, tmp_path, sl_pct=0.03, tp_pct=0.1)
+    assert out_loop["trades"] == out_vec["trades"]
+    assert out_vec["trades"][-1]["datetime"].startswith("2263-")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_vectorized_matches_loop(Path(d))
+        test_vectorized_sl_wins_and_liquidates(Path(d))
+        test_batch_matches_single_runs(Path(d))
+        test_stream_matches_in_memory(Path(d))
+        test_stream_intraday_bars_keep_their_times(Path(d))
+        test_stream_with_strategy_object_and_cache_chunks(Path(d))
+        test_stream_resume_matches_full_run(Path(d))
+        test_stream_resume_intraday_after_one_bar(Path(d))
+        test_trade_log_behaves_like_list_of_dicts()
+        test_trade_times_beyond_nanosecond_range(Path(d))
+    print("ok")
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from S3.backtest import _read_kelly_series
+from scripts.kelly_estimate import (rolling_continuous_kelly, rolling_discrete_kelly, run_batch,
+                                    smooth_series)
+
+
+def reference_kelly(trade_returns, window):
+    # the original per-window implementation
+    r = trade_returns.reset_index(drop=True)
+
+    def calc(sub):
+        if len(sub) < 5:
+            return np.nan
+        wins = sub[sub > 0]
+        losses = sub[sub <= 0]
+        p = len(wins) / len(sub)
+        if len(wins) == 0 or len(losses) == 0:
+            return np.nan
+        g = wins.mean()
+        l = (-losses).mean()
+        if l <= 0 or g <= 0:
+            return np.nan
+        return p - (1 - p) / (g / l)
+
+    return r.rolling(window=window, min_periods=5).apply(lambda x: calc(pd.Series(x)), raw=False)
+
+
+def make_returns(n, seed=0):
+    rng = np.random.default_rng(seed)
+    r = np.round(rng.normal(0.002, 0.03, n), 3)  # rounding leaves some exact zeros
+    r[40:60] = np.abs(r[40:60]) + 0.01    # a run of wins only
+    r[100:115] = 0.0                       # zero returns are losses with l = 0
+    r[150:153] = np.nan
+    return pd.Series(r, name="return")
+
+
+@pytest.mark.parametrize("window", [5, 7, 20, 100])
+def test_matches_per_window_computation(window):
+    r = make_returns(400)
+    got = rolling_discrete_kelly(r, window)
+    expected = reference_kelly(r, window)
+    assert got.name == "return" and got.index.equals(expected.index)
+    pd.testing.assert_series_equal(got, expected, rtol=1e-9, atol=1e-12)
+    assert got.isna().any() and got.notna().any()
+
+
+def test_small_window_rejected():
+    with pytest.raises(ValueError):
+        rolling_discrete_kelly(make_returns(20), 3)
+
+
+def test_million_trades():
+    # timings: scripts/bench_kelly_estimate.py
+    r = pd.Series(np.random.default_rng(1).normal(0.001, 0.02, 1_000_000))
+    f = rolling_discrete_kelly(r, 100)
+    assert len(f) == len(r) and f.iloc[:4].isna().all() and f.iloc[4:].notna().all()
+
+
+def test_batch_wide_columns_match_single_runs(tmp_path):
+    results = tmp_path / "s1"
+    # "a": native buy/sell trade log (discrete); "b" and "c": equity curves on overlapping dates
+    trades = []
+    for k, ret in enumerate(make_returns(60, seed=2).fillna(0.01)):
+        t = pd.Timestamp("2020-01-01") + pd.Timedelta(days=2 * k)
+        trades.append({"datetime": t.isoformat(), "side": "buy", "price": 100.0, "qty": 1.0, "cash": 0.0})
+        trades.append({"datetime": (t + pd.Timedelta(days=1)).isoformat(), "side": "sell",
+                       "price": 100.0 * (1 + ret), "qty": 1.0, "cash": 100.0 * (1 + ret)})
+    (results / "a").mkdir(parents=True)
+    pd.DataFrame(trades).to_csv(results / "a" / "trades.csv", index=False)
+    rng = np.random.default_rng(3)
+    for name, start, n in (("b", "2020-01-01", 300), ("c", "2020-03-01", 200)):
+        (results / name).mkdir()
+        pd.DataFrame({"datetime": pd.date_range(start, periods=n, freq="D"),
+                      "equity": 1e4 * np.exp(np.cumsum(rng.normal(0.001, 0.02, n)))}
+                     ).to_csv(results / name / "equity.csv", index=False)
+
+    written = run_batch(["a", "b", "c", "missing"], [10, 30], 0.5, 0.2, "auto", tmp_path / "out", results)
+    assert set(written) == {"discrete", "continuous"}
+    trades_wide = pd.read_csv(written["discrete"], index_col="trade_index")
+    returns_wide = pd.read_csv(written["continuous"], index_col="datetime", parse_dates=True)
+    assert list(trades_wide.columns) == [f"a_w{w}_{v}" for w in (10, 30) for v in ("f_raw", "f_adj", "f_smooth")]
+    assert returns_wide.shape[1] == 12
+
+    trade_returns = pd.Series([t["price"] / 100.0 - 1 for t in trades if t["side"] == "sell"])
+    f_raw = rolling_discrete_kelly(trade_returns, 30)
+    np.testing.assert_allclose(trades_wide["a_w30_f_raw"], f_raw, rtol=1e-12)
+    np.testing.assert_allclose(trades_wide["a_w30_f_smooth"], smooth_series(0.5 * f_raw, 0.2), rtol=1e-12)
+
+    # "c" starts later: padded rows before its first date are NaN, as-of lookups are unchanged
+    eq = pd.read_csv(results / "c" / "equity.csv", parse_dates=["datetime"])
+    r = eq["equity"].pct_change().dropna()
+    r.index = eq.loc[r.index, "datetime"].values
+    single = rolling_continuous_kelly(r, 10)
+    picked = _read_kelly_series(str(tmp_path / "out"), prefer_field="c_w10_f_raw")
+    assert list(picked.columns) == ["c_w10_f_raw"] and isinstance(picked.index, pd.DatetimeIndex)
+    assert picked["c_w10_f_raw"].loc[:"2020-03-01"].isna().all()
+    pd.testing.assert_series_equal(picked["c_w10_f_raw"].loc[single.index], single, check_names=False,
+                                   check_freq=False, check_index_type=False)
+    assert (picked["c_w10_f_raw"].loc[single.index[-1]:] == single.iloc[-1]).all()
+    picked = _read_kelly_series(str(tmp_path / "out"), prefer_field="a_w10_f_adj")
+    assert picked.index.name == "trade_index" and len(picked) == 60
+    # unknown column: falls back to the single-run files (none here)
+    assert _read_kelly_series(str(tmp_path / "out"), prefer_field="f_smooth") is None
+
+
+def test_script_runs_outside_the_repo_root(tmp_path):
+    # the documented `python3 scripts/kelly_estimate.py ...` must find S1 without PYTHONPATH
+    script = Path(__file__).resolve().parents[1] / "scripts" / "kelly_estimate.py"
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    out = subprocess.run([sys.executable, str(script), "--help"], cwd=tmp_path, env=env,
+                         capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from S3.backtest import run_backtest_sl_tp
+
+
+def make_df(n):
+    close = np.full(n, 100.0)
+    return pd.DataFrame({
+        "datetime": pd.date_range("2021-01-01", periods=n, freq="D"),
+        "open": close, "high": close, "low": close, "close": close, "volume": 1.0,
+    })
+
+
+def _buys(kelly_csv, name, tmp_path, n=12):
+    df = make_df(n)
+    # 0->1 flips on bars 1 and 7 -> entries at the open of bars 2 and 8
+    sig = pd.Series([0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 0, 0][:n], index=pd.DatetimeIndex(df["datetime"]))
+    kelly_csv.to_csv(tmp_path / name, index=False)
+    out = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "out"), fee=0.0, sl_pct=0.5, tp_pct=0.5,
+                             enable_kelly=True, kelly_dir=str(tmp_path), kelly_max_alloc=1.0)
+    return [t for t in out["trades"] if t["side"] == "buy"]
+
+
+def test_datetime_kelly_uses_last_estimate_at_or_before_bar(tmp_path):
+    kelly = pd.DataFrame({
+        "datetime": pd.to_datetime(["2021-01-02", "2021-01-04", "2021-01-08", "2021-01-10"]),
+        "f_smooth": [0.1, 0.2, 0.5, 0.9],
+    })
+    buys = _buys(kelly, "kelly_returns_rolling.csv", tmp_path)
+    # bar 2 (01-03) -> 0.1 of 10000; bar 8 (01-09) -> 0.5 of equity (unchanged, flat prices)
+    assert [round(b["qty"] * b["price"]) for b in buys] == [1000, 5000]
+
+
+def test_tz_aware_kelly_timestamps_are_compared_in_utc(tmp_path):
+    # tz-aware Kelly timestamps used to fail the comparison with naive bars and size every entry at 0
+    utc = pd.to_datetime(["2021-01-02", "2021-01-04", "2021-01-08", "2021-01-10"]).tz_localize("UTC")
+    for stamps in (utc, utc.tz_convert("Asia/Shanghai")):
+        kelly = pd.DataFrame({"datetime": stamps, "f_smooth": [0.1, 0.2, 0.5, 0.9]})
+        assert "+" in kelly.to_csv(index=False)
+        buys = _buys(kelly, "kelly_returns_rolling.csv", tmp_path)
+        assert [round(b["qty"] * b["price"]) for b in buys] == [1000, 5000]
+
+    # tz-aware bars against the same CSV
+    df = make_df(12)
+    df["datetime"] = df["datetime"].dt.tz_localize("UTC")
+    sig = pd.Series([0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 0, 0], index=pd.DatetimeIndex(df["datetime"]))
+    out = run_backtest_sl_tp(df, sig, out_dir=None, fee=0.0, sl_pct=0.5, tp_pct=0.5, enable_kelly=True,
+                             kelly_dir=str(tmp_path), kelly_max_alloc=1.0, skip_reindex=True)
+    assert [round(t["qty"] * t["price"]) for t in out["trades"] if t["side"] == "buy"] == [1000, 5000]
+
+
+def test_trade_kelly_indexed_by_completed_trades(tmp_path):
+    kelly = pd.DataFrame({"trade_index": [0, 1], "f_smooth": [0.3, 0.6]})
+    buys = _buys(kelly, "kelly_trades_rolling.csv", tmp_path)
+    assert [round(b["qty"] * b["price"]) for b in buys] == [3000, 6000]
+
+
+def test_in_memory_kelly_matches_csv(tmp_path):
+    df = make_df(12)
+    sig = pd.Series([0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 0, 0], index=pd.DatetimeIndex(df["datetime"]))
+    kelly = pd.DataFrame({
+        "datetime": pd.to_datetime(["2021-01-02", "2021-01-04", "2021-01-08", "2021-01-10"]),
+        "f_smooth": [0.2, 0.4, 0.6, 0.8],
+    })
+    kelly.to_csv(tmp_path / "kelly_returns_rolling.csv", index=False)
+    kw = dict(fee=0.0, sl_pct=0.5, tp_pct=0.5, enable_kelly=True, kelly_max_alloc=1.0)
+    ref = run_backtest_sl_tp(df, sig, out_dir=str(tmp_path / "ref"), kelly_dir=str(tmp_path), kelly_scale=0.5, **kw)
+
+    series = kelly.set_index("datetime")["f_smooth"]
+    per_bar = series.reindex(df["datetime"], method="ffill").to_numpy()
+    for obj in (kelly, series, per_bar):
+        out = run_backtest_sl_tp(df, sig, out_dir=None, kelly=obj, kelly_scale=0.5, **kw)
+        assert out["trades"] == ref["trades"]
+    assert [round(t["qty"] * t["price"]) for t in ref["trades"] if t["side"] == "buy"] == [1000, 3000]
+    assert not (tmp_path / "None").exists()